@@ -1,173 +1,366 @@
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src", "ExpenseTrackerModel"))
+
+from planning_core import CategoryNameLabeler, PlanningCore
+from transactions import TransactionBatch, epoch_month_to_period
+
+
+# ── Keyword classes (checked in this priority order) ─────────────────────────
+KW_NONE, KW_FIXED, KW_VARIABLE, KW_FITNESS, KW_WANTS = range(5)
+
+KEYWORD_CLASSES = (
+    # Fixed Needs (non-negotiable): rent/EMI, utilities, education
+    (KW_FIXED, ['rent', 'house', 'flat', 'bari', 'basa', 'ভাড়া', 'emi', 'loan', 'mortgage',
+                'utilities', 'electric', 'bill', 'wasa', 'gas', 'internet', 'wifi', 'grameen', 'robi', 'airtel',
+                'school', 'college', 'tution', 'tuition', 'coach', 'education']),
+    # Variable Needs
+    (KW_VARIABLE, ['grocer', 'bazar', 'shwapno', 'meena', 'super shop', 'market', 'food',
+                   'health', 'labaid', 'medicine', 'doctor']),
+    # Gym: need or want depending on frequency
+    (KW_FITNESS, ['fitness']),
+    # Wants
+    (KW_WANTS, ['entertainment', 'foodpanda', 'pathao', 'uber', 'daraz', 'shopping', 'movie', 'coffee',
+                'cafe', 'travel', 'netflix', 'youtube', 'spotify', 'game', 'pubg', 'gift']),
+)
+
+_KEYWORD_PATTERNS = tuple(
+    (code, re.compile("|".join(map(re.escape, keywords))))
+    for code, keywords in KEYWORD_CLASSES
+)
+
+# Budget groups and how many categories each keeps
+FIXED_NEEDS, VARIABLE_NEEDS, ESSENTIAL_WANTS, LUXURY_WANTS = range(4)
+GROUP_LIMITS = np.array([10, 10, 5, 5])
+
+NOISE_FLOOR = 300       # ignore categories averaging ≤ this per month
+WEIGHT_POWER = 1.3      # latest month has highest weight
+WINDOW_DECAY = 0.8      # windowed mode: each month back weighs 0.8× the next
+
+# Category names are their own labels (upper-cased), so no categorizer runs
+_CORE = PlanningCore(CategoryNameLabeler())
+
+
+def keyword_classes(categories) -> np.ndarray:
+    """
+    Keyword class (KW_*) for every category name, using the precompiled
+    patterns over the whole index at once. The first matching class wins.
+    """
+    lowered = pd.Index([str(c) for c in categories], dtype=object).str.lower()
+    result = np.full(len(lowered), KW_NONE, dtype=np.int8)
+    for code, pattern in reversed(_KEYWORD_PATTERNS):
+        hits = np.asarray(lowered.str.contains(pattern, regex=True), dtype=bool)
+        result[hits] = code
+    return result
+
+
+def decay_normalizer(n, decay: float):
+    """Closed-form sum of decay**k for k = 0..n-1 (geometric series)."""
+    n = np.asarray(n, dtype=np.float64)
+    if decay == 1:
+        return n
+    return (1 - decay ** n) / (1 - decay)
+
+
+def smart_averages(pivots, month_counts=None, power: float = WEIGHT_POWER, decay: float = None):
+    """
+    Weighted monthly average and active-month frequency per category.
+
+    Args:
+        pivots:       (months × categories) or (users × months × categories),
+                      oldest month first; users' histories right-aligned
+        month_counts: (users,) real months per user — leading rows beyond
+                      these are padding and get zero weight
+        decay:        None → polynomial weights position**power (legacy);
+                      otherwise exponential weights decay**age, age 0 being
+                      the latest row, normalized in closed form
+
+    Returns (average, frequency), shaped (categories,) or (users × categories).
+    """
+    arr = np.asarray(pivots, dtype=np.float64)
+    single = arr.ndim == 2
+    if single:
+        arr = arr[None]
+    U, M, _ = arr.shape
+    counts = np.full(U, M) if month_counts is None else np.asarray(month_counts)
+
+    position = np.arange(M)[None, :] - (M - counts)[:, None] + 1      # 1..n for real months
+    real = position > 0
+    if decay is None:
+        weights = np.where(real, np.maximum(position, 1).astype(np.float64) ** power, 0.0)
+        norm = weights.sum(axis=1, keepdims=True)
+    else:
+        age = np.arange(M - 1, -1, -1, dtype=np.float64)
+        weights = np.where(real, decay ** age[None, :], 0.0)
+        norm = decay_normalizer(counts, decay)[:, None]
+
+    average = (arr * weights[:, :, None]).sum(axis=1) / norm
+    frequency = ((arr > 0) & real[:, :, None]).sum(axis=1)
+    if single:
+        return average[0], frequency[0]
+    return average, frequency
+
+
+def classify(kw_class: np.ndarray, average: np.ndarray, frequency: np.ndarray) -> np.ndarray:
+    """Budget group per (user, category) from keyword class, amount and frequency."""
+    kw = np.broadcast_to(kw_class, average.shape)
+    frequent = frequency >= 4
+    return np.select(
+        [
+            kw == KW_FIXED,
+            kw == KW_VARIABLE,
+            (kw == KW_FITNESS) & ~frequent,     # infrequent gym = want
+            kw == KW_FITNESS,
+            (kw == KW_WANTS) & frequent,        # appears in 4+ months → essential want
+            kw == KW_WANTS,
+            frequent & (average > 3000),        # frequent big = fixed need
+            frequent,
+        ],
+        [
+            FIXED_NEEDS, VARIABLE_NEEDS, LUXURY_WANTS, ESSENTIAL_WANTS,
+            ESSENTIAL_WANTS, LUXURY_WANTS, FIXED_NEEDS, ESSENTIAL_WANTS,
+        ],
+        default=LUXURY_WANTS,
+    )
+
+
+def stack_pivots(monthly_spends):
+    """
+    Stacks per-user month × category DataFrames into one right-aligned
+    (users × months × categories) array over the union of categories.
+
+    Returns (array, categories, month_counts).
+    """
+    categories = list(dict.fromkeys(c for m in monthly_spends for c in m.columns))
+    column = {c: i for i, c in enumerate(categories)}
+    counts = np.array([len(m) for m in monthly_spends], dtype=np.int64)
+    M = int(counts.max()) if len(counts) else 0
+
+    arr = np.zeros((len(monthly_spends), M, len(categories)), dtype=np.float64)
+    for u, m in enumerate(monthly_spends):
+        cols = [column[c] for c in m.columns]
+        arr[u, M - len(m):][:, cols] = m.to_numpy(dtype=np.float64)
+    return arr, categories, counts
+
+
+def _optional(values, n: int) -> np.ndarray:
+    if values is None or np.isscalar(values):
+        values = [values] * n
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def plan_smart_budgets(
+    pivots,
+    categories,
+    monthly_incomes,
+    spending_boundaries=None,
+    month_counts=None,
+    currency="৳",
+    verbose=False,
+    decay=None,
+):
+    """
+    Plans many users at once from stacked monthly pivots.
+
+    Args:
+        pivots:              (users × months × categories), see smart_averages
+        categories:          category names for the last axis
+        monthly_incomes:     per-user incomes
+        spending_boundaries: per-user spending limits (None = no boundary)
+        month_counts:        per-user real month counts (default: all months)
+        decay:               exponential month weights (see smart_averages);
+                             rows must then be consecutive calendar months
+
+    Returns one create_smart_budget result dict per user.
+    """
+    arr = np.asarray(pivots, dtype=np.float64)
+    U, _, C = arr.shape
+    incomes = list(monthly_incomes) if not np.isscalar(monthly_incomes) else [monthly_incomes] * U
+    income = np.array(incomes, dtype=np.float64)
+    boundary = _optional(spending_boundaries, U)
+    names = np.array([str(c) for c in categories], dtype=object)
+
+    # WEIGHTED AVERAGE + FREQUENCY — whole pivot at once
+    average, frequency = smart_averages(arr, month_counts, decay=decay)
+    eligible = average > NOISE_FLOOR
+
+    # SMART AUTO CLASSIFICATION
+    group = classify(keyword_classes(categories), average, frequency)
+
+    # Largest first, keep the top N of each group
+    order = np.argsort(np.where(eligible, -average, np.inf), axis=1, kind="stable")
+    sorted_group = np.take_along_axis(np.where(eligible, group, -1), order, axis=1)
+    kept_sorted = np.zeros((U, C), dtype=bool)
+    for g, limit in enumerate(GROUP_LIMITS):
+        in_group = sorted_group == g
+        kept_sorted |= in_group & (np.cumsum(in_group, axis=1) <= limit)
+    kept = np.zeros((U, C), dtype=bool)
+    np.put_along_axis(kept, order, kept_sorted, axis=1)
+
+    # Slight buffer (5%)
+    buffered = np.where(kept, np.round(average * 1.05), 0.0)
+    totals = np.stack([np.where(kept & (group == g), buffered, 0.0).sum(axis=1) for g in range(4)], axis=1)
+    fixed_total, variable_total, essential_total, luxury_total = totals.T
+
+    # BOUNDARY LOGIC
+    has_boundary = ~np.isnan(boundary)
+    available = np.where(has_boundary, boundary, income * 0.80)
+    savings = np.where(has_boundary, 0.0, income * 0.20)
+
+    # Allocation: fixed > variable > essential wants > luxury
+    with np.errstate(divide="ignore", invalid="ignore"):
+        remaining = available - fixed_total
+        covers_fixed = remaining >= 0
+
+        scale_variable = np.where(variable_total > 0, np.minimum(1, remaining * 0.50 / variable_total), 1)
+        scale_variable = np.maximum(0.80, scale_variable)   # Don't cut variable needs too much
+        variable_vals = np.maximum(500, np.trunc(buffered * scale_variable[:, None]))
+        variable_vals = np.where(kept & (group == VARIABLE_NEEDS), variable_vals, 0.0)
+        remaining = remaining - variable_vals.sum(axis=1)
+        covers_variable = covers_fixed & (remaining > 0)
+
+        scale_essential = np.where(essential_total > 0, np.minimum(1, remaining * 0.60 / essential_total), 1)
+        scale_essential = np.maximum(0.50, scale_essential)
+        essential_vals = np.where(
+            kept & (group == ESSENTIAL_WANTS), np.trunc(buffered * scale_essential[:, None]), 0.0
+        )
+        remaining = remaining - essential_vals.sum(axis=1)
+        covers_essential = covers_variable & (remaining > 0)
+
+        scale_luxury = np.where(luxury_total > 0, remaining / luxury_total, 1)
+        luxury_vals = np.where(
+            kept & (group == LUXURY_WANTS), np.trunc(buffered * scale_luxury[:, None]), 0.0
+        )
+    savings = np.where(covers_essential, savings + remaining, savings)
+
+    results = []
+    for u in range(U):
+        idx = order[u][kept_sorted[u]]
+
+        def pick(g, values, on=True):
+            if not on:
+                return {}
+            return {names[j]: int(values[u, j]) for j in idx if group[u, j] == g}
+
+        fixed_budget = pick(FIXED_NEEDS, buffered)
+        variable_budget = pick(VARIABLE_NEEDS, variable_vals, covers_fixed[u])
+        essential_wants_budget = pick(ESSENTIAL_WANTS, essential_vals, covers_variable[u])
+        luxury_wants_budget = pick(LUXURY_WANTS, luxury_vals, covers_essential[u])
+
+        if verbose:
+            for g in range(4):
+                print(pick(g, buffered))
+
+        if not covers_fixed[u]:
+            final_note = (
+                f"Alert: Income too low to cover fixed essentials ({currency}{int(fixed_total[u]):,} needed). "
+                "Consider extra income or assistance. You're not alone — let's plan step by step."
+            )
+        elif not covers_variable[u]:
+            final_note = "Tight budget — covered needs, but skipped wants. Focus on essentials; better months ahead."
+        elif not covers_essential[u]:
+            final_note = "Covered needs + key wants. No room for extras this month — smart choices!"
+        else:
+            if verbose:
+                print(f"Remaining: {remaining[u]}")
+            final_note = (
+                "Boundary active → savings paused. Protected your must-haves first."
+                if has_boundary[u]
+                else "No boundary → aiming for 50/30/20 with strong savings!"
+            )
+
+        # Combine for output
+        needs_budget = {**fixed_budget, **variable_budget}
+        wants_budget = {**essential_wants_budget, **luxury_wants_budget}
+
+        results.append({
+            "Your Income": f"{currency}{incomes[u]:,}",
+            "Savings This Month": f"{currency}{int(savings[u]):,}",
+            "Living Money": f"{currency}{int(available[u]):,}",
+            "Needs (Protected)": f"{currency}{sum(needs_budget.values()):,}",
+            "needs_breakdown": {k: f"{currency}{v:,}" for k, v in needs_budget.items()},
+            "Wants (Lifestyle)": f"{currency}{sum(wants_budget.values()):,}",
+            "wants_breakdown": {k: f"{currency}{v:,}" for k, v in wants_budget.items()},
+            "From Your Budget Friend": final_note,
+            "You're Doing Great": "Every month you track, you get stronger. Keep going — freedom is coming."
+        })
+    return results
+
+
+def monthly_pivot(transactions, window_months=None):
+    """
+    Month × category spend table (oldest month first) from a transactions frame.
+
+    Parsing and aggregation go through the shared PlanningCore: one columnar
+    parse and one bincount, with category names as labels (sorted, as the
+    old groupby/unstack produced them).
+
+    With `window_months`, rows older than the trailing N calendar months are
+    dropped before aggregation, and the table covers every month of the
+    window (empty months as zeros), so its size no longer grows with history.
+    Otherwise only months that have transactions are kept.
+    """
+    batch = TransactionBatch.from_columns(
+        transactions['Date'].tolist(),
+        transactions['Amount'],
+        transactions['Category'].astype(str),
+        absolute=False,
+    )
+    totals = _CORE.totals(batch, window_months=window_months)
+    if not len(totals):
+        return pd.DataFrame()
+
+    order = np.argsort(np.array(totals.labels, dtype=object), kind='stable')
+    values = totals.values[order]
+    months = np.arange(totals.start_month, totals.end_month)
+    if not window_months:
+        values, months = values[:, totals.active], months[totals.active]
+
+    return pd.DataFrame(
+        values.T,
+        index=pd.PeriodIndex([epoch_month_to_period(m) for m in months], freq='M', name='month'),
+        columns=pd.Index([totals.labels[i] for i in order], name='Category'),
+    )
+
+
 def create_smart_budget(
     transactions,
     monthly_income,
     spending_boundary=None,
-    currency="৳"
+    currency="৳",
+    window_months=None,
+    decay=WINDOW_DECAY,
+    verbose=False,
 ):
     """
     No training. No labels. Just pure intelligence + kindness.
     Understands Bengali/English real-life spending automatically.
-    """
-    import pandas as pd
-    import numpy as np
 
-    df = transactions.copy()
-    if df.empty:
+    window_months: plan from the trailing N months only, weighting month k
+    back by decay**k (None → whole history with the legacy weights).
+    verbose: print the monthly table and group picks to stdout (off by
+    default, so callers whose stdout carries the result stay clean).
+    """
+    if transactions.empty:
         return {"message": "No transactions yet. Enter your income → we’ll start simple!"}
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce').fillna(0)
-    df = df.dropna(subset=['Date'])
-    df['Category'] = df['Category'].astype(str).str.upper().str.strip()
-    df['month'] = df['Date'].dt.to_period('M')
-
-    # Group by month and category
-    monthly_spend = df.groupby(['month', 'Category'])['Amount'].sum().unstack(fill_value=0)
-    print('monthly expense',  monthly_spend)
-
-
-    # LAST 6 MONTHS ONLY
-    cutoff = df['Date'].max() - pd.DateOffset(months=6)
-    last_6_months = df[df['Date'] >= cutoff].copy()
-
-
-
-    # WEIGHTED AVERAGE — latest month has highest weight
-    weights = np.arange(1, len(monthly_spend) + 1) ** 1.3  # slight exponential weight
-    smart_avg = np.average(monthly_spend, axis=0, weights=weights)
-    last_6_months_avg = pd.Series(smart_avg, index=monthly_spend.columns)
-    last_6_months_avg = last_6_months_avg[last_6_months_avg > 300].sort_values(ascending=False)  # filter tiny noise
-
-    # SMART AUTO CLASSIFICATION — This is the magic
-    fixed_needs = []  # Can't reduce: rent, EMI, utilities
-    variable_needs = []  # Can adjust slightly: groceries, basic transport
-    essential_wants = []  # Frequent lifestyle: e.g., regular coffee if every month
-    luxury_wants = []  # Infrequent fun
-
-    for desc, amt in last_6_months_avg.items():
-        d = desc.lower()
-        frequency = (monthly_spend.get(desc, pd.Series(0)) > 0).sum()  # freq in last 6 months
-
-        # Fixed Needs (non-negotiable)
-        if any(k in d for k in ['rent', 'house', 'flat', 'bari', 'basa', 'ভাড়া', 'emi', 'loan', 'mortgage']):
-            fixed_needs.append((desc, amt))
-        elif any(k in d for k in ['utilities', 'electric', 'bill', 'wasa', 'gas', 'internet', 'wifi', 'grameen', 'robi', 'airtel']):
-            fixed_needs.append((desc, amt))
-        elif any(k in d for k in ['school', 'college', 'tution', 'tuition', 'coach', 'education']):
-            fixed_needs.append((desc, amt))
-
-        # Variable Needs
-        elif any(k in d for k in ['grocer', 'bazar', 'shwapno', 'meena', 'super shop', 'market', 'food']):
-            variable_needs.append((desc, amt))
-        elif any(k in d for k in ['health', 'labaid', 'medicine', 'doctor']):
-            variable_needs.append((desc, amt))
-        elif 'fitness' in d and frequency < 4:  # infrequent gym = want
-            luxury_wants.append((desc, amt))
-        elif 'fitness' in d:
-            essential_wants.append((desc, amt))
-
-        # Wants
-        elif any(k in d for k in ['entertainment', 'foodpanda', 'pathao', 'uber', 'daraz', 'shopping', 'movie', 'coffee', 'cafe', 'travel', 'netflix', 'youtube', 'spotify', 'game', 'pubg', 'gift']):
-            if frequency >= 4:  # appears in 4+ of last 6 months → essential want
-                essential_wants.append((desc, amt))
-            else:
-                luxury_wants.append((desc, amt))
 
-        else:
-            # Default: based on frequency and amount
-            if frequency >= 4 and amt > 3000:
-                fixed_needs.append((desc, amt))  # frequent big = fixed need
-            elif frequency >= 4:
-                essential_wants.append((desc, amt))
-            else:
-                luxury_wants.append((desc, amt))
-
-    # Sort by amount descending
-    fixed_needs.sort(key=lambda x: x[1], reverse=True)
-    variable_needs.sort(key=lambda x: x[1], reverse=True)
-    essential_wants.sort(key=lambda x: x[1], reverse=True)
-    luxury_wants.sort(key=lambda x: x[1], reverse=True)
-
-    # Convert to dicts with slight buffer (5%)
-    fixed_needs_dict = {desc: round(amt * 1.05) for desc, amt in fixed_needs[:10]}
-    variable_needs_dict = {desc: round(amt * 1.05) for desc, amt in variable_needs[:10]}
-    essential_wants_dict = {desc: round(amt * 1.05) for desc, amt in essential_wants[:5]}
-    luxury_wants_dict = {desc: round(amt * 1.05) for desc, amt in luxury_wants[:5]}
-
-    print(fixed_needs_dict)
-    print(variable_needs_dict)
-    print(essential_wants_dict)
-    print(luxury_wants_dict)
-
-    # Totals
-    fixed_total = sum(fixed_needs_dict.values())
-    variable_total = sum(variable_needs_dict.values())
-    essential_wants_total = sum(essential_wants_dict.values())
-    luxury_wants_total = sum(luxury_wants_dict.values())
+    monthly_spend = monthly_pivot(transactions, window_months)
+    if verbose:
+        print('monthly expense',  monthly_spend)
+    if monthly_spend.empty:
+        return {"message": "No transactions yet. Enter your income → we’ll start simple!"}
 
-    # BOUNDARY LOGIC
-    if spending_boundary is not None:
-        available = spending_boundary
-        savings = 0
-        note = "Boundary active → savings paused. Protected your must-haves first."
-    else:
-        available = monthly_income * 0.80
-        savings = monthly_income * 0.20
-        note = "No boundary → aiming for 50/30/20 with strong savings!"
-
-    # Allocation logic: Prioritize fixed > variable > essential wants > luxury
-    remaining = available
-    fixed_budget = {k: v for k, v in fixed_needs_dict.items()}  # Never scale down fixed
-    remaining -= fixed_total
-
-    if remaining < 0:
-        # Can't cover fixed
-        variable_budget = {}
-        essential_wants_budget = {}
-        luxury_wants_budget = {}
-        final_note = f"Alert: Income too low to cover fixed essentials ({currency}{fixed_total:,} needed). Consider extra income or assistance. You're not alone — let's plan step by step."
-    else:
-        # Allocate to variable needs (scale if needed, but min 80% of avg)
-        scale_variable = min(1, remaining * 0.50 / variable_total) if variable_total > 0 else 1
-        scale_variable = max(0.80, scale_variable)  # Don't cut variable needs too much
-        variable_budget = {k: max(500, int(v * scale_variable)) for k, v in variable_needs_dict.items()}
-        variable_alloc = sum(variable_budget.values())
-        remaining -= variable_alloc
-
-        if remaining <= 0:
-            essential_wants_budget = {}
-            luxury_wants_budget = {}
-            final_note = "Tight budget — covered needs, but skipped wants. Focus on essentials; better months ahead."
-        else:
-            # Essential wants (scale, min 50%)
-            scale_essential = min(1, remaining * 0.60 / essential_wants_total) if essential_wants_total > 0 else 1
-            scale_essential = max(0.50, scale_essential)
-            essential_wants_budget = {k: int(v * scale_essential) for k, v in essential_wants_dict.items()}
-            essential_alloc = sum(essential_wants_budget.values())
-            remaining -= essential_alloc
-
-            if remaining <= 0:
-                luxury_wants_budget = {}
-                final_note = "Covered needs + key wants. No room for extras this month — smart choices!"
-            else:
-                # Luxury wants (whatever left)
-                scale_luxury = remaining / luxury_wants_total if luxury_wants_total > 0 else 1
-                luxury_wants_budget = {k: int(v * scale_luxury) for k, v in luxury_wants_dict.items()}
-                final_note = note
-                print(f"Remaining: {remaining}")
-                savings += remaining
-
-    # Combine for output
-    needs_budget = {**fixed_budget, **variable_budget}
-    wants_budget = {**essential_wants_budget, **luxury_wants_budget}
-
-    return {
-        "Your Income": f"{currency}{monthly_income:,}",
-        "Savings This Month": f"{currency}{int(savings):,}",
-        "Living Money": f"{currency}{int(available):,}",
-        "Needs (Protected)": f"{currency}{sum(needs_budget.values()):,}",
-        "needs_breakdown": {k: f"{currency}{v:,}" for k, v in needs_budget.items()},
-        "Wants (Lifestyle)": f"{currency}{sum(wants_budget.values()):,}",
-        "wants_breakdown": {k: f"{currency}{v:,}" for k, v in wants_budget.items()},
-        "From Your Budget Friend": final_note,
-        "You're Doing Great": "Every month you track, you get stronger. Keep going — freedom is coming."
-    }
\ No newline at end of file
+    return plan_smart_budgets(
+        monthly_spend.to_numpy(dtype=np.float64)[None],
+        monthly_spend.columns,
+        [monthly_income],
+        [spending_boundary],
+        currency=currency,
+        verbose=verbose,
+        decay=decay if window_months else None,
+    )[0]
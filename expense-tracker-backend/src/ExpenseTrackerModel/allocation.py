@@ -0,0 +1,459 @@
+"""
+allocation.py
+Array-based budget allocation.
+
+Performs the allocation half of BudgetAI.create_balanced_budget on a
+(rows × categories) matrix of predicted spend, where each row is one user or
+one (income, spending cap) scenario. The steps mirror the dict implementation:
+  1. Fixed needs at full predicted amount (capped at spending cap)
+  2. Remaining split into variable needs / wants by needs_pct / wants_pct,
+     each scaled proportionally to its predictions
+  3. Starter allocations when a side has no history
+  4. Hard cap: trim wants largest-first, then variable needs (never fixed)
+
+Trimming walks category positions in each row's largest-first order, with the
+arithmetic vectorized across rows, so results round exactly like the dict code.
+"""
+
+import numpy as np
+
+
+DEFAULT_INCOME = 50000.0
+
+STARTER_NEEDS = (
+    ("House Rent",        0.40),
+    ("Groceries",         0.25),
+    ("Utilities & Bills", 0.15),
+    ("Transportation",    0.12),
+    ("Healthcare",        0.08),
+)
+
+STARTER_WANTS = (
+    ("Dining Out & Food Delivery",    0.30),
+    ("Entertainment & Subscriptions", 0.25),
+    ("Shopping & Personal Care",      0.20),
+    ("Travel & Leisure",              0.15),
+    ("Miscellaneous",                 0.10),
+)
+
+
+# ── Notes ─────────────────────────────────────────────────────────────────────
+def budget_notes(
+    custom: bool,
+    income_provided: bool,
+    monthly_income: float,
+    savings: float,
+    data_months: int,
+    fixed_allocated: float,
+    spending_cap: float,
+    fixed_exceeds_cap: bool,
+    needs_starter: bool,
+    wants_starter: bool,
+) -> list:
+    """
+    Builds the user-facing notes for one plan, in the order the dict
+    implementation emits them. `monthly_income` is the income used for the
+    savings rate (after defaulting), or 0 when none applies.
+    """
+    notes = []
+    if custom:
+        notes.append("Custom spending limit applied — essentials protected first.")
+        if income_provided and savings == 0:
+            notes.append("Spending limit equals or exceeds income — savings set to 0.")
+    else:
+        if not income_provided:
+            notes.append(
+                "No income provided — using ৳50,000 as default. "
+                "Set your actual income for a personalized plan."
+            )
+        if data_months >= 3:
+            notes.append("50/30/20 rule applied, personalized from your spending history.")
+        else:
+            notes.append(
+                f"Only {data_months} month(s) of data — using 50/30/20 as a safe baseline. "
+                "Keep tracking for a fully personalized plan!"
+            )
+
+    if fixed_exceeds_cap:
+        notes.append(
+            f"⚠️ Fixed essentials (Rent/EMI: ৳{int(fixed_allocated):,}) meet or exceed "
+            f"your ৳{int(spending_cap):,} limit. No room for other categories."
+        )
+    if needs_starter:
+        notes.append("No expense history — using standard starter allocation.")
+    if wants_starter:
+        notes.append("No discretionary history — using standard starter allocation.")
+
+    savings_rate = (savings / float(monthly_income) * 100) if monthly_income else 0
+    if savings_rate >= 20:
+        notes.append(f"🎉 On track to save ৳{int(savings):,} ({savings_rate:.0f}%) this month!")
+    elif savings_rate >= 10:
+        notes.append(f"👍 Saving ৳{int(savings):,} ({savings_rate:.0f}%). Aim for 20% for stronger financial health.")
+    elif savings_rate > 0:
+        notes.append(f"💡 Low savings rate ({savings_rate:.0f}%). Try trimming wants to build a safety net.")
+
+    notes.append("Every month you track, you get one step closer to financial freedom. Keep going! 💪")
+    return notes
+
+
+# ── Core ──────────────────────────────────────────────────────────────────────
+def _as_optional(values, n: int) -> np.ndarray:
+    """Converts a scalar/sequence with None entries into a float array (None → NaN)."""
+    if values is None or np.isscalar(values):
+        values = [values] * n
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def _trim_largest_first(values, present, rank, trimmable, overflow, active):
+    """
+    Trims `values` in place, largest-first per row (ties by `rank`), until each
+    row's overflow is used up. Non-trimmable entries keep their position in the
+    order but are skipped, like the dict loop's `if n not in FIXED_CATEGORIES`.
+    """
+    rows = np.arange(values.shape[0])
+    key = np.where(present, values, -np.inf)
+    by_rank = np.argsort(rank, axis=1, kind="stable")
+    by_value = np.argsort(-np.take_along_axis(key, by_rank, axis=1), axis=1, kind="stable")
+    order = np.take_along_axis(by_rank, by_value, axis=1)
+
+    for k in range(order.shape[1]):
+        col = order[:, k]
+        step = active & present[rows, col] & trimmable[rows, col]
+        if not step.any():
+            continue
+        v = values[rows, col]
+        trim = np.where(step, np.minimum(v, overflow), 0.0)
+        values[rows, col] = np.where(step, np.round(v - trim), v)
+        overflow = overflow - trim
+        active = active & ~(step & (overflow <= 0))
+    return overflow, active
+
+
+def allocate_matrix(
+    pred: np.ndarray,
+    is_need: np.ndarray,
+    is_fixed: np.ndarray,
+    needs_rank: np.ndarray,
+    wants_rank: np.ndarray,
+    monthly_income,
+    total_budget,
+    starter_fixed=None,
+) -> dict:
+    """
+    Allocates every row of `pred` (rows × categories, 0 = category absent).
+
+    Args:
+        pred:        predicted spend per row and category
+        is_need:     bool (C,) or (R, C) — category is a need
+        is_fixed:    bool (C,) or (R, C) — category is a fixed cost (never trimmed)
+        needs_rank / wants_rank: (C,) or (R, C) position of each category in the
+                     row's needs / wants breakdown order (ties in trimming)
+        monthly_income, total_budget: (R,) arrays, NaN where not provided
+        starter_fixed: bool (len(STARTER_NEEDS),) — starter needs treated as fixed
+
+    Returns a dict of arrays; needs/wants columns are the C categories followed
+    by the starter needs (needs side) or starter wants (wants side).
+    """
+    pred = np.asarray(pred, dtype=np.float64)
+    R, C = pred.shape
+    is_need = np.broadcast_to(is_need, (R, C))
+    is_fixed = np.broadcast_to(is_fixed, (R, C))
+    needs_rank = np.broadcast_to(needs_rank, (R, C))
+    wants_rank = np.broadcast_to(wants_rank, (R, C))
+    if starter_fixed is None:
+        starter_fixed = np.zeros(len(STARTER_NEEDS), dtype=bool)
+
+    income = np.asarray(monthly_income, dtype=np.float64)
+    budget = np.asarray(total_budget, dtype=np.float64)
+    present = pred > 0
+
+    # ── Spending cap & savings ────────────────────────────────────────────────
+    custom = ~np.isnan(budget)
+    income_provided = ~np.isnan(income) & (income != 0)
+    income_used = np.where(income_provided, income, np.where(custom, 0.0, DEFAULT_INCOME))
+    spending_cap = np.where(custom, budget, income_used * 0.80)
+    savings = np.where(
+        custom,
+        np.where(income_provided, np.maximum(0.0, income_used - spending_cap), 0.0),
+        income_used * 0.20,
+    )
+    needs_pct = np.where(custom, 0.60, 0.625)
+    wants_pct = np.where(custom, 0.40, 0.375)
+    cap = spending_cap[:, None]
+
+    # ── Step 1: Fixed needs at full historical amount ─────────────────────────
+    fixed_mask = present & is_need & is_fixed
+    fixed_amt = np.where(fixed_mask, np.minimum(pred, cap), 0.0)
+    fixed_allocated = fixed_amt.sum(axis=1)
+
+    # ── Step 2/3: Distribute remaining after fixed ────────────────────────────
+    exceeded = fixed_allocated >= spending_cap
+    remaining = spending_cap - fixed_allocated
+    variable_budget = remaining * needs_pct
+    wants_alloc = remaining * wants_pct
+
+    var_mask = present & is_need & ~is_fixed & ~exceeded[:, None]
+    wants_mask = present & ~is_need & ~exceeded[:, None]
+
+    var_sum = np.where(var_mask, pred, 0.0).sum(axis=1)
+    var_sum[var_sum == 0] = 1.0
+    wants_sum = np.where(wants_mask, pred, 0.0).sum(axis=1)
+    wants_sum[wants_sum == 0] = 1.0
+
+    needs_vals = np.where(fixed_mask, np.round(fixed_amt), 0.0)
+    needs_vals = np.where(var_mask, np.round(pred * (variable_budget / var_sum)[:, None]), needs_vals)
+    wants_vals = np.where(wants_mask, np.round(pred * (wants_alloc / wants_sum)[:, None]), 0.0)
+
+    needs_cap = np.where(exceeded, fixed_allocated, fixed_allocated + variable_budget)
+    wants_cap = np.where(exceeded, 0.0, wants_alloc)
+
+    # ── Starter allocations ───────────────────────────────────────────────────
+    n_sn, n_sw = len(STARTER_NEEDS), len(STARTER_WANTS)
+    needs_present = np.concatenate([fixed_mask | var_mask, np.zeros((R, n_sn), dtype=bool)], axis=1)
+    wants_present = np.concatenate([wants_mask, np.zeros((R, n_sw), dtype=bool)], axis=1)
+
+    needs_starter = ~needs_present.any(axis=1)
+    avail_needs = np.minimum(needs_cap, spending_cap - wants_vals.sum(axis=1))
+    starter_n = np.trunc(avail_needs[:, None] * np.array([s for _, s in STARTER_NEEDS]))
+    needs_vals = np.concatenate([needs_vals, np.where(needs_starter[:, None], starter_n, 0.0)], axis=1)
+    needs_present[:, C:] = needs_starter[:, None]
+
+    wants_starter = ~wants_present.any(axis=1)
+    avail_wants = np.minimum(wants_cap, np.maximum(0.0, spending_cap - needs_vals.sum(axis=1)))
+    starter_w = np.trunc(avail_wants[:, None] * np.array([s for _, s in STARTER_WANTS]))
+    wants_vals = np.concatenate([wants_vals, np.where(wants_starter[:, None], starter_w, 0.0)], axis=1)
+    wants_present[:, C:] = wants_starter[:, None]
+
+    starter_rank_n = np.broadcast_to(np.arange(n_sn), (R, n_sn))
+    starter_rank_w = np.broadcast_to(np.arange(n_sw), (R, n_sw))
+    needs_order = np.concatenate([needs_rank, starter_rank_n], axis=1)
+    wants_order = np.concatenate([wants_rank, starter_rank_w], axis=1)
+
+    # ── Hard cap: guarantee total ≤ spending_cap ──────────────────────────────
+    overflow = needs_vals.sum(axis=1) + wants_vals.sum(axis=1) - spending_cap
+    active = overflow > 0
+    if active.any():
+        overflow, active = _trim_largest_first(
+            wants_vals, wants_present, wants_order,
+            np.ones_like(wants_present), overflow, active,
+        )
+        needs_trimmable = ~np.concatenate(
+            [is_fixed, np.broadcast_to(starter_fixed, (R, n_sn))], axis=1
+        )
+        _trim_largest_first(
+            needs_vals, needs_present, needs_order,
+            needs_trimmable, overflow, active,
+        )
+
+    return {
+        "custom":          custom,
+        "income_provided": income_provided,
+        "monthly_income":  income_used,
+        "savings":         savings,
+        "spending_cap":    spending_cap,
+        "fixed_allocated": fixed_allocated,
+        "fixed_exceeded":  exceeded,
+        "needs_cap":       needs_cap,
+        "wants_cap":       wants_cap,
+        "needs":           needs_vals,
+        "needs_present":   needs_present,
+        "needs_order":     needs_order,
+        "wants":           wants_vals,
+        "wants_present":   wants_present,
+        "wants_order":     wants_order,
+        "needs_starter":   needs_starter,
+        "wants_starter":   wants_starter,
+    }
+
+
+# ── Results ───────────────────────────────────────────────────────────────────
+class PlanMatrix:
+    """
+    Allocations for many rows (users or what-if scenarios).
+
+    Array attributes are indexed by row; `plan(i)` materializes one row as the
+    same dict create_balanced_budget returns.
+    """
+
+    def __init__(self, labels, result: dict, data_months):
+        self.labels = tuple(labels)
+        self.needs_labels = self.labels + tuple(name for name, _ in STARTER_NEEDS)
+        self.wants_labels = self.labels + tuple(name for name, _ in STARTER_WANTS)
+        self.data_months = np.broadcast_to(np.asarray(data_months, dtype=np.int64), result["spending_cap"].shape)
+        self._r = result
+
+    def __len__(self) -> int:
+        return len(self._r["spending_cap"])
+
+    @property
+    def spending_cap(self) -> np.ndarray:
+        return self._r["spending_cap"]
+
+    @property
+    def savings(self) -> np.ndarray:
+        return self._r["savings"]
+
+    @property
+    def needs(self) -> np.ndarray:
+        """Needs allocation per scenario × needs_labels (0 where absent)."""
+        return self._r["needs"]
+
+    @property
+    def wants(self) -> np.ndarray:
+        """Wants allocation per scenario × wants_labels (0 where absent)."""
+        return self._r["wants"]
+
+    @staticmethod
+    def _breakdown(labels, values, present, order) -> dict:
+        idx = np.flatnonzero(present)
+        idx = idx[np.argsort(order[idx], kind="stable")]
+        return {labels[j]: int(values[j]) for j in idx.tolist()}
+
+    def plan(self, i: int) -> dict:
+        r = self._r
+        data_months = int(self.data_months[i])
+        income = float(r["monthly_income"][i])
+        savings = float(r["savings"][i])
+        spending_cap = float(r["spending_cap"][i])
+        custom = bool(r["custom"][i])
+        notes = budget_notes(
+            custom=custom,
+            income_provided=bool(r["income_provided"][i]),
+            monthly_income=income,
+            savings=savings,
+            data_months=data_months,
+            fixed_allocated=float(r["fixed_allocated"][i]),
+            spending_cap=spending_cap,
+            fixed_exceeds_cap=bool(r["fixed_exceeded"][i]),
+            needs_starter=bool(r["needs_starter"][i]),
+            wants_starter=bool(r["wants_starter"][i]),
+        )
+        return {
+            "monthly_income":      int(income) if income else 0,
+            "recommended_savings": int(savings),
+            "total_living_budget": int(spending_cap),
+            "needs_total":         int(r["needs_cap"][i]),
+            "needs_breakdown":     self._breakdown(self.needs_labels, r["needs"][i], r["needs_present"][i], r["needs_order"][i]),
+            "wants_total":         int(r["wants_cap"][i]),
+            "wants_breakdown":     self._breakdown(self.wants_labels, r["wants"][i], r["wants_present"][i], r["wants_order"][i]),
+            "note":                notes,
+            "using_503020":        not custom,
+            "data_months":         data_months,
+        }
+
+    def plans(self) -> list:
+        return [self.plan(i) for i in range(len(self))]
+
+
+def category_layout(labels, needs_labels, wants_labels, fixed_labels):
+    """
+    Returns (is_need, is_fixed, needs_rank, wants_rank) for categories in
+    forecast order, reproducing the dict implementation's breakdown order:
+    fixed needs before variable needs, known wants before unclassified ones.
+    """
+    n = len(labels)
+    pos = np.arange(n)
+    is_need = np.array([c in needs_labels for c in labels], dtype=bool)
+    is_fixed = np.array([c in fixed_labels for c in labels], dtype=bool)
+    is_want = np.array([c in wants_labels for c in labels], dtype=bool)
+    needs_rank = pos + np.where(is_fixed, 0, n)
+    wants_rank = pos + np.where(is_want, 0, n)
+    return is_need, is_fixed, needs_rank, wants_rank
+
+
+def _starter_fixed(fixed_labels) -> np.ndarray:
+    return np.array([name in fixed_labels for name, _ in STARTER_NEEDS], dtype=bool)
+
+
+# ── Scenarios ─────────────────────────────────────────────────────────────────
+def allocate_scenarios(
+    breakdown: dict,
+    scenarios,
+    needs_labels,
+    wants_labels,
+    fixed_labels,
+    data_months: int = 0,
+) -> PlanMatrix:
+    """
+    Allocates one forecast breakdown under many scenarios in a single pass.
+
+    Args:
+        breakdown:  {label: predicted spend} from predict_next_month_budget
+        scenarios:  sequence of (monthly_income, total_budget) pairs; either
+                    may be None, with the same meaning as create_balanced_budget
+    """
+    labels = [c for c, v in breakdown.items() if v > 0]
+    scenarios = list(scenarios)
+    n = len(scenarios)
+    incomes = _as_optional([s[0] for s in scenarios], n)
+    budgets = _as_optional([s[1] for s in scenarios], n)
+
+    pred = np.broadcast_to(
+        np.array([float(breakdown[c]) for c in labels], dtype=np.float64), (n, len(labels))
+    )
+    is_need, is_fixed, needs_rank, wants_rank = category_layout(
+        labels, needs_labels, wants_labels, fixed_labels
+    )
+    result = allocate_matrix(
+        pred, is_need, is_fixed, needs_rank, wants_rank,
+        incomes, budgets, starter_fixed=_starter_fixed(fixed_labels),
+    )
+    return PlanMatrix(labels, result, data_months)
+
+
+# ── Many users ────────────────────────────────────────────────────────────────
+def allocate_many(
+    forecasts,
+    monthly_incomes,
+    total_budgets,
+    needs_labels,
+    wants_labels,
+    fixed_labels,
+) -> PlanMatrix:
+    """
+    Allocates many users' forecasts in one pass.
+
+    Each forecast's breakdown becomes one row of a (users × categories)
+    matrix over the union of all labels; each row keeps its own breakdown
+    order, so `plan(i)` equals allocate_budget(forecasts[i], ...).
+
+    Args:
+        forecasts:       sequence of predict_next_month_budget results
+        monthly_incomes: scalar or per-user sequence (None = not provided)
+        total_budgets:   scalar or per-user sequence (None = no custom cap)
+    """
+    forecasts = list(forecasts)
+    n = len(forecasts)
+
+    # One pass over all breakdowns → flat (row, column, value, position) lists
+    column = {}
+    rows, cols, values, positions = [], [], [], []
+    for i, fc in enumerate(forecasts):
+        p = 0
+        for label, value in fc["breakdown"].items():
+            if value > 0:
+                rows.append(i)
+                cols.append(column.setdefault(label, len(column)))
+                values.append(value)
+                positions.append(p)
+                p += 1
+    labels = list(column)
+    C = len(labels)
+
+    pred = np.zeros((n, C), dtype=np.float64)
+    pos = np.full((n, C), C, dtype=np.int64)
+    pred[rows, cols] = values
+    pos[rows, cols] = positions
+
+    is_need, is_fixed, _, _ = category_layout(labels, needs_labels, wants_labels, fixed_labels)
+    is_want = np.array([c in wants_labels for c in labels], dtype=bool)
+    needs_rank = pos + np.where(is_fixed, 0, C)
+    wants_rank = pos + np.where(is_want, 0, C)
+
+    result = allocate_matrix(
+        pred, is_need, is_fixed, needs_rank, wants_rank,
+        _as_optional(monthly_incomes, n), _as_optional(total_budgets, n),
+        starter_fixed=_starter_fixed(fixed_labels),
+    )
+    data_months = [fc.get("data_months", 0) for fc in forecasts]
+    return PlanMatrix(labels, result, data_months)
@@ -0,0 +1,229 @@
+"""
+async_planner.py
+asyncio façade over BudgetAI for embedding the planner in an async service.
+
+Forecasting (the CPU-bound part: SARIMA fits) runs in a shared process pool;
+allocation is cheap and runs on the event loop. Concurrent requests for the
+same user and identical history share one forecast computation. A request that
+hits its deadline gets the mean-based fallback forecast instead of waiting.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from budget_planner import BudgetAI
+from models.sarima_snapshot import open_snapshot
+from planning_core import PlanningCore
+from transactions import TransactionBatch
+
+
+# ── Shared process pool ───────────────────────────────────────────────────────
+_POOLS = {}     # worker settings key → ProcessPoolExecutor
+_POOL_LOCK = threading.Lock()
+
+
+def worker_settings(ai: BudgetAI = None) -> dict:
+    """The BudgetAI configuration a pool worker needs to forecast like `ai`."""
+    if ai is None:
+        return {}
+    return {
+        "deterministic": ai.deterministic,
+        "pooled_model":  ai.pooled_model,
+        "labeler":       ai.core.labeler,
+    }
+
+
+def _settings_key(settings: dict):
+    if not settings:
+        return None
+    return (settings["deterministic"], id(settings["pooled_model"]), id(settings["labeler"]))
+
+
+def shared_process_pool(max_workers: int = None, ai: BudgetAI = None) -> ProcessPoolExecutor:
+    """
+    Returns the process-wide forecasting pool whose workers are configured
+    like `ai` (default: a plain BudgetAI), creating it on first use.
+    """
+    settings = worker_settings(ai)
+    key = _settings_key(settings)
+    with _POOL_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = ProcessPoolExecutor(
+                max_workers=max_workers or os.cpu_count(),
+                initializer=_init_worker,
+                initargs=(settings,),
+            )
+        return pool
+
+
+def shutdown_shared_pool(wait: bool = True) -> None:
+    with _POOL_LOCK:
+        for pool in _POOLS.values():
+            pool.shutdown(wait=wait, cancel_futures=True)
+        _POOLS.clear()
+
+
+_WORKER_AI = None
+
+
+def _init_worker(settings: dict = None) -> None:
+    """
+    Pool initializer: builds the process's BudgetAI from worker_settings()
+    and maps the $SARIMA_SNAPSHOT file, so all workers share its pages.
+    """
+    global _WORKER_AI
+    settings = settings or {}
+    ai = BudgetAI(
+        pooled_model=settings.get("pooled_model"),
+        snapshot=open_snapshot(),
+        deterministic=settings.get("deterministic", False),
+    )
+    labeler = settings.get("labeler")
+    if labeler is not None:
+        ai.categorizer = labeler
+        ai.core = PlanningCore(labeler)
+    _WORKER_AI = ai
+
+
+def _forecast_worker(batch: TransactionBatch, fit_models: bool = True) -> dict:
+    """Runs in a pool worker; the BudgetAI instance is reused per process."""
+    if _WORKER_AI is None:
+        _init_worker()
+    return _WORKER_AI.predict_next_month_budget(batch, fit_models=fit_models)
+
+
+# ── In-flight deduplication ───────────────────────────────────────────────────
+class _Flight:
+    """One running forecast and the number of requests waiting on it."""
+
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.waiters = 0
+
+
+# ── AsyncBudgetAI ─────────────────────────────────────────────────────────────
+class AsyncBudgetAI:
+    """
+    Async wrapper around BudgetAI.
+
+    Args:
+        ai:               BudgetAI used for allocation and fallback forecasts
+        executor:         executor for forecasting (default: the shared process
+                          pool configured like `ai`); a process pool of your
+                          own needs initializer=_init_worker and
+                          initargs=(worker_settings(ai),), any other executor
+                          runs `ai` itself
+        default_deadline: seconds a request may wait for its forecast before
+                          falling back to the mean-based forecast (None = no limit)
+    """
+
+    def __init__(self, ai: BudgetAI = None, executor=None, default_deadline: float = None):
+        self.ai = ai or BudgetAI()
+        self._executor = executor
+        self.default_deadline = default_deadline
+        self._inflight: dict = {}
+
+    @property
+    def executor(self):
+        return self._executor or shared_process_pool(ai=self.ai)
+
+    @property
+    def inflight(self) -> int:
+        """Number of distinct forecasts currently running."""
+        return len(self._inflight)
+
+    def _land(self, key, flight: _Flight) -> None:
+        """Forgets a finished or abandoned flight (unless a newer one took its key)."""
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    async def _fallback(self, batch: TransactionBatch) -> dict:
+        """Mean-based forecast, run in the loop's default executor."""
+        forecast = await asyncio.get_running_loop().run_in_executor(
+            None, partial(self.ai.predict_next_month_budget, batch, fit_models=False)
+        )
+        forecast["degraded"] = True
+        return forecast
+
+    def _forecast_job(self, batch: TransactionBatch):
+        if isinstance(self.executor, ProcessPoolExecutor):
+            return partial(_forecast_worker, batch)
+        return partial(self.ai.predict_next_month_budget, batch)
+
+    async def aforecast(
+        self,
+        transaction_history,
+        *,
+        user_id: str = None,
+        deadline: float = None,
+        fit_models: bool = True,
+    ) -> dict:
+        """
+        Async predict_next_month_budget.
+
+        Identical concurrent calls (same user_id and same history) await one
+        shared computation. If `deadline` seconds pass first, the mean-based
+        fallback forecast is returned with "degraded": True. Cancelling a
+        caller only cancels the underlying job once no other caller waits on
+        it (a job already running in a worker process runs to completion).
+        """
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        deadline = self.default_deadline if deadline is None else deadline
+
+        batch = await loop.run_in_executor(None, TransactionBatch.coerce, transaction_history)
+        if not fit_models:
+            return await self._fallback(batch)
+
+        key = (user_id, batch.fingerprint())
+        flight = self._inflight.get(key)
+        if flight is None:
+            future = loop.run_in_executor(self.executor, self._forecast_job(batch))
+            flight = self._inflight[key] = _Flight(future)
+            future.add_done_callback(lambda _f, key=key, flight=flight: self._land(key, flight))
+
+        flight.waiters += 1
+        try:
+            if deadline is None:
+                return await asyncio.shield(flight.future)
+            remaining = max(0.0, deadline - (time.monotonic() - started))
+            try:
+                return await asyncio.wait_for(asyncio.shield(flight.future), remaining)
+            except asyncio.TimeoutError:
+                return await self._fallback(batch)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.future.done():
+                flight.future.cancel()
+                self._land(key, flight)
+
+    async def acreate_balanced_budget(
+        self,
+        transaction_history,
+        monthly_income: float = None,
+        total_budget: float = None,
+        *,
+        user_id: str = None,
+        deadline: float = None,
+    ) -> dict:
+        """
+        Async create_balanced_budget. Same result dict (income forecast
+        fallback, "input_hash" in deterministic mode); when the deadline was
+        hit the plan is built from the fallback forecast and carries
+        "degraded": True.
+        """
+        batch = await asyncio.get_running_loop().run_in_executor(
+            None, TransactionBatch.coerce, transaction_history
+        )
+        forecast = await self.aforecast(batch, user_id=user_id, deadline=deadline)
+        plan = self.ai.plan_from_forecast(forecast, monthly_income, total_budget, batch=batch)
+        if forecast.get("degraded"):
+            plan["degraded"] = True
+        return plan
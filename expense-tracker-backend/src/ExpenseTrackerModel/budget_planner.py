@@ -11,75 +11,51 @@ Allocation logic:
   3. Hard cap ensures total never exceeds spending_cap
 """
 
-import pandas as pd
+from collections import Counter
+from statistics import NormalDist
+
 import numpy as np
 from models.linear_trend import MonthlyTrendRegressor
 from models.sarima_trend import MonthlySARIMATrendRegressor
-
-
-# ── Keyword-based categorizer ─────────────────────────────────────────────────
-class KeywordCategorizer:
-    """
-    Maps app category values (rent, food, bills...) to standardized labels
-    that match mandatory_labels and wants_labels in BudgetAI.
-    Falls back to keyword matching on description text.
-    """
-
-    # App DB value → standardized label
-    CATEGORY_MAP = {
-        "rent":          "House Rent",
-        "bills":         "Utilities",
-        "phone":         "Utilities",
-        "groceries":     "Groceries",
-        "health":        "Healthcare",
-        "education":     "Education",
-        "transport":     "Transportation",
-        "food":          "Dining Out",
-        "entertainment": "Entertainment",
-        "shopping":      "Shopping",
-        "travel":        "Travel",
-        "fitness":       "Health and Fitness",
-        "other":         "Miscellaneous",
-    }
-
-    # Keyword fallback: (keywords, label)
-    KEYWORD_MAP = [
-        (["rent", "house", "flat", "bari", "basa", "apartment", "mortgage", "emi", "loan", "installment"], "House Rent"),
-        (["groceries", "grocery", "bazar", "shwapno", "meena", "supermarket", "vegetable", "rice", "fish", "meat"], "Groceries"),
-        (["electricity", "wasa", "water", "gas", "internet", "wifi", "broadband", "utility", "utilities", "bill", "bills"], "Utilities"),
-        (["phone", "mobile", "recharge", "airtel", "robi", "grameenphone", "gp", "banglalink"], "Utilities"),
-        (["school", "college", "university", "tuition", "tution", "coach", "education", "books"], "Education"),
-        (["doctor", "hospital", "pharmacy", "medicine", "clinic", "health", "labaid"], "Healthcare"),
-        (["bus", "train", "cng", "rickshaw", "uber", "pathao", "fuel", "petrol", "metro", "transport"], "Transportation"),
-        (["restaurant", "dining", "cafe", "coffee", "foodpanda", "shohoz", "fast food", "kfc", "pizza"], "Dining Out"),
-        (["netflix", "spotify", "youtube", "movie", "cinema", "game", "pubg", "entertainment", "subscription"], "Entertainment"),
-        (["daraz", "clothing", "fashion", "shoes", "bag", "accessories", "shopping"], "Shopping"),
-        (["travel", "hotel", "flight", "trip", "vacation", "tour"], "Travel"),
-        (["gym", "fitness", "yoga", "sport", "workout"], "Health and Fitness"),
-    ]
-
-    def predict(self, category: str, description: str = "") -> str:
-        # 1. Direct category value match (most reliable - app stores clean values)
-        if category:
-            clean = str(category).strip().lower()
-            if clean in self.CATEGORY_MAP:
-                return self.CATEGORY_MAP[clean]
-
-        # 2. Keyword match on combined category + description text
-        text = f"{category} {description}".lower()
-        for keywords, label in self.KEYWORD_MAP:
-            if any(kw in text for kw in keywords):
-                return label
-
-        return "Miscellaneous"
+from models.sarima_snapshot import SnapshotReader, series_key
+from models.pooled_trend import PooledSeasonalModel
+from categorizer import KeywordCategorizer
+from allocation import (
+    DEFAULT_INCOME, STARTER_NEEDS, STARTER_WANTS,
+    PlanMatrix, allocate_many, allocate_scenarios, budget_notes,
+)
+from planning_core import PlanningCore
+from telemetry import get_telemetry
+from transactions import MonthlyTotals, TransactionBatch, epoch_month_to_period
 
 
 # ── BudgetAI ──────────────────────────────────────────────────────────────────
 class BudgetAI:
 
+    # Forecast routes counted in predict_next_month_budget()["model_paths"]
+    MODEL_PATHS = (
+        "fixed", "short_mean", "skipped_fit", "pooled",
+        "sarima", "sarima_snapshot", "sarima_fallback",
+    )
+
+    # auto_arima search budget per series; past it the best model so far is used
+    SARIMA_MAX_CANDIDATES = 30
+    SARIMA_TIME_LIMIT = 2.0   # seconds
+
     # Categories that are non-negotiable (never scale down below historical)
     FIXED_CATEGORIES = {"House Rent", "EMI/Loan/Insurance", "Rent"}
 
+    # Other labels are forecast as fixed when the data says so (_detect_fixed):
+    # at least FIXED_MIN_MONTHS months, monthly totals within FIXED_MAX_CV, and
+    # either mostly flagged `recurring` or paid on a regular day of month
+    FIXED_MIN_MONTHS = 3
+    FIXED_MAX_CV = 0.1
+    FIXED_RECURRING_SHARE = 0.5
+    FIXED_DAY_REGULARITY = 0.9   # resultant length; ≈ ±2 days around one date
+
+    # Months of income behind the recent-mean income forecast
+    INCOME_WINDOW = 6
+
     NEEDS_LABELS = {
         "House Rent", "Rent", "Utilities", "Groceries",
         "EMI/Loan/Insurance", "Debt", "Transportation",
@@ -94,38 +70,102 @@ class BudgetAI:
         "Miscellaneous",  # catch-all → wants, not needs
     }
 
-    def __init__(self):
+    def __init__(self, pooled_model: PooledSeasonalModel = None,
+                 snapshot: SnapshotReader = None, state_sink: dict = None,
+                 deterministic: bool = False):
+        """
+        Args:
+            pooled_model: fitted PooledSeasonalModel; labels it covers are
+                          forecast from its shared parameters instead of a
+                          per-series SARIMA fit
+            snapshot:     SnapshotReader of fitted SARIMA states; a series
+                          found in it is forecast from the stored state
+                          instead of being refitted
+            state_sink:   dict collecting {series_key: SARIMAState} for every
+                          SARIMA forecast made, for write_snapshot()
+            deterministic: byte-identical output for the same input whatever
+                          its row order: rows are aggregated in canonical
+                          order, labels are emitted sorted, SARIMA runs
+                          without a wall-clock budget and with pinned
+                          optimizer settings, and plans carry "input_hash"
+        """
         self.categorizer = KeywordCategorizer()
+        self.core = PlanningCore(self.categorizer)
+        self.pooled_model = pooled_model
+        self.snapshot = snapshot
+        self.state_sink = state_sink
+        self.deterministic = deterministic
 
     # ── Trend prediction ──────────────────────────────────────────────────────
-    def _predict_category_trend(self, cat_data: pd.DataFrame, category_name: str = None) -> int:
+    def _predict_series(self, values: np.ndarray, category_name: str = None, paths: Counter = None) -> int:
         """
-        Predicts next month's spend for one category.
-        - Fixed categories (rent/EMI): use max of last 4 months (stable, no regression)
-        - ≤5 months data: simple mean × 1.05
-        - >5 months: SARIMA → fallback to recent mean if SARIMA fails
+        Predicts next month's spend from positive monthly totals (oldest first).
         """
-        if cat_data.empty:
-            return 0
+        mean, _, _ = self._forecast_series(values, category_name, steps=1, paths=paths)
+        return round(float(mean[0]))
 
-        monthly = (
-            cat_data
-            .groupby(cat_data["date"].dt.tz_localize(None).dt.to_period("M"))["amount"]
-            .sum()
-            .sort_index()
-        )
-        values = monthly[monthly > 0].values
+    def _predict_series_fast(self, values: np.ndarray, category_name: str = None, paths: Counter = None) -> int:
+        """Same routing as _predict_series but never fits a model."""
+        mean, _, _ = self._forecast_series(values, category_name, steps=1, fit_models=False, paths=paths)
+        return round(float(mean[0]))
 
+    def _forecast_series(
+        self,
+        values: np.ndarray,
+        category_name: str = None,
+        steps: int = 1,
+        alpha: float = 0.2,
+        fit_models: bool = True,
+        paths: Counter = None,
+        fixed: bool = False,
+    ):
+        """
+        Forecasts `steps` months of spend from positive monthly totals using at
+        most one model fit. Returns (mean, lower, upper) float arrays.
+        - Fixed categories (rent/EMI, or `fixed` for series detected by
+          _detect_fixed): use max of last 4 months (stable, no regression)
+        - ≤5 months data: simple mean × 1.05
+        - >5 months: stored SARIMA state from the snapshot when this exact
+          series is in it, else SARIMA → fallback to recent mean if SARIMA
+          fails (or straight to the recent mean when fit_models is False)
+        Mean-based paths are flat over the horizon with a ±z·std interval.
+        The route taken is counted in `paths` when given (see MODEL_PATHS).
+        """
+        if paths is None:
+            paths = Counter()
         if len(values) == 0:
-            return 0
+            zeros = np.zeros(steps)
+            return zeros, zeros, zeros
+        telemetry = get_telemetry()
+        telemetry.observe("forecast.series_length", len(values))
 
         # Fixed costs: trust the recent high, no regression needed
-        if category_name in self.FIXED_CATEGORIES:
-            return round(float(np.max(values[-4:])))
+        if fixed or category_name in self.FIXED_CATEGORIES:
+            paths["fixed"] += 1
+            flat = np.full(steps, float(np.max(values[-4:])))
+            return flat, flat, flat
 
         # Too few data points for SARIMA
         if len(values) <= 5:
-            return round(float(np.mean(values)) * 1.05)
+            paths["short_mean"] += 1
+            return self._flat_forecast(values, 1.05, steps, alpha)
+
+        # Stored state for this exact series → forecast without refitting
+        key = None
+        if self.snapshot is not None or self.state_sink is not None:
+            key = series_key(category_name, values)
+        state = self.snapshot.get(key) if self.snapshot is not None else None
+        if state is not None:
+            if self.state_sink is not None:
+                self.state_sink[key] = state
+            pred, lower, upper = MonthlySARIMATrendRegressor.from_state(state).predict_horizon(steps, alpha=alpha)
+            paths["sarima_snapshot"] += 1
+            return self._shape_model_forecast(values, pred, lower, upper)
+
+        # Cheap path requested (deadline hit, overload) → recent-mean fallback
+        if not fit_models:
+            paths["skipped_fit"] += 1
+            return self._flat_forecast(values[-6:], 1.07, steps, alpha)
 
         # Try SARIMA
         try:
@@ -134,102 +174,454 @@ class BudgetAI:
                 max_pdq=3,
                 max_PDQ=2,
                 stepwise=True,
+                max_candidates=self.SARIMA_MAX_CANDIDATES,
+                time_limit=self.SARIMA_TIME_LIMIT,
+                deterministic=self.deterministic,
             ).fit(values)
 
             if reg.is_fitted:
-                pred = reg.predict_next()
-                hist_max = float(values.max())
-                pred = min(pred, hist_max * 1.25)   # cap: max 25% above historical max
-                pred = max(pred, hist_max * 0.65)   # floor: min 65% of historical max
-                return round(pred * 1.05)           # small optimism buffer
+                if self.state_sink is not None:
+                    self.state_sink[key] = reg.to_state()
+                pred, lower, upper = reg.predict_horizon(steps, alpha=alpha)
+                paths["sarima"] += 1
+                return self._shape_model_forecast(values, pred, lower, upper)
 
             # SARIMA not fitted → fallback
-            return round(float(np.mean(values[-6:])) * 1.07)
+            telemetry.incr("forecast.sarima_fallback", tags={"reason": "not_fitted"})
+            paths["sarima_fallback"] += 1
+            return self._flat_forecast(values[-6:], 1.07, steps, alpha)
 
         except Exception as e:
-            print(f"SARIMA failed for {category_name}: {e}", file=__import__("sys").stderr)
-            return round(float(np.mean(values[-6:])) * 1.07)
-
-    # ── Filter to expenses only ───────────────────────────────────────────────
-    def _filter_expenses(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
-        col_map = {c.lower(): c for c in df.columns}
-        if "type" in col_map:
-            type_col = col_map["type"]
-            df = df[df[type_col].astype(str).str.lower().str.strip() != "income"]
-        df["amount"] = df["amount"].abs()
-        return df
-
-    # ── Per-category spend predictions ───────────────────────────────────────
-    def predict_next_month_budget(self, transaction_history: list) -> dict:
+            telemetry.incr("forecast.sarima_fallback", tags={"reason": "error"})
+            telemetry.event("forecast.sarima_error", f"{category_name}: {e}")
+            paths["sarima_fallback"] += 1
+            return self._flat_forecast(values[-6:], 1.07, steps, alpha)
+
+    @staticmethod
+    def _shape_model_forecast(values: np.ndarray, pred, lower, upper):
+        """Clamps a model forecast to the history's range and adds the buffer."""
+        hist_max = float(values.max())
+        pred = np.minimum(pred, hist_max * 1.25)   # cap: max 25% above historical max
+        pred = np.maximum(pred, hist_max * 0.65)   # floor: min 65% of historical max
+        pred = pred * 1.05                         # small optimism buffer
+        lower = np.minimum(np.maximum(lower * 1.05, 0.0), pred)
+        upper = np.maximum(upper * 1.05, pred)
+        return pred, lower, upper
+
+    @staticmethod
+    def _flat_forecast(values: np.ndarray, buffer: float, steps: int, alpha: float):
+        """Mean × buffer repeated over the horizon, with a normal ±z·std band."""
+        mean = np.full(steps, float(np.mean(values)) * buffer)
+        spread = NormalDist().inv_cdf(1 - alpha / 2) * float(np.std(values, ddof=1 if len(values) > 1 else 0))
+        return mean, np.maximum(mean - spread, 0.0), mean + spread
+
+    def _detect_fixed(self, totals: MonthlyTotals) -> frozenset:
         """
-        Returns predicted spend per labeled category for next month.
+        Labels whose history looks like a fixed bill, in one pass over the
+        label × month matrix: enough months, low dispersion of the monthly
+        totals, and a `recurring` flag or a regular day of month.
         """
-        df = pd.DataFrame(transaction_history)
-        if df.empty:
-            return {"breakdown": {}, "total_predicted": 0}
+        if not len(totals):
+            return frozenset()
+        positive = totals.values > 0
+        n = positive.sum(axis=1)
+        total = np.where(positive, totals.values, 0.0).sum(axis=1)
+        squares = np.where(positive, totals.values ** 2, 0.0).sum(axis=1)
+        mean = total / np.maximum(n, 1)
+        std = np.sqrt(np.maximum(squares / np.maximum(n, 1) - mean ** 2, 0.0))
+        cv = np.divide(std, mean, out=np.full(len(mean), np.inf), where=mean > 0)
+
+        fixed = (
+            (n >= self.FIXED_MIN_MONTHS)
+            & (cv <= self.FIXED_MAX_CV)
+            & (
+                (totals.recurring_share >= self.FIXED_RECURRING_SHARE)
+                | (totals.day_regularity >= self.FIXED_DAY_REGULARITY)
+            )
+        )
+        return frozenset(label for label, hit in zip(totals.labels, fixed) if hit and label)
 
-        df["date"] = pd.to_datetime(df["date"], errors="coerce", utc=True)
-        df = df.dropna(subset=["date", "amount", "category"])
-        df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0)
-        df = self._filter_expenses(df)
+    def _clip_outliers(self, totals: MonthlyTotals, fixed: frozenset):
+        """
+        Pre-forecast stage: Hampel-winsorizes outlier months of every label
+        at once (PlanningCore.winsorize), so a one-off purchase neither drags
+        the recent mean nor makes SARIMA fit a spike. Fixed labels keep their
+        raw totals; their forecast already trusts the recent high.
+        """
+        clipped, flags = self.core.winsorize(totals, exclude=fixed | self.FIXED_CATEGORIES)
+        if flags.any():
+            get_telemetry().incr("forecast.outlier_months", int(np.count_nonzero(flags)))
+        return clipped, flags
+
+    def _outlier_months(self, totals: MonthlyTotals, flags) -> dict:
+        """{"outliers": {label: ["YYYY-MM", ...]}} for clipped months, or {}."""
+        rows, cols = np.nonzero(flags)
+        if not len(rows):
+            return {}
+        outliers = {}
+        for i, j in zip(rows, cols):
+            outliers.setdefault(totals.labels[i], []).append(epoch_month_to_period(totals.start_month + j))
+        if self.deterministic:
+            outliers = dict(sorted(outliers.items()))
+        return {"outliers": outliers}
+
+    def _one_off_rows(self, batch: TransactionBatch, totals: MonthlyTotals, clipped: MonthlyTotals) -> list:
+        """
+        The single purchases behind clipped months (PlanningCore.one_offs) as
+        [{"date", "amount", "label", "category", "description"}, ...], oldest
+        first; "date" is "YYYY-MM-DD", or "YYYY-MM" when the day is unknown.
+        """
+        codes, labels = batch.label_codes(self.core.labeler)
+        rows = []
+        for i in np.flatnonzero(self.core.one_offs(batch, totals, clipped)):
+            date = epoch_month_to_period(int(batch.month[i]))
+            if batch.day[i] > 0:
+                date += f"-{int(batch.day[i]):02d}"
+            rows.append({
+                "date":        date,
+                "amount":      round(float(batch.amount[i]), 2),
+                "label":       labels[codes[i]],
+                "category":    batch.categories[batch.category[i]],
+                "description": batch.descriptions[batch.description[i]],
+            })
+        # Sorted on content, so the list does not depend on row order
+        return sorted(rows, key=lambda r: (r["date"], r["label"], -r["amount"], r["description"]))
+
+    def _fixed_predictor(self, fixed: frozenset, fallback):
+        """Wraps a series predictor so detected fixed labels take the fixed path."""
+
+        def predict(values, category_name=None, paths=None):
+            if category_name in fixed:
+                mean, _, _ = self._forecast_series(values, category_name, paths=paths, fixed=True)
+                return round(float(mean[0]))
+            return fallback(values, category_name=category_name, paths=paths)
+
+        return predict
+
+    def _uses_pooled(self, label: str, values) -> bool:
+        """Whether the pooled model forecasts `label` (past the fixed / short-history rules)."""
+        return (
+            self.pooled_model is not None
+            and label not in self.FIXED_CATEGORIES
+            and len(values) > 5
+            and label in self.pooled_model
+        )
 
-        if df.empty:
-            return {"breakdown": {}, "total_predicted": 0}
+    def _pooled_predictor(self, totals: MonthlyTotals, fallback):
+        """
+        Wraps a series predictor so labels covered by the pooled model (and
+        past the fixed / short-history rules) are forecast by lookup plus
+        arithmetic; everything else goes to `fallback`.
+        """
+        rows = {label: i for i, label in enumerate(totals.labels)}
+
+        def predict(values, category_name=None, paths=None):
+            if not self._uses_pooled(category_name, values):
+                return fallback(values, category_name=category_name, paths=paths)
+            row = totals.values[rows[category_name]]
+            months = np.flatnonzero(row > 0) + totals.start_month
+            pred = self.pooled_model.forecast(category_name, values, months, totals.end_month)
+            pred, _, _ = self._shape_model_forecast(values, pred, pred, pred)
+            paths["pooled"] += 1
+            return round(float(pred[0]))
+
+        return predict
+
+    # ── Aggregate history ─────────────────────────────────────────────────────
+    def _batch(self, transaction_history) -> TransactionBatch:
+        """Parses the history once; rows in canonical order in deterministic mode."""
+        batch = self.core.batch(transaction_history)
+        return batch.canonical() if self.deterministic else batch
+
+    def _monthly_totals(self, transaction_history) -> MonthlyTotals:
+        """
+        Reduces a list of transaction dicts or a TransactionBatch to the
+        label × month expense matrix used by every prediction step.
+        """
+        if isinstance(transaction_history, MonthlyTotals):
+            return transaction_history
+        return self.core.totals(self._batch(transaction_history))
 
-        df["label"] = df.apply(
-            lambda row: self.categorizer.predict(
-                row.get("category", ""),
-                row.get("description", "")
-            ),
-            axis=1,
+    # ── Income ────────────────────────────────────────────────────────────────
+    def predict_next_month_income(self, transaction_history) -> dict:
+        """
+        Forecasts next month's income from the history's income rows (type
+        "Income"), using the cheap routes of _forecast_series without the
+        spending buffers:
+        - steady pay (last FIXED_MIN_MONTHS months all paid, monthly totals
+          within FIXED_MAX_CV over the last 4): median of the last 4 months
+        - ≤5 months: mean of all months
+        - longer: mean of the last INCOME_WINDOW months
+        Only complete months are used: the history's latest month is taken
+        to be in progress. Months without income before it count as 0, so
+        irregular income lowers the forecast instead of being skipped.
+
+        Returns {"predicted_income", "income_months", "income_path"}, or {}
+        when the history has no income rows.
+        """
+        if isinstance(transaction_history, MonthlyTotals):
+            return {}
+        return self._income_forecast(self._batch(transaction_history))
+
+    def _income_forecast(self, batch: TransactionBatch) -> dict:
+        if not batch.is_income.any():
+            return {}
+        # The history's latest month is still in progress: income paid later
+        # in it must not count as a missed month, so the series (and the
+        # steady test) stops at the last complete month, unless that leaves
+        # no income at all
+        _, values = batch.monthly_series(income=True, end_month=int(batch.month.max()))
+        if not len(values) or values.max() <= 0:
+            _, values = batch.monthly_series(income=True)
+        if not len(values) or values.max() <= 0:
+            return {}
+
+        recent = values[-4:]
+        steady = (
+            len(values) >= self.FIXED_MIN_MONTHS
+            and bool((values[-self.FIXED_MIN_MONTHS:] > 0).all())
+            and float(recent.std()) <= self.FIXED_MAX_CV * float(recent.mean())
         )
+        if steady:
+            path, pred = "fixed", np.median(recent)
+        elif len(values) <= 5:
+            path, pred = "short_mean", values.mean()
+        else:
+            path, pred = "recent_mean", values[-self.INCOME_WINDOW:].mean()
 
-        predictions = {}
-        for label in df["label"].unique():
-            if not label:
-                continue
-            cat_data = df[df["label"] == label]
-            pred = self._predict_category_trend(cat_data, category_name=label)
-            if pred > 0:
-                predictions[label] = pred
+        get_telemetry().incr("income.path", tags={"path": path})
+        return {
+            "predicted_income": round(float(pred)),
+            "income_months":    int(np.count_nonzero(values)),
+            "income_path":      path,
+        }
+
+    # ── Per-category spend predictions ───────────────────────────────────────
+    def predict_next_month_budget(self, transaction_history, fit_models: bool = True) -> dict:
+        """
+        Returns predicted spend per labeled category for next month, plus the
+        number of months of expense history behind it. The result is the
+        forecast input to allocate_budget / plan_scenarios.
+
+        Outlier months are Hampel-clipped across all labels before
+        forecasting (see _clip_outliers); when any are, the result carries
+        "outliers" ({label: ["YYYY-MM", ...]}) and "one_offs", the single
+        purchases behind them (see _one_off_rows). When the history also holds income
+        rows, the result carries predict_next_month_income's keys, computed
+        from the same parsed batch.
+
+        Args:
+            transaction_history: list of transaction dicts or a TransactionBatch
+            fit_models:          False skips SARIMA and uses the recent-mean
+                                 fallback for long series (no model fits)
+        """
+        telemetry = get_telemetry()
+        with telemetry.span("planner.predict_next_month", tags={"fit_models": fit_models}):
+            batch = None
+            if isinstance(transaction_history, MonthlyTotals):
+                totals, income = transaction_history, {}
+            else:
+                batch = self._batch(transaction_history)
+                totals, income = self.core.totals(batch), self._income_forecast(batch)
+            fixed = self._detect_fixed(totals)
+            clipped, flags = self._clip_outliers(totals, fixed)
+            predict = self._predict_series if fit_models else self._predict_series_fast
+            if self.pooled_model is not None:
+                predict = self._pooled_predictor(clipped, predict)
+            if fixed:
+                predict = self._fixed_predictor(fixed, predict)
+            predictions, paths = self.core.forecast(clipped, predict)
+            outliers = self._outlier_months(totals, flags)
+            if outliers and batch is not None:
+                outliers["one_offs"] = self._one_off_rows(batch, totals, clipped)
+        for path, count in paths.items():
+            telemetry.incr("forecast.path", count, tags={"path": path})
+        if self.deterministic:
+            predictions = dict(sorted(predictions.items()))
+            paths = dict(sorted(paths.items()))
 
-        return {"breakdown": predictions, "total_predicted": sum(predictions.values())}
+        return {
+            "breakdown":       predictions,
+            "total_predicted": sum(predictions.values()),
+            "data_months":     totals.data_months,
+            "model_paths":     dict(paths),
+            **outliers,
+            **income,
+        }
+
+    # ── Multi-month forecast ──────────────────────────────────────────────────
+    def predict_budget_horizon(self, transaction_history, months: int = 3, alpha: float = 0.2) -> dict:
+        """
+        Forecasts spend per labeled category for each of the next `months`
+        months. Each category is fitted once and forecast `months` steps ahead,
+        so the number of model fits matches a single-month prediction; labels
+        the pooled model covers are forecast from its shared parameters, as in
+        predict_next_month_budget.
+
+        Returns:
+            {"months": [{"month": "YYYY-MM", "breakdown": {...},
+                         "intervals": {label: [lower, upper]},
+                         "total_predicted": int}, ...],
+             "confidence": 1 - alpha}
+        """
+        if months < 1:
+            raise ValueError("months must be >= 1")
+
+        totals = self._monthly_totals(transaction_history)
+        if not len(totals):
+            return {"months": [], "confidence": 1 - alpha}
+
+        fixed = self._detect_fixed(totals)
+        clipped, _ = self._clip_outliers(totals, fixed)
+        first_month = totals.end_month
+        targets = first_month + np.arange(months)
+        forecasts = {}
+        with get_telemetry().span("planner.predict_horizon", tags={"months": months}):
+            for label, values, value_months in clipped.positive_series():
+                if not label:
+                    continue
+                if label not in fixed and self._uses_pooled(label, values):
+                    forecasts[label] = self._shape_model_forecast(
+                        values, *self.pooled_model.forecast_interval(label, values, value_months, targets, alpha)
+                    )
+                else:
+                    forecasts[label] = self._forecast_series(
+                        values, label, steps=months, alpha=alpha, fixed=label in fixed
+                    )
+
+        horizon = []
+        for step in range(months):
+            breakdown, intervals = {}, {}
+            for label, (mean, lower, upper) in forecasts.items():
+                pred = round(float(mean[step]))
+                if pred > 0:
+                    breakdown[label] = pred
+                    intervals[label] = [round(float(lower[step])), round(float(upper[step]))]
+            horizon.append({
+                "month":           epoch_month_to_period(first_month + step),
+                "breakdown":       breakdown,
+                "intervals":       intervals,
+                "total_predicted": sum(breakdown.values()),
+            })
+
+        return {"months": horizon, "confidence": 1 - alpha}
 
     # ── Main budget builder ───────────────────────────────────────────────────
     def create_balanced_budget(
         self,
-        transaction_history: list,
+        transaction_history,
         monthly_income: float = None,
         total_budget: float = None,
+        forecast: dict = None,
     ) -> dict:
         """
         Builds a personalized monthly budget.
 
         Args:
-            transaction_history: list of expense dicts from DB
-            monthly_income:      user's monthly income (optional)
+            transaction_history: list of expense (and income) dicts from DB, or
+                                 a TransactionBatch
+            monthly_income:      user's monthly income (optional; when missing,
+                                 income is forecast from the history's income
+                                 rows, see predict_next_month_income)
             total_budget:        user's custom spending cap (optional)
+            forecast:            precomputed predict_next_month_budget result
+                                 carrying a "watermark" (see precompute_forecasts.py);
+                                 used only when it matches the watermark of the
+                                 history's expense rows, otherwise the forecast
+                                 is computed live
+
+        Returns dict matching aiController.js + BudgetPlan schema, plus
+        "input_hash" (PlanningCore.input_hash) in deterministic mode.
+        """
+        batch = None
+        if (forecast is not None or self.deterministic) and not isinstance(transaction_history, MonthlyTotals):
+            batch = self.core.batch(transaction_history)
+        if forecast is not None and batch is not None:
+            if forecast.get("watermark") != batch.expenses().watermark():
+                forecast = self.predict_next_month_budget(batch)
+            else:
+                forecast = {**forecast, **self.predict_next_month_income(batch)}
+        else:
+            forecast = self.predict_next_month_budget(
+                transaction_history if batch is None else batch
+            )
+        return self.plan_from_forecast(forecast, monthly_income, total_budget, batch=batch)
 
-        Returns dict matching aiController.js + BudgetPlan schema.
+    def plan_from_forecast(
+        self,
+        forecast: dict,
+        monthly_income: float = None,
+        total_budget: float = None,
+        batch: TransactionBatch = None,
+    ) -> dict:
+        """
+        The allocation step every create_balanced_budget entry point shares:
+        a missing monthly_income falls back to the forecast's
+        "predicted_income", and in deterministic mode the plan carries the
+        "input_hash" of `batch` and the inputs as given.
         """
-        notes = []
+        plan = self.allocate_budget(
+            forecast, monthly_income or forecast.get("predicted_income"), total_budget
+        )
+        if self.deterministic and batch is not None:
+            plan["input_hash"] = self.core.input_hash(
+                batch, monthly_income=monthly_income, total_budget=total_budget
+            )
+        return plan
 
-        # ── Count data months ─────────────────────────────────────────────────
-        df = pd.DataFrame(transaction_history)
-        if df.empty:
-            num_months = 0
-        else:
-            df["date"] = pd.to_datetime(df["date"], errors="coerce", utc=True)
-            df = df.dropna(subset=["date"])
-            df = self._filter_expenses(df)
-            if df.empty:
-                num_months = 0
-            else:
-                num_months = df["date"].dt.tz_localize(None).dt.to_period("M").nunique()
+    # ── What-if scenarios ─────────────────────────────────────────────────────
+    def plan_scenarios(self, forecast: dict, scenarios) -> PlanMatrix:
+        """
+        Allocates one forecast under many (monthly_income, total_budget)
+        scenarios in a single vectorized pass. No forecasting is repeated.
 
-        # ── Get predicted spend per category ─────────────────────────────────
-        base_prediction = self.predict_next_month_budget(transaction_history)["breakdown"]
+        Args:
+            forecast:  result of predict_next_month_budget
+            scenarios: sequence of (monthly_income, total_budget) pairs; either
+                       value may be None, as in create_balanced_budget
+
+        Returns PlanMatrix; `.plan(i)` equals
+        allocate_budget(forecast, *scenarios[i]).
+        """
+        return allocate_scenarios(
+            forecast["breakdown"],
+            scenarios,
+            needs_labels=self.NEEDS_LABELS,
+            wants_labels=self.WANTS_LABELS,
+            fixed_labels=self.FIXED_CATEGORIES,
+            data_months=forecast.get("data_months", 0),
+        )
+
+    def allocate_many(self, forecasts, monthly_incomes=None, total_budgets=None) -> PlanMatrix:
+        """
+        Allocates many users' forecasts as one (users × categories) matrix.
+        Incomes / budgets may be scalars or per-user sequences; `.plan(i)`
+        equals allocate_budget(forecasts[i], monthly_incomes[i], total_budgets[i]).
+        """
+        return allocate_many(
+            forecasts,
+            monthly_incomes,
+            total_budgets,
+            needs_labels=self.NEEDS_LABELS,
+            wants_labels=self.WANTS_LABELS,
+            fixed_labels=self.FIXED_CATEGORIES,
+        )
+
+    # ── Allocation ────────────────────────────────────────────────────────────
+    def allocate_budget(
+        self,
+        forecast: dict,
+        monthly_income: float = None,
+        total_budget: float = None,
+    ) -> dict:
+        """
+        Turns a forecast from predict_next_month_budget into a budget plan.
+        Depends only on the forecast and the two user inputs, so it can be
+        re-run cheaply when income or the spending cap changes.
+        """
+        base_prediction = forecast["breakdown"]
+        num_months = forecast.get("data_months", 0)
+        income_provided = bool(monthly_income)
 
         # Classify predicted categories into needs / wants
         needs_categories = [c for c in base_prediction if c in self.NEEDS_LABELS]
@@ -247,28 +639,14 @@ class BudgetAI:
             savings = max(0.0, float(monthly_income) - spending_cap) if monthly_income else 0.0
             needs_pct = 0.60   # 60% of cap → needs
             wants_pct = 0.40   # 40% of cap → wants
-            notes.append("Custom spending limit applied — essentials protected first.")
-            if monthly_income and savings == 0:
-                notes.append("Spending limit equals or exceeds income — savings set to 0.")
         else:
             if not monthly_income:
-                monthly_income = 50000.0
-                notes.append(
-                    "No income provided — using ৳50,000 as default. "
-                    "Set your actual income for a personalized plan."
-                )
+                monthly_income = DEFAULT_INCOME
             monthly_income = float(monthly_income)
             spending_cap = monthly_income * 0.80
             savings      = monthly_income * 0.20
             needs_pct    = 0.625   # 50% of income = 62.5% of spending cap
             wants_pct    = 0.375   # 30% of income = 37.5% of spending cap
-            if num_months >= 3:
-                notes.append("50/30/20 rule applied, personalized from your spending history.")
-            else:
-                notes.append(
-                    f"Only {num_months} month(s) of data — using 50/30/20 as a safe baseline. "
-                    "Keep tracking for a fully personalized plan!"
-                )
 
         # ── Step 1: Fixed needs at full historical amount ─────────────────────
         needs_breakdown: dict = {}
@@ -285,10 +663,6 @@ class BudgetAI:
 
         # ── Step 2: Check if fixed alone exceeds cap ──────────────────────────
         if fixed_allocated >= spending_cap:
-            notes.append(
-                f"⚠️ Fixed essentials (Rent/EMI: ৳{int(fixed_allocated):,}) meet or exceed "
-                f"your ৳{int(spending_cap):,} limit. No room for other categories."
-            )
             wants_breakdown: dict = {}
             needs_cap = fixed_allocated
             wants_cap = 0.0
@@ -324,27 +698,15 @@ class BudgetAI:
             wants_cap = wants_cap_alloc
 
         # ── Fallback: no transaction data ─────────────────────────────────────
-        if not needs_breakdown:
-            notes.append("No expense history — using standard starter allocation.")
+        needs_starter = not needs_breakdown
+        if needs_starter:
             avail_needs = min(needs_cap, spending_cap - sum(wants_breakdown.values()))
-            needs_breakdown = {
-                "House Rent":           int(avail_needs * 0.40),
-                "Groceries":            int(avail_needs * 0.25),
-                "Utilities & Bills":    int(avail_needs * 0.15),
-                "Transportation":       int(avail_needs * 0.12),
-                "Healthcare":           int(avail_needs * 0.08),
-            }
+            needs_breakdown = {name: int(avail_needs * share) for name, share in STARTER_NEEDS}
 
-        if not wants_breakdown:
-            notes.append("No discretionary history — using standard starter allocation.")
+        wants_starter = not wants_breakdown
+        if wants_starter:
             avail_wants = min(wants_cap, max(0.0, spending_cap - sum(needs_breakdown.values())))
-            wants_breakdown = {
-                "Dining Out & Food Delivery":    int(avail_wants * 0.30),
-                "Entertainment & Subscriptions": int(avail_wants * 0.25),
-                "Shopping & Personal Care":      int(avail_wants * 0.20),
-                "Travel & Leisure":              int(avail_wants * 0.15),
-                "Miscellaneous":                 int(avail_wants * 0.10),
-            }
+            wants_breakdown = {name: int(avail_wants * share) for name, share in STARTER_WANTS}
 
         # ── Hard cap: guarantee total ≤ spending_cap ─────────────────────────
         total_allocated = sum(needs_breakdown.values()) + sum(wants_breakdown.values())
@@ -367,16 +729,18 @@ class BudgetAI:
                         if overflow <= 0:
                             break
 
-        # ── Savings advice note ───────────────────────────────────────────────
-        savings_rate = (savings / float(monthly_income) * 100) if monthly_income else 0
-        if savings_rate >= 20:
-            notes.append(f"🎉 On track to save ৳{int(savings):,} ({savings_rate:.0f}%) this month!")
-        elif savings_rate >= 10:
-            notes.append(f"👍 Saving ৳{int(savings):,} ({savings_rate:.0f}%). Aim for 20% for stronger financial health.")
-        elif savings_rate > 0:
-            notes.append(f"💡 Low savings rate ({savings_rate:.0f}%). Try trimming wants to build a safety net.")
-
-        notes.append("Every month you track, you get one step closer to financial freedom. Keep going! 💪")
+        notes = budget_notes(
+            custom=not use_503020,
+            income_provided=income_provided,
+            monthly_income=monthly_income,
+            savings=savings,
+            data_months=num_months,
+            fixed_allocated=fixed_allocated,
+            spending_cap=spending_cap,
+            fixed_exceeds_cap=fixed_allocated >= spending_cap,
+            needs_starter=needs_starter,
+            wants_starter=wants_starter,
+        )
 
         return {
             "monthly_income":      int(monthly_income) if monthly_income else 0,
@@ -1,69 +1,15 @@
-import pandas as pd
 import numpy as np
-from models.linear_trend import MonthlyTrendRegressor
-from models.sarima_trend import MonthlySARIMATrendRegressor
-from reports.performance import evaluate_linear_trend, evaluate_sarima
 
+from categorizer import KeywordCategorizer
+from planning_core import PlanningCore
 
-# ── KeywordCategorizer replaces LLMCategorizer (no Ollama needed) ────────────
-class KeywordCategorizer:
-    """
-    Maps app category values + description keywords to standardized labels.
-    Matches the mandatory_labels and wants_labels used in BudgetAI.
-    """
 
-    # Direct map from app category values → BudgetAI labels
-    CATEGORY_MAP = {
-        "rent":          "House Rent",
-        "bills":         "Utilities",
-        "phone":         "Utilities",
-        "groceries":     "Groceries",
-        "health":        "Healthcare",
-        "education":     "Education",
-        "transport":     "Transportation",
-        "food":          "Dining Out",
-        "entertainment": "Entertainment",
-        "shopping":      "Shopping",
-        "travel":        "Travel",
-        "fitness":       "Health and Fitness",
-        "other":         "Miscellaneous",
-    }
-
-    KEYWORD_MAP = [
-        (["rent", "house", "flat", "bari", "basa", "apartment", "mortgage", "emi", "loan", "installment"], "House Rent"),
-        (["groceries", "grocery", "bazar", "shwapno", "meena", "supermarket", "vegetable", "rice", "fish", "meat"], "Groceries"),
-        (["electricity", "wasa", "water", "gas", "internet", "wifi", "broadband", "utility", "utilities", "bill", "bills"], "Utilities"),
-        (["phone", "mobile", "recharge", "airtel", "robi", "grameenphone", "gp", "banglalink"], "Utilities"),
-        (["school", "college", "university", "tuition", "tution", "coach", "education", "books"], "Education"),
-        (["doctor", "hospital", "pharmacy", "medicine", "clinic", "health", "labaid"], "Healthcare"),
-        (["bus", "train", "cng", "rickshaw", "uber", "pathao", "fuel", "petrol", "metro", "transport"], "Transportation"),
-        (["restaurant", "dining", "cafe", "coffee", "foodpanda", "shohoz", "fast food", "kfc", "pizza"], "Dining Out"),
-        (["netflix", "spotify", "youtube", "movie", "cinema", "game", "pubg", "entertainment", "subscription"], "Entertainment"),
-        (["daraz", "clothing", "fashion", "shoes", "bag", "accessories", "shopping"], "Shopping"),
-        (["travel", "hotel", "flight", "trip", "vacation", "tour"], "Travel"),
-        (["gym", "fitness", "yoga", "sport", "workout"], "Health and Fitness"),
-    ]
-
-    def predict(self, category: str, description: str = "") -> str:
-        # 1. Direct category value match
-        if category:
-            clean = str(category).strip().lower()
-            if clean in self.CATEGORY_MAP:
-                return self.CATEGORY_MAP[clean]
-
-        # 2. Keyword match on category + description text
-        text = f"{category} {description}".lower()
-        for keywords, label in self.KEYWORD_MAP:
-            if any(kw in text for kw in keywords):
-                return label
-
-        return "Miscellaneous"
-
-
-# ── BudgetAI — your original logic, unchanged ─────────────────────────────────
+# ── BudgetAI ──────────────────────────────────────────────────────────────────
 class BudgetAI:
     def __init__(self):
         self.categorizer = KeywordCategorizer()
+        self.core = PlanningCore(self.categorizer)
+        self._forecaster = None
         self.mandatory_labels = [
             "Rent",
             "Utilities",
@@ -97,142 +43,30 @@ class BudgetAI:
         ]
         self.fixed_budget = ["Rent", "EMI/Loan/Insurance", "House Rent"]
 
-    # def _predict_category_trend(self, cat_data, category_name=None):
-    #     """
-    #     Predict next month amount using regression + safety caps
-    #     """
-    #     if cat_data.empty:
-    #         return 0
-
-    #     monthly = (
-    #         cat_data.groupby(cat_data["date"].dt.to_period("M"))["amount"]
-    #         .sum()
-    #         .sort_index()
-    #     )
-
-    #     values = monthly[monthly > 0].values
-
-    #     if len(values) == 0:
-    #         return 0
-
-    #     # Special handling for fixed costs: Use max of last 3 months instead of regression
-    #     # This prevents under-predicting rent/EMI if the trend is flat or slightly negative
-    #     if category_name in self.fixed_budget:
-    #         # If we have recent data, trust the recent high (e.g., rent increase)
-    #         return round(values[-3:].max()) if len(values) > 0 else 0
-
-    #     # Too little data → mean fallback
-    #     if len(values) <= 3:
-    #         return round(values.mean() * 1.05)
-
-    #     reg = MonthlyTrendRegressor().fit(values)
-    #     pred = reg.predict_next()
-    #     params = reg.get_params()
-
-    #     # 🔒 Safety logic
-    #     if params["slope"] <= 0:
-    #         return round(values.mean())
-
-    #     capped_pred = min(pred, values.max() * 1.2)
-    #     return round(capped_pred * 1.05)
-
-    def _predict_category_trend(self, cat_data, category_name=None):
-        if cat_data.empty:
-            return 0
-
-        monthly = (
-            cat_data.groupby(cat_data["date"].dt.tz_localize(None).dt.to_period("M"))["amount"]
-            .sum()
-            .sort_index()
-        )
-
-        values = monthly[monthly > 0].values
-
-        if len(values) == 0:
-            return 0
-
-        if category_name in self.fixed_budget:
-            return round(np.max(values[-4:])) if len(values) >= 1 else 0
-
-        if len(values) <= 5:
-            return round(np.mean(values) * 1.05)
-
-        try:
-            reg = MonthlySARIMATrendRegressor(
-                seasonal_period=12,
-                max_pdq=3,
-                max_PDQ=2,
-                stepwise=True,
-            ).fit(values)
-
-            if reg.is_fitted:
-                pred = reg.predict_next()
-                hist_max = values.max()
-                pred = min(pred, hist_max * 1.25)
-                pred = max(pred, hist_max * 0.65)
-                return round(pred * 1.05)
-
-            return round(np.mean(values[-6:]) * 1.07)
+    def _predict_series(self, values, category_name=None):
+        # budget_planner pulls in pmdarima / statsmodels; load it on first forecast
+        if self._forecaster is None:
+            from budget_planner import BudgetAI as _Forecaster
+            self._forecaster = _Forecaster()
+        return self._forecaster._predict_series(values, category_name)
 
-        except Exception as e:
-            print(f"SARIMA failed for {category_name}: {e}")
-            return round(np.mean(values[-6:]) * 1.07)
-
-    def _filter_expenses(self, df):
-        df = df.copy()
-        col_map = {c.lower(): c for c in df.columns}
-        if "type" in col_map:
-            type_col = col_map["type"]
-            df = df[df[type_col].astype(str).str.lower().str.strip() != "income"]
-        df["amount"] = df["amount"].abs()
-        return df
+    def _forecast(self, totals):
+        predictions, _ = self.core.forecast(totals, self._predict_series, keep_zero=True)
+        return {"breakdown": predictions, "total_predicted": sum(predictions.values())}
 
     def predict_next_month_budget(self, transaction_history):
-        df = pd.DataFrame(transaction_history)
-        if df.empty:
-            return {"breakdown": {}, "total_predicted": 0}
-
-        df["date"] = pd.to_datetime(df["date"], errors="coerce", utc=True)
-        df = df.dropna(subset=["date", "amount", "category"])
-        df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
+        return self._forecast(self.core.totals(transaction_history))
 
-        df = self._filter_expenses(df)
-
-        if df.empty:
-            return {"breakdown": {}, "total_predicted": 0}
-
-        df["predicted_category"] = df.apply(
-            lambda row: self.categorizer.predict(
-                row.get("category", ""),
-                row.get("description", "")
-            ), axis=1
+    def create_balanced_budget(self, transaction_history, monthly_income=None, total_budget=None):
+        return self.core.plan(
+            transaction_history, self._allocate,
+            monthly_income=monthly_income, total_budget=total_budget,
         )
 
-        predictions = {}
-        for cat in df["predicted_category"].unique():
-            cat_data = df[df["predicted_category"] == cat]
-            predictions[cat] = self._predict_category_trend(cat_data, category_name=cat)
-
-        return {"breakdown": predictions, "total_predicted": sum(predictions.values())}
-
-    def create_balanced_budget(self, transaction_history, monthly_income=None, total_budget=None):
+    def _allocate(self, totals, monthly_income=None, total_budget=None):
         note = []
-
-        df = pd.DataFrame(transaction_history)
-        if df.empty:
-            num_months = 0
-        else:
-            df["date"] = pd.to_datetime(df["date"], errors="coerce", utc=True)
-            df = df.dropna(subset=["date"])
-            df = self._filter_expenses(df)
-            if df.empty:
-                num_months = 0
-            else:
-                df["month"] = df["date"].dt.tz_localize(None).dt.to_period("M")
-                num_months = df["month"].nunique()
-
-        base = self.predict_next_month_budget(transaction_history)
-        base_prediction = base["breakdown"]
+        num_months = totals.data_months
+        base_prediction = self._forecast(totals)["breakdown"]
 
         needs_categories = [c for c in base_prediction if c in self.mandatory_labels]
         wants_categories = [c for c in base_prediction if c in self.wants_labels]
@@ -333,49 +167,37 @@ class BudgetAI:
             "predicted_raw":        base_prediction,
         }
 
-    def linear_regression_performance_report(self, transaction_history):
-        df = pd.DataFrame(transaction_history)
-        if df.empty:
-            return {}
-        df["date"] = pd.to_datetime(df["date"], errors="coerce", utc=True)
-        df = df.dropna(subset=["date", "amount", "category"])
-        df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
-        df = self._filter_expenses(df)
-        if df.empty:
-            return {}
-        df["predicted_category"] = df.apply(
-            lambda row: self.categorizer.predict(row.get("category", ""), row.get("description", "")), axis=1
-        )
+    def _report_series(self, transaction_history):
+        """
+        Yields (label, monthly totals) per label in first-seen order, over
+        every month the label has expense rows in. Months whose rows sum to
+        zero are kept (unlike MonthlyTotals.items()), as the reports always did.
+        """
+        batch = self.core.batch(transaction_history).expenses()
+        if not len(batch):
+            return
+        codes, labels = batch.label_codes(self.core.labeler)
+        seen, first = np.unique(codes, return_index=True)
+        for code in seen[np.argsort(first)]:
+            rows = codes == code
+            _, month_index = np.unique(batch.month[rows], return_inverse=True)
+            yield labels[code], np.bincount(month_index, weights=batch.amount[rows])
+
+    def _performance_report(self, transaction_history, evaluate, **kwargs):
         report = {}
-        for cat in df["predicted_category"].unique():
-            cat_df = df[df["predicted_category"] == cat]
-            monthly = cat_df.groupby(cat_df["date"].dt.tz_localize(None).dt.to_period("M"))["amount"].sum().sort_index()
-            metrics = evaluate_linear_trend(monthly.values)
+        for cat, values in self._report_series(transaction_history):
+            metrics = evaluate(values, **kwargs)
             if metrics:
                 report[cat] = metrics
         return report
 
+    def linear_regression_performance_report(self, transaction_history):
+        from reports.performance import evaluate_linear_trend
+        return self._performance_report(transaction_history, evaluate_linear_trend)
+
     def sarima_performance_report(self, transaction_history, seasonal_period=12):
-        df = pd.DataFrame(transaction_history)
-        if df.empty:
-            return {}
-        df["date"] = pd.to_datetime(df["date"], errors="coerce", utc=True)
-        df = df.dropna(subset=["date", "amount", "category"])
-        df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
-        df = self._filter_expenses(df)
-        if df.empty:
-            return {}
-        df["predicted_category"] = df.apply(
-            lambda row: self.categorizer.predict(row.get("category", ""), row.get("description", "")), axis=1
-        )
-        report = {}
-        for cat in df["predicted_category"].unique():
-            cat_df = df[df["predicted_category"] == cat]
-            monthly = cat_df.groupby(cat_df["date"].dt.tz_localize(None).dt.to_period("M"))["amount"].sum().sort_index()
-            metrics = evaluate_sarima(monthly.values, seasonal_period=seasonal_period)
-            if metrics:
-                report[cat] = metrics
-        return report
+        from reports.performance import evaluate_sarima
+        return self._performance_report(transaction_history, evaluate_sarima, seasonal_period=seasonal_period)
 
     def combined_performance_report(self, transaction_history):
         linear_report = self.linear_regression_performance_report(transaction_history)
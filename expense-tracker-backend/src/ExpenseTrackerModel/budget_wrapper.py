@@ -2,25 +2,196 @@
 budget_wrapper.py
 Entry point called by aiController.js via stdin/stdout.
 Reads JSON from stdin → runs BudgetAI → writes JSON to stdout.
+
+Transactions may mix expenses and income rows ("type": "Income"). When
+"monthly_income" is missing, the plan uses next month's income forecast from
+those rows (BudgetAI.predict_next_month_income).
+
+With FORECAST_STORE set and a "user_id" in the input, a forecast
+precomputed by precompute_forecasts.py is reused while its watermark still
+matches the transactions, so only allocation runs per request.
+
+Streaming mode for very long histories (`python budget_wrapper.py --stream`):
+stdin is newline-delimited JSON, the first line holding the payload without
+"transactions" and every further line one transaction. Rows are reduced to
+per-label monthly sums chunk by chunk, so peak memory follows labels × months
+instead of the row count. PLANNER_MEMORY_LIMIT_MB (default 256) sets the
+memory ceiling: half sizes the parsing chunks, half caps the monthly matrix.
+Income rows are not aggregated in this mode.
+
+With SARIMA_SNAPSHOT set (see precompute_forecasts.py --snapshot), series
+already fitted by the batch job are forecast from the mapped state. With
+POOLED_MODEL set (see precompute_forecasts.py --pooled), labels the pooled
+model covers are forecast from its shared parameters.
+
+Deterministic mode (PLANNER_DETERMINISTIC=1, or "deterministic": true in the
+payload): the same transactions and inputs in any row order give
+byte-identical output carrying an "input_hash" that callers can cache on.
+(Streaming mode honours the flag for model fitting and label order but has
+no row-level history to hash.)
+
+Batch mode (`python budget_wrapper.py --batch`): stdin holds one payload per
+line and stdout gets one plan (or {"error": ...}) per line, in input order,
+streamed as JSON Lines through plan_output.JSONLinesWriter.
+
+Profiling mode (PLANNER_PROFILE=1, or "profile": true in the payload): the
+request runs under profiling.SamplingProfiler. The collapsed stacks go to a
+flamegraph-ready file in PLANNER_PROFILE_DIR (default: the temp directory)
+and one JSON line with that path and the top-N hot functions goes to
+stderr; the result on stdout is unchanged.
+
+PLANNER_TELEMETRY (see telemetry.py) exports model-path counters, fit-time
+histograms and spans to a file or StatsD agent; stdout is never used.
 """
 import sys
 import json
 import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
 
 # Ensure imports resolve from this folder
 sys.path.insert(0, os.path.dirname(__file__))
 
 from budget_planner import BudgetAI
+from models.pooled_trend import load_pooled_model
+from models.sarima_snapshot import open_snapshot
+from plan_output import JSONLinesWriter
+from profiling import SamplingProfiler
+from transactions import ROW_BYTES, TransactionBatch
+
+
+DEFAULT_MEMORY_LIMIT_MB = 256
+PROFILE_TOP_N = 15
+
+
+def emit(result) -> None:
+    """Writes one result as a JSON line to stdout (native types, fast encoder)."""
+    sys.stdout.flush()
+    JSONLinesWriter(flush=True).write(result)
+
+
+def deterministic(input_data: dict) -> bool:
+    """Deterministic mode from the payload flag or PLANNER_DETERMINISTIC."""
+    if "deterministic" in input_data:
+        return bool(input_data["deterministic"])
+    return os.environ.get("PLANNER_DETERMINISTIC", "").lower() in ("1", "true", "yes")
+
+
+def profiling(input_data: dict) -> bool:
+    """Profiling mode from the payload flag or PLANNER_PROFILE."""
+    if "profile" in input_data:
+        return bool(input_data["profile"])
+    return os.environ.get("PLANNER_PROFILE", "").lower() in ("1", "true", "yes")
+
+
+@contextmanager
+def profiled(input_data: dict):
+    """
+    Samples the enclosed block when profiling is on, then writes the
+    collapsed stacks to PLANNER_PROFILE_DIR and a JSON summary to stderr.
+    A failure to write the profile is reported on stderr and never replaces
+    the block's own result or exception.
+    """
+    if not profiling(input_data):
+        yield
+        return
+    profiler = SamplingProfiler()
+    try:
+        with profiler:
+            yield
+    finally:
+        try:
+            directory = os.environ.get("PLANNER_PROFILE_DIR") or tempfile.gettempdir()
+            # user_id is caller input: keep it to one safe path component
+            owner = re.sub(r"[^A-Za-z0-9_-]", "_", str(input_data.get("user_id") or os.getpid()))[:64]
+            name = f"budget-profile-{owner}-{int(time.time())}.folded"
+            path = profiler.write_collapsed(os.path.join(directory, name))
+            print(json.dumps({
+                "profile": path,
+                "samples": profiler.samples,
+                "seconds": round(profiler.seconds, 3),
+                "top":     profiler.top(PROFILE_TOP_N),
+            }), file=sys.stderr)
+        except Exception as e:
+            print(f"Profile not written: {e}", file=sys.stderr)
+
+
+def planner(input_data: dict, cache: dict = None) -> BudgetAI:
+    """BudgetAI for the payload's mode, reused across payloads via `cache`."""
+    mode = deterministic(input_data)
+    if cache is not None and mode in cache:
+        return cache[mode]
+    ai = BudgetAI(pooled_model=load_pooled_model(), snapshot=open_snapshot(), deterministic=mode)
+    if cache is not None:
+        cache[mode] = ai
+    return ai
+
+
+def plan_payload(ai: BudgetAI, input_data: dict) -> dict:
+    """Runs one budget_wrapper.py payload through the planner."""
+    monthly_income = input_data.get("monthly_income")
+    total_budget   = input_data.get("total_budget")  # optional
+    return ai.create_balanced_budget(
+        transaction_history=input_data.get("transactions", []),
+        monthly_income=float(monthly_income) if monthly_income else None,
+        total_budget=float(total_budget) if total_budget else None,
+        forecast=stored_forecast(input_data.get("user_id")),
+    )
+
+
+def stored_forecast(user_id):
+    """Precomputed forecast for `user_id` from FORECAST_STORE, if any."""
+    path = os.environ.get("FORECAST_STORE")
+    if not path or user_id is None or not os.path.exists(path):
+        return None
+    from forecast_store import ForecastStore
+    try:
+        store = ForecastStore(path)
+        try:
+            return store.get(user_id)
+        finally:
+            store.close()
+    except Exception:
+        return None
+
 
+def stream_totals(ai: BudgetAI, lines, memory_limit_mb: float):
+    """Aggregates one transaction per line in chunks sized from the memory limit."""
+    budget = int(memory_limit_mb * 1024 * 1024) // 2
+    chunk_rows = max(budget // ROW_BYTES, 1000)
+    return ai.core.stream_totals(
+        TransactionBatch.iter_ndjson(lines, chunk_rows), max_bytes=budget
+    )
 
-def convert(o):
-    """Convert numpy/pandas types to native Python for JSON serialization."""
-    import pandas as pd
-    if isinstance(o, (pd.Period, pd.Timestamp)):
-        return str(o)
-    if hasattr(o, "item"):  # numpy scalar
-        return o.item()
-    raise TypeError(f"Object of type {type(o)} is not JSON serializable")
+
+def main_stream():
+    try:
+        input_data = json.loads(sys.stdin.readline() or "null")
+        if not isinstance(input_data, dict):
+            raise ValueError("No input received")
+    except Exception as e:
+        emit({"error": f"Failed to parse input: {str(e)}"})
+        sys.exit(1)
+
+    monthly_income = input_data.get("monthly_income")
+    total_budget   = input_data.get("total_budget")  # optional
+    memory_limit_mb = float(os.environ.get("PLANNER_MEMORY_LIMIT_MB", DEFAULT_MEMORY_LIMIT_MB))
+
+    try:
+        with profiled(input_data):
+            ai = planner(input_data)
+            totals = stream_totals(ai, sys.stdin, memory_limit_mb)
+            result = ai.create_balanced_budget(
+                transaction_history=totals,
+                monthly_income=float(monthly_income) if monthly_income else None,
+                total_budget=float(total_budget) if total_budget else None,
+            )
+        emit(result)
+    except Exception as e:
+        emit({"error": f"Model error: {str(e)}"})
+        sys.exit(1)
 
 
 def main():
@@ -30,25 +201,40 @@ def main():
             raise ValueError("No input received")
         input_data = json.loads(raw)
     except Exception as e:
-        print(json.dumps({"error": f"Failed to parse input: {str(e)}"}))
+        emit({"error": f"Failed to parse input: {str(e)}"})
         sys.exit(1)
 
-    transactions  = input_data.get("transactions", [])
-    monthly_income = input_data.get("monthly_income")
-    total_budget   = input_data.get("total_budget")  # optional
-
     try:
-        ai = BudgetAI()
-        result = ai.create_balanced_budget(
-            transaction_history=transactions,
-            monthly_income=float(monthly_income) if monthly_income else None,
-            total_budget=float(total_budget) if total_budget else None,
-        )
-        print(json.dumps(result, default=convert))
+        with profiled(input_data):
+            result = plan_payload(planner(input_data), input_data)
+        emit(result)
     except Exception as e:
-        print(json.dumps({"error": f"Model error: {str(e)}"}))
+        emit({"error": f"Model error: {str(e)}"})
         sys.exit(1)
 
 
+def main_batch():
+    planners = {}
+    writer = JSONLinesWriter()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            input_data = json.loads(line)
+        except Exception as e:
+            writer.write({"error": f"Failed to parse input: {str(e)}"})
+            continue
+        try:
+            writer.write(plan_payload(planner(input_data, planners), input_data))
+        except Exception as e:
+            writer.write({"error": f"Model error: {str(e)}", "user_id": input_data.get("user_id")})
+    sys.stdout.buffer.flush()
+
+
 if __name__ == "__main__":
-    main()
+    if "--stream" in sys.argv[1:]:
+        main_stream()
+    elif "--batch" in sys.argv[1:]:
+        main_batch()
+    else:
+        main()
@@ -0,0 +1,62 @@
+"""
+categorizer.py
+Keyword-based categorization of expense rows (no Ollama needed). Kept free of
+the model stack so lightweight callers can import it cheaply.
+"""
+
+
+# ── Keyword-based categorizer ─────────────────────────────────────────────────
+class KeywordCategorizer:
+    """
+    Maps app category values (rent, food, bills...) to standardized labels
+    that match mandatory_labels and wants_labels in BudgetAI.
+    Falls back to keyword matching on description text.
+    """
+
+    # App DB value → standardized label
+    CATEGORY_MAP = {
+        "rent":          "House Rent",
+        "bills":         "Utilities",
+        "phone":         "Utilities",
+        "groceries":     "Groceries",
+        "health":        "Healthcare",
+        "education":     "Education",
+        "transport":     "Transportation",
+        "food":          "Dining Out",
+        "entertainment": "Entertainment",
+        "shopping":      "Shopping",
+        "travel":        "Travel",
+        "fitness":       "Health and Fitness",
+        "other":         "Miscellaneous",
+    }
+
+    # Keyword fallback: (keywords, label)
+    KEYWORD_MAP = [
+        (["rent", "house", "flat", "bari", "basa", "apartment", "mortgage", "emi", "loan", "installment"], "House Rent"),
+        (["groceries", "grocery", "bazar", "shwapno", "meena", "supermarket", "vegetable", "rice", "fish", "meat"], "Groceries"),
+        (["electricity", "wasa", "water", "gas", "internet", "wifi", "broadband", "utility", "utilities", "bill", "bills"], "Utilities"),
+        (["phone", "mobile", "recharge", "airtel", "robi", "grameenphone", "gp", "banglalink"], "Utilities"),
+        (["school", "college", "university", "tuition", "tution", "coach", "education", "books"], "Education"),
+        (["doctor", "hospital", "pharmacy", "medicine", "clinic", "health", "labaid"], "Healthcare"),
+        (["bus", "train", "cng", "rickshaw", "uber", "pathao", "fuel", "petrol", "metro", "transport"], "Transportation"),
+        (["restaurant", "dining", "cafe", "coffee", "foodpanda", "shohoz", "fast food", "kfc", "pizza"], "Dining Out"),
+        (["netflix", "spotify", "youtube", "movie", "cinema", "game", "pubg", "entertainment", "subscription"], "Entertainment"),
+        (["daraz", "clothing", "fashion", "shoes", "bag", "accessories", "shopping"], "Shopping"),
+        (["travel", "hotel", "flight", "trip", "vacation", "tour"], "Travel"),
+        (["gym", "fitness", "yoga", "sport", "workout"], "Health and Fitness"),
+    ]
+
+    def predict(self, category: str, description: str = "") -> str:
+        # 1. Direct category value match (most reliable - app stores clean values)
+        if category:
+            clean = str(category).strip().lower()
+            if clean in self.CATEGORY_MAP:
+                return self.CATEGORY_MAP[clean]
+
+        # 2. Keyword match on combined category + description text
+        text = f"{category} {description}".lower()
+        for keywords, label in self.KEYWORD_MAP:
+            if any(kw in text for kw in keywords):
+                return label
+
+        return "Miscellaneous"
@@ -0,0 +1,86 @@
+/**
+ * export_histories.js
+ * Streams every user's expense history as NDJSON for precompute_forecasts.py.
+ *
+ * One line per user: {"user_id": "...", "transactions": [...]}, built with the
+ * same query and mapping as generateBudgetPlan in aiController.js so the
+ * stored watermark matches what the controller later sends.
+ *
+ * Usage (e.g. nightly cron):
+ *   node export_histories.js | python precompute_forecasts.py
+ *   node export_histories.js --since 2026-01-01T00:00:00Z   # only users with changes
+ *
+ * Requires MONGODB_URI in .env.
+ */
+
+import mongoose from "mongoose";
+import dotenv from "dotenv";
+dotenv.config();
+
+const MONGODB_URI = process.env.MONGODB_URI;
+const HISTORY_LIMIT = 1000; // keep in sync with generateBudgetPlan
+
+// ── Schemas (inline so we don't need to import from src) ─────────────────────
+const expenseSchema = new mongoose.Schema({
+  userId: String,
+  category: String,
+  description: String,
+  amount: Number,
+  date: Date,
+  recurring: Boolean,
+  recurringFrequency: String,
+}, { timestamps: true });
+
+const Expense = mongoose.model("Expense", expenseSchema);
+
+function parseSince(argv) {
+  const i = argv.indexOf("--since");
+  if (i === -1) return null;
+  const since = new Date(argv[i + 1]);
+  if (Number.isNaN(since.getTime())) {
+    throw new Error(`Invalid --since value: ${argv[i + 1]}`);
+  }
+  return since;
+}
+
+function write(line) {
+  return new Promise((resolve) => {
+    if (process.stdout.write(line)) resolve();
+    else process.stdout.once("drain", resolve);
+  });
+}
+
+async function exportHistories() {
+  const since = parseSince(process.argv.slice(2));
+  await mongoose.connect(MONGODB_URI);
+
+  const userIds = since
+    ? await Expense.distinct("userId", { updatedAt: { $gte: since } })
+    : await Expense.distinct("userId");
+
+  for (const userId of userIds) {
+    // Same query + mapping as generateBudgetPlan (aiController.js)
+    const expenses = await Expense.find({ userId })
+      .sort({ date: -1 })
+      .limit(HISTORY_LIMIT);
+
+    const transactions = expenses.map((e) => ({
+      date: e.date.toISOString(),
+      amount: e.amount,
+      category: e.category,
+      description: e.description || e.category,
+      type: "Expense",
+      recurring: Boolean(e.recurring),
+    }));
+
+    await write(JSON.stringify({ user_id: userId, transactions }) + "\n");
+  }
+
+  console.error(`Exported ${userIds.length} user histories`);
+  await mongoose.disconnect();
+}
+
+exportHistories().catch((err) => {
+  console.error("❌ Export failed:", err);
+  process.exit(1);
+});
@@ -0,0 +1,74 @@
+"""
+forecast_store.py
+Precomputed next-month forecasts, one row per user.
+
+Each forecast (predict_next_month_budget output) is stored with the data
+watermark (TransactionBatch.watermark) of the history it was computed from
+and carries it under "watermark", so BudgetAI.create_balanced_budget can tell
+whether it still matches the user's current data.
+
+Backed by a single SQLite file in WAL mode: the batch job writes while the
+wrapper / planning service read.
+"""
+
+import json
+import sqlite3
+import time
+
+
+class ForecastStore:
+    """
+    Args:
+        path: SQLite database file (created on first use)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS forecasts ("
+            " user_id TEXT PRIMARY KEY,"
+            " watermark TEXT NOT NULL,"
+            " forecast TEXT NOT NULL,"
+            " computed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, user_id: str) -> dict:
+        """Stored forecast for `user_id` (with its "watermark"), or None."""
+        row = self._conn.execute(
+            "SELECT watermark, forecast FROM forecasts WHERE user_id = ?", (str(user_id),)
+        ).fetchone()
+        if row is None:
+            return None
+        forecast = json.loads(row[1])
+        forecast["watermark"] = row[0]
+        return forecast
+
+    def watermark(self, user_id: str) -> str:
+        """Watermark of the stored forecast for `user_id`, or None."""
+        row = self._conn.execute(
+            "SELECT watermark FROM forecasts WHERE user_id = ?", (str(user_id),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, user_id: str, watermark: str, forecast: dict) -> None:
+        self.put_many([(user_id, watermark, forecast)])
+
+    def put_many(self, records) -> None:
+        """Upserts (user_id, watermark, forecast) records in one transaction."""
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO forecasts (user_id, watermark, forecast, computed_at)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (str(user_id), watermark,
+                     json.dumps({k: v for k, v in forecast.items() if k != "watermark"}), now)
+                    for user_id, watermark, forecast in records
+                ],
+            )
+
+    def close(self) -> None:
+        self._conn.close()
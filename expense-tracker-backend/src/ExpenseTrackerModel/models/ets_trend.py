@@ -0,0 +1,210 @@
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from telemetry import get_telemetry
+
+
+# Smoothing-parameter grids. Every grid point is filtered in the same pass
+# (one NumPy recurrence over time, vectorized across the grid), so a fit is a
+# few dozen array ops regardless of how many candidates are scored.
+ALPHA_GRID = np.linspace(0.05, 0.95, 19)
+HOLT_ALPHA_GRID = np.linspace(0.05, 0.95, 10)
+HOLT_BETA_GRID = np.linspace(0.05, 0.95, 10)
+HW_GRID = np.linspace(0.05, 0.85, 5)
+
+ETS_METHODS = ("ses", "holt", "holt_winters", "theta")
+
+
+def _ses_filter(y: np.ndarray, alpha: np.ndarray):
+    """Simple exponential smoothing for every alpha. Returns (sse, final level)."""
+    level = np.full(alpha.shape, y[0])
+    sse = np.zeros(alpha.shape)
+    for value in y[1:]:
+        err = value - level
+        sse += err ** 2
+        level = level + alpha * err
+    return sse, level
+
+
+def _holt_filter(y: np.ndarray, alpha: np.ndarray, beta: np.ndarray):
+    """Additive-trend Holt for every (alpha, beta). Returns (sse, level, trend)."""
+    level = np.full(alpha.shape, y[1])
+    trend = np.full(alpha.shape, y[1] - y[0])
+    sse = np.zeros(alpha.shape)
+    for value in y[2:]:
+        err = value - (level + trend)
+        sse += err ** 2
+        new_level = level + trend + alpha * err
+        trend = trend + beta * (new_level - level - trend)
+        level = new_level
+    return sse, level, trend
+
+
+def _holt_winters_filter(y: np.ndarray, m: int, alpha, beta, gamma):
+    """
+    Additive Holt-Winters for every (alpha, beta, gamma), initialised from
+    the first two seasons. Returns (sse, level, trend, seasonal[grid × m]),
+    with seasonal[:, j] the component for step j + 1 after the last point.
+    """
+    first, second = y[:m].mean(), y[m:2 * m].mean()
+    level = np.full(alpha.shape, first)
+    trend = np.full(alpha.shape, (second - first) / m)
+    season = np.tile(y[:m] - first, (alpha.size, 1))
+    sse = np.zeros(alpha.shape)
+    for t, value in enumerate(y):
+        s = season[:, t % m]
+        err = value - (level + trend + s)
+        sse += err ** 2
+        new_level = level + trend + alpha * err
+        trend = trend + beta * (new_level - level - trend)
+        season[:, t % m] = s + gamma * (value - new_level - s)
+        level = new_level
+    return sse, level, trend, np.roll(season, -(len(y) % m), axis=1)
+
+
+class MonthlyETSTrendRegressor:
+    """
+    Exponential smoothing family for short monthly series, fitted by grid
+    search with pure NumPy recurrences (no optimizer, no statsmodels).
+
+    Methods:
+        'ses'          simple exponential smoothing (level only)
+        'holt'         additive trend
+        'holt_winters' additive trend + additive seasonality (≥ 2 seasons)
+        'theta'        Theta method: SES plus half the linear-trend slope
+        'auto'         every method the series is long enough for, best AIC
+    """
+
+    def __init__(self, method="auto", seasonal_period=12):
+        if method != "auto" and method not in ETS_METHODS:
+            raise ValueError(f"Unsupported ETS method: {method}")
+        self.method = method
+        self.seasonal_period = seasonal_period
+        self.is_fitted = False
+        self.fitted_method = None
+        self.params = {}
+        self.sigma = 0.0
+        self.aic = np.inf
+        self._state = None
+
+    # ── Candidates ────────────────────────────────────────────────────────────
+    def _candidates(self, n: int) -> list:
+        methods = ETS_METHODS if self.method == "auto" else (self.method,)
+        minimum = {"ses": 2, "holt": 3, "theta": 3, "holt_winters": 2 * self.seasonal_period + 1}
+        return [m for m in methods if n >= minimum[m]]
+
+    def _fit_method(self, method: str, y: np.ndarray) -> dict:
+        n = len(y)
+        if method == "ses":
+            sse, level = _ses_filter(y, ALPHA_GRID)
+            i = int(np.argmin(sse))
+            return {"sse": sse[i], "n_err": n - 1, "k": 2,
+                    "alpha": ALPHA_GRID[i], "level": level[i]}
+
+        if method == "holt":
+            a, b = (g.ravel() for g in np.meshgrid(HOLT_ALPHA_GRID, HOLT_BETA_GRID))
+            sse, level, trend = _holt_filter(y, a, b)
+            i = int(np.argmin(sse))
+            return {"sse": sse[i], "n_err": n - 2, "k": 4,
+                    "alpha": a[i], "beta": b[i], "level": level[i], "trend": trend[i]}
+
+        if method == "holt_winters":
+            m = self.seasonal_period
+            a, b, g = (x.ravel() for x in np.meshgrid(HW_GRID, HW_GRID, HW_GRID))
+            sse, level, trend, season = _holt_winters_filter(y, m, a, b, g)
+            i = int(np.argmin(sse))
+            return {"sse": sse[i], "n_err": n, "k": 4 + m,
+                    "alpha": a[i], "beta": b[i], "gamma": g[i],
+                    "level": level[i], "trend": trend[i], "season": season[i]}
+
+        # Theta (θ = 2): SES on the series, drift = half the OLS slope
+        t = np.arange(n, dtype=float)
+        slope = float(np.polyfit(t, y, 1)[0])
+        sse, level = _ses_filter(y, ALPHA_GRID)
+        i = int(np.argmin(sse))
+        return {"sse": sse[i], "n_err": n - 1, "k": 3,
+                "alpha": ALPHA_GRID[i], "level": level[i], "drift": slope / 2, "n": n}
+
+    # ── Fit / predict ─────────────────────────────────────────────────────────
+    def fit(self, values):
+        """
+        values: 1D array-like of monthly totals
+        """
+        y = np.asarray(values, dtype=float)
+        started = time.perf_counter()
+        best = None
+        for method in self._candidates(len(y)):
+            state = self._fit_method(method, y)
+            n_err = max(state["n_err"], 1)
+            aic = n_err * np.log(max(state["sse"], 1e-12) / n_err) + 2 * state["k"]
+            if best is None or aic < best[0]:
+                best = (aic, method, state)
+
+        if best is None:
+            get_telemetry().incr("ets.fit_failed", tags={"method": self.method})
+            return self
+
+        self.aic, self.fitted_method, self._state = best
+        self.sigma = float(np.sqrt(self._state["sse"] / max(self._state["n_err"], 1)))
+        self.params = {
+            key: float(self._state[key])
+            for key in ("alpha", "beta", "gamma", "drift")
+            if key in self._state
+        }
+        self.is_fitted = True
+        get_telemetry().observe(
+            "ets.fit_ms", (time.perf_counter() - started) * 1000, {"method": self.fitted_method}
+        )
+        return self
+
+    def _point_forecast(self, h: int) -> np.ndarray:
+        s = self._state
+        steps = np.arange(1, h + 1, dtype=float)
+        if self.fitted_method == "ses":
+            return np.full(h, s["level"])
+        if self.fitted_method == "holt":
+            return s["level"] + steps * s["trend"]
+        if self.fitted_method == "holt_winters":
+            m = self.seasonal_period
+            return s["level"] + steps * s["trend"] + s["season"][np.arange(h) % m]
+        # Theta: drift term from Hyndman & Billah (2003)
+        a = s["alpha"]
+        return s["level"] + s["drift"] * (steps - 1 + 1 / a - (1 - a) ** s["n"] / a)
+
+    def predict_next(self):
+        if not self.is_fitted:
+            raise RuntimeError("Model not fitted")
+        return float(self._point_forecast(1)[0])
+
+    def predict_horizon(self, h: int, alpha: float = 0.2):
+        """
+        Forecasts the next `h` months.
+
+        Returns (mean, lower, upper) arrays of length h. The interval uses the
+        additive ETS variance sigma² · (1 + Σ c_j²) with c_j = α(1 + jβ) plus
+        γ on seasonal lags.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Model not fitted")
+        mean = self._point_forecast(h)
+
+        j = np.arange(1, h, dtype=float)
+        c = self.params["alpha"] * (1 + j * self.params.get("beta", 0.0))
+        if self.fitted_method == "holt_winters":
+            c = c + self.params["gamma"] * (j % self.seasonal_period == 0)
+        factor = np.sqrt(1 + np.concatenate([[0.0], np.cumsum(c ** 2)]))
+
+        z = NormalDist().inv_cdf(1 - alpha / 2)
+        return mean, mean - z * self.sigma * factor, mean + z * self.sigma * factor
+
+    def get_params(self):
+        if not self.is_fitted:
+            return {"note": "ETS model not fitted"}
+        return {
+            "method": self.fitted_method,
+            **self.params,
+            "sigma": self.sigma,
+            "aic": float(self.aic),
+        }
@@ -1,3 +1,5 @@
+from statistics import NormalDist
+
 from sklearn.linear_model import LinearRegression
 import numpy as np
 
@@ -11,6 +13,8 @@ class MonthlyTrendRegressor:
     def __init__(self):
         self.model = LinearRegression()
         self.is_fitted = False
+        self.n_obs = 0
+        self.resid_std = 0.0
 
     def fit(self, values):
         """
@@ -23,15 +27,37 @@ class MonthlyTrendRegressor:
         y = np.asarray(values, dtype=float)
 
         self.model.fit(X, y)
+        self.n_obs = len(y)
+        resid = y - self.model.predict(X)
+        dof = max(len(y) - 2, 1)
+        self.resid_std = float(np.sqrt(np.sum(resid ** 2) / dof))
         self.is_fitted = True
         return self
 
     def predict_next(self):
         if not self.is_fitted:
             raise RuntimeError("Model not fitted")
-        next_idx = np.array([[self.model.n_features_in_]])
+        next_idx = np.array([[self.n_obs]])
         return float(self.model.predict(next_idx)[0])
 
+    def predict_horizon(self, h: int, alpha: float = 0.2):
+        """
+        Forecasts the next `h` months from the single fitted line.
+
+        Returns (mean, lower, upper) arrays of length h; the bounds are the
+        (1 - alpha) OLS prediction interval under a normal residual model.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Model not fitted")
+        idx = np.arange(self.n_obs, self.n_obs + h, dtype=float)
+        mean = self.model.predict(idx.reshape(-1, 1))
+
+        x = np.arange(self.n_obs, dtype=float)
+        sxx = float(np.sum((x - x.mean()) ** 2)) or 1.0
+        se = self.resid_std * np.sqrt(1 + 1 / self.n_obs + (idx - x.mean()) ** 2 / sxx)
+        z = NormalDist().inv_cdf(1 - alpha / 2)
+        return mean, mean - z * se, mean + z * se
+
     def get_params(self):
         if not self.is_fitted:
             return {"note": "Linear model not fitted"}
@@ -0,0 +1,193 @@
+import json
+import os
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from telemetry import get_telemetry
+
+
+ALPHA_GRID = np.linspace(0.1, 0.9, 9)
+SEASON_PRIOR = 5.0      # pseudo-observations pulling each monthly index to 1.0
+MAX_GROWTH = 0.05       # |monthly growth| cap
+
+POOLED_MODEL_ENV = "POOLED_MODEL"
+
+
+class PooledSeasonalModel:
+    """
+    One small parameter set per standardized label, learned across every
+    user's series for that label:
+      - season: 12 multiplicative calendar-month indices
+      - growth: shared monthly growth rate
+      - alpha:  shared level-smoothing weight
+      - resid:  relative one-step residual scale
+
+    A user's forecast is a lookup plus arithmetic: deseasonalize their
+    history, take the growth-adjusted exponentially weighted level in closed
+    form, then re-apply growth and season for the target month. Series are
+    scale-free (each is divided by its own mean), so small and large spenders
+    share the same shape parameters.
+    """
+
+    def __init__(self, min_series: int = 5):
+        self.min_series = min_series
+        self.table = {}
+        self.is_fitted = False
+
+    # ── Fit ───────────────────────────────────────────────────────────────────
+    def fit(self, series):
+        """
+        series: iterable of (label, positive monthly values, epoch-months)
+                triples, one per (user, label); see MonthlyTotals.positive_series
+        """
+        started = time.perf_counter()
+        by_label = {}
+        for label, values, months in series:
+            if len(values) >= 2:
+                by_label.setdefault(label, []).append(
+                    (np.asarray(values, dtype=float), np.asarray(months, dtype=np.int64))
+                )
+
+        self.table = {
+            label: self._fit_label(rows)
+            for label, rows in by_label.items()
+            if len(rows) >= self.min_series
+        }
+        self.is_fitted = bool(self.table)
+        telemetry = get_telemetry()
+        telemetry.observe("pooled.fit_ms", (time.perf_counter() - started) * 1000)
+        telemetry.observe("pooled.labels", len(self.table))
+        return self
+
+    @staticmethod
+    def _fit_label(rows) -> dict:
+        lengths = np.array([len(v) for v, _ in rows])
+        row_id = np.repeat(np.arange(len(rows)), lengths)
+        ratio = np.concatenate([v / v.mean() for v, _ in rows])
+        month = np.concatenate([m for _, m in rows])
+        cal = month % 12
+
+        # Seasonal indices, shrunk towards 1 where a calendar month is sparse
+        total = np.bincount(cal, weights=ratio, minlength=12)
+        count = np.bincount(cal, minlength=12)
+        season = (total + SEASON_PRIOR) / (count + SEASON_PRIOR)
+        season /= season.mean()
+
+        # Pooled log-growth: within-row slope of log(deseasonalized) on month
+        z = np.log(ratio / season[cal])
+        t = month.astype(float)
+        n_row = np.bincount(row_id)
+        tc = t - (np.bincount(row_id, weights=t) / n_row)[row_id]
+        zc = z - (np.bincount(row_id, weights=z) / n_row)[row_id]
+        sxx = float(np.sum(tc * tc))
+        slope = float(np.sum(tc * zc)) / sxx if sxx > 0 else 0.0
+        growth = float(np.clip(np.expm1(slope), -MAX_GROWTH, MAX_GROWTH))
+
+        # Smoothing weight: one recurrence over right-aligned rows × alphas
+        width = int(lengths.max())
+        d = np.zeros((len(rows), width))
+        gap = np.zeros((len(rows), width))
+        valid = np.zeros((len(rows), width), dtype=bool)
+        for r, (v, m) in enumerate(rows):
+            k = len(v)
+            d[r, width - k:] = v / v.mean() / season[m % 12]
+            gap[r, width - k + 1:] = np.diff(m)
+            valid[r, width - k:] = True
+
+        level = np.zeros((len(rows), len(ALPHA_GRID)))
+        sse = np.zeros(len(ALPHA_GRID))
+        n_err = 0
+        for j in range(width):
+            started = valid[:, j] & (j > 0) & valid[:, max(j - 1, 0)]
+            fresh = valid[:, j] & ~started
+            pred = level * (1 + growth) ** gap[:, j:j + 1]
+            err = d[:, j:j + 1] - pred
+            sse += np.sum(np.where(started[:, None], err ** 2, 0.0), axis=0)
+            n_err += int(started.sum())
+            level = np.where(started[:, None], pred + ALPHA_GRID * err, level)
+            level = np.where(fresh[:, None], d[:, j:j + 1], level)
+
+        best = int(np.argmin(sse))
+        return {
+            "season":   [round(float(s), 6) for s in season],
+            "growth":   round(growth, 6),
+            "alpha":    float(ALPHA_GRID[best]),
+            "resid":    round(float(np.sqrt(sse[best] / max(n_err, 1))), 6),
+            "n_series": len(rows),
+        }
+
+    # ── Apply ─────────────────────────────────────────────────────────────────
+    def __contains__(self, label) -> bool:
+        return label in self.table
+
+    def forecast(self, label: str, values, months, target_months) -> np.ndarray:
+        """
+        Forecasts `label` for the given epoch-months from one user's positive
+        monthly values and their epoch-months (oldest first).
+        """
+        p = self.table[label]
+        season = np.asarray(p["season"])
+        alpha, growth = p["alpha"], p["growth"]
+        values = np.asarray(values, dtype=float)
+        months = np.asarray(months, dtype=np.int64)
+        target = np.atleast_1d(np.asarray(target_months, dtype=np.int64))
+
+        scale = values.mean()
+        d = values / scale / season[months % 12]
+        n = len(d)
+        weights = alpha * (1 - alpha) ** np.arange(n - 1, -1, -1, dtype=float)
+        weights[0] = (1 - alpha) ** (n - 1)
+        level = float(np.sum(weights * d * (1 + growth) ** (months[-1] - months)))
+
+        return scale * level * (1 + growth) ** (target - months[-1]) * season[target % 12]
+
+    def forecast_interval(self, label: str, values, months, target_months, alpha: float = 0.2):
+        """
+        forecast() plus a normal ±z·resid band in the series' own scale,
+        widening with the square root of the months ahead.
+        Returns (mean, lower, upper) arrays.
+        """
+        mean = self.forecast(label, values, months, target_months)
+        p = self.table[label]
+        target = np.atleast_1d(np.asarray(target_months, dtype=np.int64))
+        ahead = np.maximum(target - int(np.asarray(months)[-1]), 1)
+        spread = (
+            NormalDist().inv_cdf(1 - alpha / 2) * p["resid"] * float(np.mean(values))
+            * np.asarray(p["season"])[target % 12] * np.sqrt(ahead)
+        )
+        return mean, np.maximum(mean - spread, 0.0), mean + spread
+
+    # ── Persistence ───────────────────────────────────────────────────────────
+    def to_dict(self) -> dict:
+        return {"min_series": self.min_series, "labels": self.table}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PooledSeasonalModel":
+        model = cls(min_series=data.get("min_series", 5))
+        model.table = dict(data.get("labels", {}))
+        model.is_fitted = bool(model.table)
+        return model
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, path: str) -> "PooledSeasonalModel":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def get_params(self):
+        if not self.is_fitted:
+            return {"note": "Pooled model not fitted"}
+        return {label: dict(p) for label, p in self.table.items()}
+
+
+def load_pooled_model(path: str = None) -> PooledSeasonalModel:
+    """PooledSeasonalModel saved at `path` (default: $POOLED_MODEL), or None if unset / missing."""
+    path = path or os.environ.get(POOLED_MODEL_ENV)
+    if not path or not os.path.exists(path):
+        return None
+    return PooledSeasonalModel.load(path)
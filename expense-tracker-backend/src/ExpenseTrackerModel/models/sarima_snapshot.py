@@ -0,0 +1,202 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from statistics import NormalDist
+
+import numpy as np
+
+
+# File layout (little-endian):
+#   header  32 bytes   magic, record count, index offset, reserved
+#   data    float64[]  one record per fitted series (see SARIMAState.pack)
+#   index   JSON       {series key: float64 offset of the record}
+MAGIC = b"SARSNAP1"
+HEADER = struct.Struct("<8sQQQ")
+
+# Environment variable naming the snapshot the planner entry points map
+SNAPSHOT_ENV = "SARIMA_SNAPSHOT"
+
+
+def series_key(label: str, values) -> str:
+    """Content key of one fitted series: same label and totals → same state."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(label).encode("utf-8") + b"\x00")
+    h.update(np.ascontiguousarray(values, dtype="<f8").tobytes())
+    return h.hexdigest()
+
+
+class SARIMAState:
+    """
+    What a fitted SARIMAX needs to forecast: the time-invariant state-space
+    system and the predicted state after the last observation.
+
+        y[t] = Z a[t] + d + e,        e ~ N(0, H)
+        a[t+1] = T a[t] + c + R u,    u ~ N(0, Q)
+
+    `a` / `P` are the one-step-ahead state mean and covariance; `rqr` is
+    R Q R'. All arrays may be read-only views into a memory-mapped snapshot.
+    """
+
+    __slots__ = ("design", "obs_intercept", "obs_cov", "transition",
+                 "state_intercept", "rqr", "state", "state_cov", "aic",
+                 "order", "seasonal_order")
+
+    def __init__(self, design, obs_intercept, obs_cov, transition, state_intercept,
+                 rqr, state, state_cov, aic, order, seasonal_order):
+        self.design = design
+        self.obs_intercept = float(obs_intercept)
+        self.obs_cov = float(obs_cov)
+        self.transition = transition
+        self.state_intercept = state_intercept
+        self.rqr = rqr
+        self.state = state
+        self.state_cov = state_cov
+        self.aic = float(aic)
+        self.order = tuple(int(x) for x in order)
+        self.seasonal_order = tuple(int(x) for x in seasonal_order)
+
+    @classmethod
+    def from_results(cls, results, order, seasonal_order) -> "SARIMAState":
+        """Extracts the state from a fitted statsmodels SARIMAX results object."""
+        f = results.filter_results
+        selection = f.selection[:, :, 0]
+        return cls(
+            design=np.array(f.design[0, :, 0]),
+            obs_intercept=f.obs_intercept[0, 0],
+            obs_cov=f.obs_cov[0, 0, 0],
+            transition=np.array(f.transition[:, :, 0]),
+            state_intercept=np.array(f.state_intercept[:, 0]),
+            rqr=selection @ f.state_cov[:, :, 0] @ selection.T,
+            state=np.array(f.predicted_state[:, -1]),
+            state_cov=np.array(f.predicted_state_cov[:, :, -1]),
+            aic=results.aic,
+            order=order,
+            seasonal_order=seasonal_order,
+        )
+
+    # ── Forecast ──────────────────────────────────────────────────────────────
+    def forecast(self, h: int, alpha: float = 0.2):
+        """
+        Kalman prediction `h` steps ahead. Returns (mean, lower, upper)
+        arrays; the same numbers as SARIMAXResults.get_forecast().
+        """
+        a, P = self.state, self.state_cov
+        Z = self.design
+        mean, var = np.empty(h), np.empty(h)
+        for i in range(h):
+            mean[i] = Z @ a + self.obs_intercept
+            var[i] = Z @ P @ Z + self.obs_cov
+            a = self.transition @ a + self.state_intercept
+            P = self.transition @ P @ self.transition.T + self.rqr
+        spread = NormalDist().inv_cdf(1 - alpha / 2) * np.sqrt(np.maximum(var, 0.0))
+        return mean, mean - spread, mean + spread
+
+    # ── Flat layout ───────────────────────────────────────────────────────────
+    def pack(self) -> np.ndarray:
+        """
+        One float64 record: k, Z[k], d, H, T[k×k], c[k], RQR[k×k], a[k],
+        P[k×k], aic, order[3], seasonal_order[4].
+        """
+        k = len(self.state)
+        return np.concatenate([
+            [k], self.design, [self.obs_intercept, self.obs_cov],
+            np.ravel(self.transition), self.state_intercept, np.ravel(self.rqr),
+            self.state, np.ravel(self.state_cov), [self.aic],
+            self.order, self.seasonal_order,
+        ]).astype("<f8")
+
+    @classmethod
+    def unpack(cls, data: np.ndarray, offset: int) -> "SARIMAState":
+        """Views one record of `data` starting at `offset` (no copies)."""
+        k = int(data[offset])
+        pos = offset + 1
+
+        def take(n, shape=None):
+            nonlocal pos
+            view = data[pos:pos + n]
+            pos += n
+            return view.reshape(shape) if shape else view
+
+        design = take(k)
+        obs_intercept, obs_cov = take(2)
+        transition = take(k * k, (k, k))
+        state_intercept = take(k)
+        rqr = take(k * k, (k, k))
+        state = take(k)
+        state_cov = take(k * k, (k, k))
+        aic = take(1)[0]
+        order, seasonal_order = take(3), take(4)
+        return cls(design, obs_intercept, obs_cov, transition, state_intercept,
+                   rqr, state, state_cov, aic, order, seasonal_order)
+
+
+# ── Snapshot file ─────────────────────────────────────────────────────────────
+def write_snapshot(path: str, states: dict) -> None:
+    """
+    Writes {series key: SARIMAState} as one flat file. The file is written
+    beside `path` and renamed into place, so processes that already mapped
+    the previous snapshot keep reading it unchanged.
+    """
+    records, index, offset = [], {}, 0
+    for key, state in states.items():
+        record = state.pack()
+        index[key] = offset
+        records.append(record)
+        offset += len(record)
+
+    data = np.concatenate(records) if records else np.zeros(0, dtype="<f8")
+    index_offset = HEADER.size + data.nbytes
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(states), index_offset, 0))
+        f.write(data.tobytes())
+        f.write(json.dumps(index, separators=(",", ":")).encode("utf-8"))
+    os.replace(tmp, path)
+
+
+class SnapshotReader:
+    """
+    Read-only memory map of a snapshot file. States returned by get() are
+    views into the shared mapping, so every worker process that opens the
+    same file shares one copy of the pages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, index_offset, _ = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a SARIMA snapshot")
+        self._data = np.frombuffer(
+            self._mmap, dtype="<f8", count=(index_offset - HEADER.size) // 8, offset=HEADER.size
+        )
+        self._index = json.loads(self._mmap[index_offset:].decode("utf-8")) if count else {}
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def keys(self):
+        return self._index.keys()
+
+    def get(self, key: str) -> SARIMAState:
+        """State stored under `key`, or None."""
+        offset = self._index.get(key)
+        return None if offset is None else SARIMAState.unpack(self._data, offset)
+
+    def items(self):
+        for key, offset in self._index.items():
+            yield key, SARIMAState.unpack(self._data, offset)
+
+
+def open_snapshot(path: str = None) -> SnapshotReader:
+    """SnapshotReader for `path` (default: $SARIMA_SNAPSHOT), or None if unset / missing."""
+    path = path or os.environ.get(SNAPSHOT_ENV)
+    if not path or not os.path.exists(path):
+        return None
+    return SnapshotReader(path)
@@ -1,31 +1,128 @@
+import time
 import warnings
+from contextlib import contextmanager
+
+import numpy as np
 import pandas as pd
+from scipy.stats import f as f_dist
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 from pmdarima import auto_arima
+from pmdarima.arima import StepwiseContext
+from pmdarima.warnings import ModelFitWarning
+
+from models.sarima_snapshot import SARIMAState
+from telemetry import get_telemetry
+
+# Optimizer settings pinned in deterministic mode (auto_arima and the refit)
+DETERMINISTIC_FIT = {"method": "lbfgs", "maxiter": 50}
+
+
+@contextmanager
+def _quiet():
+    """Silences statsmodels' UserWarning / FutureWarning noise for the block only."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        warnings.simplefilter("ignore", FutureWarning)
+        yield
+
+
+def seasonality_test(values, m: int = 12, alpha: float = 0.05, z: float = 1.645) -> dict:
+    """
+    Cheap yearly-seasonality pre-test on the linearly detrended series.
+
+    Two NumPy statistics, either of which marks the series seasonal:
+      - strength: share of variance explained by calendar-position means
+        (one-way ANOVA), significant when its F-test p-value < alpha; the
+        F-test keeps short series (few points per month) from looking
+        seasonal by chance
+      - acf: autocorrelation at lag m, significant above the Bartlett bound
+        z · sqrt((1 + 2 Σ_{k<m} r_k²) / n)
+    """
+    y = np.asarray(values, dtype=float)
+    n = len(y)
+    t = np.arange(n)
+    resid = y - np.polyval(np.polyfit(t, y, 1), t)
+    total = float(np.dot(resid, resid))
+    if n <= m or total == 0:
+        return {"seasonal": False, "strength": 0.0, "p_value": 1.0, "acf": 0.0, "acf_threshold": None}
+
+    pos = t % m
+    count = np.bincount(pos, minlength=m)
+    means = np.bincount(pos, weights=resid, minlength=m) / count
+    between = float(np.sum(count * means ** 2))
+    within = max(total - between, 1e-12)
+    f_stat = (between / (m - 1)) / (within / (n - m))
+    p_value = float(f_dist.sf(f_stat, m - 1, n - m))
 
-warnings.filterwarnings("ignore", category=UserWarning)
-warnings.filterwarnings("ignore", category=FutureWarning)
+    acf = np.array([np.dot(resid[:n - k], resid[k:]) / total for k in range(1, m + 1)])
+    acf_threshold = z * np.sqrt((1 + 2 * np.sum(acf[:-1] ** 2)) / n)
+
+    return {
+        "seasonal":      bool(p_value < alpha or abs(acf[-1]) > acf_threshold),
+        "strength":      round(between / total, 4),
+        "p_value":       round(p_value, 4),
+        "acf":           round(float(acf[-1]), 4),
+        "acf_threshold": round(float(acf_threshold), 4),
+    }
 
 
 class MonthlySARIMATrendRegressor:
     """
     SARIMA model with automatic parameter selection via auto_arima.
     Designed for monthly data with yearly seasonality (m=12).
+
+    Search budget (stepwise search only):
+        max_candidates: cap on candidate models fitted (None = pmdarima's 100)
+        time_limit:     wall-clock seconds, checked between search steps
+                        (None = unlimited)
+    When the budget runs out the best model found so far is used, and
+    get_params() reports search_truncated=True: the search took at least
+    time_limit seconds or evaluated max_candidates models. get_params()
+    also reports n_evaluated (candidates fitted, including ones that
+    failed with an error) and n_valid_fits (those auto_arima kept).
+    pmdarima drops candidates with near non-invertible roots without
+    signalling it, so those are in neither count.
+
+    seasonality_gate: only search seasonal orders when seasonality_test finds
+    a yearly pattern; the decision and statistics are reported as
+    get_params()["seasonality"].
+
+    deterministic: same input → same model and forecast. The wall-clock
+    time_limit is ignored (the candidate cap still applies), the optimizer
+    settings are pinned (DETERMINISTIC_FIT). In every mode warning filters
+    are only changed inside local catch_warnings() blocks, never for the
+    whole process.
+
+    to_state() / from_state() round-trip the fitted model through a compact
+    SARIMAState (see models/sarima_snapshot.py); a restored regressor
+    forecasts without statsmodels objects or refitting.
     """
 
-    def __init__(self, seasonal_period=12, max_pdq=3, max_PDQ=2, stepwise=True):
+    def __init__(self, seasonal_period=12, max_pdq=3, max_PDQ=2, stepwise=True,
+                 max_candidates=None, time_limit=None, seasonality_gate=True,
+                 deterministic=False):
         self.seasonal_period = seasonal_period
         self.max_pdq = max_pdq
         self.max_PDQ = max_PDQ
         self.stepwise = stepwise
+        self.max_candidates = max_candidates
+        self.time_limit = time_limit
+        self.seasonality_gate = seasonality_gate
+        self.deterministic = deterministic
 
         self.model = None
         self.fitted_model = None
         self.is_fitted = False
         self.best_order = None
         self.best_seasonal_order = None
+        self.n_evaluated = 0
+        self.n_valid_fits = 0
+        self.search_truncated = False
+        self.seasonality = None
+        self.state = None
 
     def fit(self, values):
+        self.state = None
         if len(values) < self.seasonal_period:
             self.is_fitted = False
             return self
@@ -40,53 +137,125 @@ class MonthlySARIMATrendRegressor:
         # due to differencing eating up samples. Safe margin is 2*m + 1 or higher.
         if len(values) <= 2 * self.seasonal_period:
             use_seasonal = False
-            current_m = 1
-        else:
+            self.seasonality = {"seasonal": False, "reason": "short_series"}
+        elif not self.seasonality_gate:
             use_seasonal = True
-            current_m = self.seasonal_period
+            self.seasonality = {"seasonal": True, "reason": "gate_disabled"}
+        else:
+            # Cheap pre-test: skip the (much larger) seasonal search when
+            # there is no evidence of a yearly pattern
+            self.seasonality = {**seasonality_test(values, self.seasonal_period), "reason": "test"}
+            use_seasonal = self.seasonality["seasonal"]
+        current_m = self.seasonal_period if use_seasonal else 1
+        time_limit = None if self.deterministic else self.time_limit
+        fit_kwargs = DETERMINISTIC_FIT if self.deterministic else {}
+        telemetry = get_telemetry()
+        tags = {"seasonal": use_seasonal}
+        started = time.perf_counter()
 
         try:
-            auto_model = auto_arima(
-                y,
-                seasonal=use_seasonal,
-                m=current_m,
-                max_p=self.max_pdq,
-                max_d=self.max_pdq,
-                max_q=self.max_pdq,
-                max_P=self.max_PDQ,
-                max_D=self.max_PDQ,
-                max_Q=self.max_PDQ,
-                stepwise=self.stepwise,
-                suppress_warnings=True,
-                error_action="ignore",
+            with warnings.catch_warnings(record=True) as caught, \
+                    StepwiseContext(max_steps=self.max_candidates, max_dur=time_limit):
+                warnings.simplefilter("always")
+                fits = auto_arima(
+                    y,
+                    seasonal=use_seasonal,
+                    m=current_m,
+                    max_p=self.max_pdq,
+                    max_d=self.max_pdq,
+                    max_q=self.max_pdq,
+                    max_P=self.max_PDQ,
+                    max_D=self.max_PDQ,
+                    max_Q=self.max_PDQ,
+                    stepwise=self.stepwise,
+                    suppress_warnings=True,
+                    error_action="warn",    # one ModelFitWarning per failed candidate
+                    return_valid_fits=True,
+                    **fit_kwargs,
+                )
+            searched = time.perf_counter() - started
+
+            # Valid fits come back sorted by AIC; the first is auto_arima's pick
+            auto_model = fits[0]
+            self.n_valid_fits = len(fits)
+            self.n_evaluated = self.n_valid_fits + sum(issubclass(w.category, ModelFitWarning) for w in caught)
+            self.search_truncated = self.stepwise and (
+                (time_limit is not None and searched >= time_limit)
+                or (self.max_candidates is not None and self.n_evaluated >= self.max_candidates)
             )
 
             self.best_order = auto_model.order
             self.best_seasonal_order = auto_model.seasonal_order
 
-            self.model = SARIMAX(
-                y,
-                order=self.best_order,
-                seasonal_order=self.best_seasonal_order,
-                enforce_stationarity=False,
-                enforce_invertibility=False,
-            )
-
-            self.fitted_model = self.model.fit(disp=0)
+            with _quiet():
+                self.model = SARIMAX(
+                    y,
+                    order=self.best_order,
+                    seasonal_order=self.best_seasonal_order,
+                    enforce_stationarity=False,
+                    enforce_invertibility=False,
+                )
+                self.fitted_model = self.model.fit(disp=0, **fit_kwargs)
             self.is_fitted = True
+            telemetry.observe("sarima.evaluated", self.n_evaluated, tags)
+            telemetry.observe("sarima.valid_fits", self.n_valid_fits, tags)
+            if self.search_truncated:
+                telemetry.incr("sarima.search_truncated", tags=tags)
 
         except Exception as e:
-            print(f"SARIMA auto-fit failed: {e}")
+            telemetry.incr("sarima.fit_failed", tags=tags)
+            telemetry.event("sarima.fit_error", e, tags)
             self.is_fitted = False
 
+        telemetry.observe("sarima.fit_ms", (time.perf_counter() - started) * 1000, tags)
         return self
 
+    def to_state(self) -> SARIMAState:
+        """Compact fitted state for snapshots."""
+        if self.state is None:
+            if not self.is_fitted or self.fitted_model is None:
+                raise RuntimeError("No valid fitted SARIMA model")
+            self.state = SARIMAState.from_results(
+                self.fitted_model, self.best_order, self.best_seasonal_order
+            )
+        return self.state
+
+    @classmethod
+    def from_state(cls, state: SARIMAState, **kwargs) -> "MonthlySARIMATrendRegressor":
+        """A fitted regressor backed by a stored state (no refit)."""
+        reg = cls(**kwargs)
+        reg.state = state
+        reg.best_order = state.order
+        reg.best_seasonal_order = state.seasonal_order
+        reg.is_fitted = True
+        return reg
+
     def predict_next(self):
+        if self.fitted_model is None and self.state is not None:
+            return float(self.state.forecast(1)[0][0])
         if not self.is_fitted or self.fitted_model is None:
             raise RuntimeError("No valid fitted SARIMA model")
-        fc = self.fitted_model.get_forecast(steps=1)
+        with _quiet():
+            fc = self.fitted_model.get_forecast(steps=1)
         return float(fc.predicted_mean.iloc[0])
 
+    def predict_horizon(self, h: int, alpha: float = 0.2):
+        """
+        Forecasts the next `h` months from the already fitted model (no refit).
+
+        Returns (mean, lower, upper) arrays of length h, where the bounds are
+        the model's (1 - alpha) prediction interval.
+        """
+        if self.fitted_model is None and self.state is not None:
+            return self.state.forecast(h, alpha)
+        if not self.is_fitted or self.fitted_model is None:
+            raise RuntimeError("No valid fitted SARIMA model")
+        with _quiet():
+            fc = self.fitted_model.get_forecast(steps=h)
+        bounds = np.asarray(fc.conf_int(alpha=alpha), dtype=float)
+        mean = np.asarray(fc.predicted_mean, dtype=float)
+        return mean, bounds[:, 0], bounds[:, 1]
+
     def get_params(self):
         if not self.is_fitted or self.best_order is None:
             return {"note": "SARIMA not fitted"}
@@ -94,6 +263,11 @@ class MonthlySARIMATrendRegressor:
             "order": self.best_order,
             "seasonal_order": self.best_seasonal_order,
             "aic": (
-                float(self.fitted_model.aic) if self.fitted_model is not None else None
+                float(self.fitted_model.aic) if self.fitted_model is not None
+                else self.state.aic if self.state is not None else None
             ),
+            "n_evaluated": self.n_evaluated,
+            "n_valid_fits": self.n_valid_fits,
+            "search_truncated": self.search_truncated,
+            "seasonality": self.seasonality,
         }
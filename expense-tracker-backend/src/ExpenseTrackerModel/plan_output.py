@@ -0,0 +1,95 @@
+"""
+plan_output.py
+JSON output layer for plans and forecasts.
+
+Results are converted to native Python types once, at the boundary
+(to_native), instead of through a json `default=` hook per object. Encoding
+uses orjson when it is installed (straight to UTF-8 bytes) and the standard
+library otherwise. JSONLinesWriter streams one result per line to a binary
+stream such as sys.stdout.buffer.
+"""
+
+import json
+import sys
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json fallback
+    orjson = None
+
+
+_NATIVE = frozenset((str, int, float, bool, type(None)))
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+
+def to_native(obj):
+    """
+    Recursively converts NumPy scalars / arrays and pandas timestamps to
+    native Python values; containers become dicts and lists. Native leaves
+    are checked by exact type, so already-native plans cost one pass.
+    """
+    kind = type(obj)
+    if kind in _NATIVE:
+        return obj
+    if kind is dict:
+        return {
+            k if type(k) is str else str(to_native(k)): v if type(v) in _NATIVE else to_native(v)
+            for k, v in obj.items()
+        }
+    if kind is list or kind is tuple:
+        return [v if type(v) in _NATIVE else to_native(v) for v in obj]
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (str, int, float)):
+        return obj
+    if isinstance(obj, dict):
+        return to_native(dict(obj))
+    if isinstance(obj, (list, tuple)):
+        return to_native(list(obj))
+    # pd.Period / pd.Timestamp without importing pandas here
+    if type(obj).__module__.startswith("pandas"):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    """Encodes an already-native result to UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    return json.dumps(obj).encode("utf-8")
+
+
+class JSONLinesWriter:
+    """
+    Writes one JSON document per line to a binary stream, without building
+    an intermediate str per result when orjson is available.
+
+    Args:
+        stream: binary file-like object (default: sys.stdout.buffer)
+        flush:  flush after every line (for interactive / piped consumers)
+    """
+
+    def __init__(self, stream=None, flush: bool = False):
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        self.flush = flush
+        self.count = 0
+
+    def write(self, result) -> None:
+        result = to_native(result)
+        if orjson is not None:
+            self.stream.write(orjson.dumps(result, option=_ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE))
+        else:
+            self.stream.write(json.dumps(result).encode("utf-8"))
+            self.stream.write(b"\n")
+        if self.flush:
+            self.stream.flush()
+        self.count += 1
+
+    def write_many(self, results) -> int:
+        for result in results:
+            self.write(result)
+        return self.count
@@ -0,0 +1,347 @@
+"""
+planner_service.py
+Long-running local planning service around BudgetAI.
+
+Keeps a warm forecasting process pool so the Node backend can POST requests
+instead of forking Python per plan. Listens on localhost TCP or a Unix socket.
+
+Routes:
+  POST /plan     body = budget_wrapper.py input (+ optional "user_id") → plan JSON
+  GET  /metrics  Prometheus text: queue depth, latency histogram, model paths
+  GET  /healthz  liveness
+
+Admission control (by requests admitted and not yet answered):
+  - at or above --degrade-at: forecasts skip model fits (recent-mean path)
+  - at or above --max-queue:  503 Overloaded
+Concurrent requests for the same user and history share one forecast.
+With --store, a forecast precomputed by precompute_forecasts.py is used
+whenever its watermark matches the request's transactions. With --snapshot,
+every worker maps the same fitted-SARIMA snapshot read-only and forecasts the
+series in it without refitting. With --pooled, the pooled model saved by
+precompute_forecasts.py --pooled forecasts the labels it covers.
+
+Usage:
+  python planner_service.py --port 8765
+  python planner_service.py --socket /tmp/budget-planner.sock
+  python planner_service.py --store forecasts.sqlite3 --snapshot sarima.snap --pooled pooled.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from async_planner import AsyncBudgetAI, _forecast_worker, shared_process_pool, shutdown_shared_pool
+from budget_planner import BudgetAI
+from forecast_store import ForecastStore
+from models.pooled_trend import POOLED_MODEL_ENV, load_pooled_model
+from models.sarima_snapshot import SNAPSHOT_ENV
+from plan_output import dumps, to_native
+from transactions import TransactionBatch
+
+
+MAX_BODY_BYTES = 32 * 1024 * 1024
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+# ── Metrics ───────────────────────────────────────────────────────────────────
+class LatencyHistogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, seconds: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += seconds
+        self.n += 1
+
+    def render(self, name: str) -> list:
+        lines, running = [f"# TYPE {name} histogram"], 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {running}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.n}')
+        lines.append(f"{name}_sum {self.total:.6f}")
+        lines.append(f"{name}_count {self.n}")
+        return lines
+
+
+class ServiceMetrics:
+    def __init__(self):
+        self.responses = Counter()      # by HTTP status
+        self.degraded = 0
+        self.precomputed = 0            # plans served from the ForecastStore
+        self.model_paths = Counter()    # BudgetAI.MODEL_PATHS
+        self.latency = LatencyHistogram()
+        self.queue_depth = 0
+
+    def render(self, inflight_forecasts: int) -> str:
+        lines = [
+            "# TYPE planner_queue_depth gauge",
+            f"planner_queue_depth {self.queue_depth}",
+            "# TYPE planner_inflight_forecasts gauge",
+            f"planner_inflight_forecasts {inflight_forecasts}",
+            "# TYPE planner_responses_total counter",
+        ]
+        lines += [f'planner_responses_total{{status="{s}"}} {n}' for s, n in sorted(self.responses.items())]
+        lines += ["# TYPE planner_degraded_total counter", f"planner_degraded_total {self.degraded}"]
+        lines += ["# TYPE planner_precomputed_total counter", f"planner_precomputed_total {self.precomputed}"]
+        lines.append("# TYPE planner_model_path_total counter")
+        lines += [
+            f'planner_model_path_total{{path="{p}"}} {self.model_paths.get(p, 0)}'
+            for p in BudgetAI.MODEL_PATHS
+        ]
+        lines += self.latency.render("planner_request_seconds")
+        return "\n".join(lines) + "\n"
+
+
+# ── Service ───────────────────────────────────────────────────────────────────
+class PlannerService:
+    """
+    Args:
+        planner:    AsyncBudgetAI doing the work
+        max_queue:  admitted-request bound; beyond it requests get 503
+        degrade_at: admitted requests at which forecasts stop fitting models
+        deadline:   per-request forecast deadline in seconds (None = no limit)
+        store:      ForecastStore of precomputed forecasts (optional)
+    """
+
+    def __init__(self, planner: AsyncBudgetAI = None, max_queue: int = 64,
+                 degrade_at: int = 32, deadline: float = None, store: ForecastStore = None):
+        self.planner = planner or AsyncBudgetAI()
+        self.store = store
+        self.max_queue = max_queue
+        self.degrade_at = min(degrade_at, max_queue)
+        self.deadline = deadline
+        self.metrics = ServiceMetrics()
+        self._pending = 0
+
+    # ── /plan ─────────────────────────────────────────────────────────────────
+    async def plan(self, payload: dict):
+        """Returns (status, body dict) for one planning request."""
+        if self._pending >= self.max_queue:
+            return 503, {"error": "Planner overloaded, retry later"}
+
+        self._pending += 1
+        self.metrics.queue_depth = self._pending
+        try:
+            monthly_income = payload.get("monthly_income")
+            total_budget = payload.get("total_budget")
+            fit_models = self._pending <= self.degrade_at
+            transactions = payload.get("transactions", [])
+
+            loop = asyncio.get_running_loop()
+            if self.store is not None and payload.get("user_id") is not None:
+                batch, forecast = await loop.run_in_executor(
+                    None, self._precomputed, payload["user_id"], transactions
+                )
+            else:
+                batch = await loop.run_in_executor(None, TransactionBatch.coerce, transactions)
+                forecast = None
+            if forecast is not None:
+                self.metrics.precomputed += 1
+            else:
+                forecast = await self.planner.aforecast(
+                    batch,
+                    user_id=payload.get("user_id"),
+                    deadline=self.deadline,
+                    fit_models=fit_models,
+                )
+            plan = self.planner.ai.plan_from_forecast(
+                forecast,
+                monthly_income=float(monthly_income) if monthly_income else None,
+                total_budget=float(total_budget) if total_budget else None,
+                batch=batch,
+            )
+            self.metrics.model_paths.update(forecast.get("model_paths", {}))
+            if forecast.get("degraded"):
+                plan["degraded"] = True
+                self.metrics.degraded += 1
+            return 200, plan
+        finally:
+            self._pending -= 1
+            self.metrics.queue_depth = self._pending
+
+    def _precomputed(self, user_id, transactions):
+        """
+        Parses `transactions` and looks up the stored forecast for `user_id`.
+        Returns (batch, forecast), forecast None unless its watermark matches
+        the expense rows; a matching forecast gets the income forecast of the
+        batch's income rows.
+        """
+        batch = TransactionBatch.coerce(transactions)
+        forecast = self.store.get(user_id)
+        if forecast is None or forecast.get("watermark") != batch.expenses().watermark():
+            return batch, None
+        return batch, {**forecast, **self.planner.ai.predict_next_month_income(batch)}
+
+    # ── HTTP plumbing ─────────────────────────────────────────────────────────
+    async def _route(self, method: str, path: str, body: bytes):
+        path = path.split("?", 1)[0]
+        if path == "/healthz":
+            return 200, "application/json", b'{"ok": true}'
+        if path == "/metrics":
+            text = self.metrics.render(self.planner.inflight)
+            return 200, "text/plain; version=0.0.4", text.encode()
+        if path != "/plan":
+            return 404, "application/json", b'{"error": "Not found"}'
+        if method != "POST":
+            return 405, "application/json", b'{"error": "Use POST"}'
+
+        try:
+            payload = json.loads(body or b"{}")
+        except Exception as e:
+            return 400, "application/json", json.dumps({"error": f"Failed to parse input: {e}"}).encode()
+
+        try:
+            status, result = await self.plan(payload)
+        except Exception as e:
+            status, result = 500, {"error": f"Model error: {e}"}
+        return status, "application/json", dumps(to_native(result))
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                started = time.perf_counter()
+                raw_length = headers.get("content-length") or "0"
+                length = int(raw_length) if raw_length.isascii() and raw_length.isdigit() else -1
+                if length < 0:
+                    status, ctype, out = 400, "application/json", b'{"error": "Invalid Content-Length"}'
+                elif length > MAX_BODY_BYTES:
+                    status, ctype, out = 413, "application/json", b'{"error": "Payload too large"}'
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, ctype, out = await self._route(method.upper(), path, body)
+
+                if path.startswith("/plan"):
+                    self.metrics.latency.observe(time.perf_counter() - started)
+                    self.metrics.responses[status] += 1
+
+                keep_alive = (
+                    headers.get("connection", "").lower() != "close"
+                    and version.upper() == "HTTP/1.1"
+                    and 0 <= length <= MAX_BODY_BYTES
+                )
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: {ctype}\r\n"
+                    f"Content-Length: {len(out)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + out
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765, socket_path: str = None):
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+            where = socket_path
+        else:
+            server = await asyncio.start_server(self.handle_connection, host=host, port=port)
+            where = f"http://{host}:{port}"
+
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+            except NotImplementedError:  # Windows
+                pass
+
+        print(f"Budget planner listening on {where}", file=sys.stderr)
+        async with server:
+            await stop
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def warm_pool(workers: int, ai=None) -> None:
+    """Starts every worker and imports the model stack before the first request."""
+    pool = shared_process_pool(workers, ai=ai)
+    empty = TransactionBatch.from_records([])
+    for f in [pool.submit(_forecast_worker, empty) for _ in range(workers)]:
+        f.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local BudgetAI planning service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", help="serve on this Unix domain socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--degrade-at", type=int, default=32)
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="seconds before a forecast falls back to the recent mean")
+    parser.add_argument("--store", default=os.environ.get("FORECAST_STORE"),
+                        help="ForecastStore SQLite file written by precompute_forecasts.py")
+    parser.add_argument("--snapshot", default=os.environ.get(SNAPSHOT_ENV),
+                        help="SARIMA snapshot written by precompute_forecasts.py --snapshot")
+    parser.add_argument("--pooled", default=os.environ.get(POOLED_MODEL_ENV),
+                        help="pooled model written by precompute_forecasts.py --pooled")
+    args = parser.parse_args(argv)
+
+    if args.snapshot:
+        os.environ[SNAPSHOT_ENV] = args.snapshot   # read by each pool worker
+
+    planner = AsyncBudgetAI(BudgetAI(pooled_model=load_pooled_model(args.pooled)))
+    warm_pool(args.workers, planner.ai)
+    store = ForecastStore(args.store) if args.store else None
+    service = PlannerService(
+        planner, max_queue=args.max_queue,
+        degrade_at=args.degrade_at, deadline=args.deadline, store=store,
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.socket))
+    finally:
+        shutdown_shared_pool()
+        if store is not None:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
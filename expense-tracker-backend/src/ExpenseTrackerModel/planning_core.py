@@ -0,0 +1,202 @@
+"""
+planning_core.py
+Shared planning pipeline behind every budget entry point.
+
+  parse     → TransactionBatch   (once per request, columnar)
+  aggregate → MonthlyTotals      (one bincount over labelled rows)
+  classify  → labeler policy:    any object with predict(category, description)
+  clean     → winsorize():       Hampel clipping of outlier months, all labels at once
+  forecast  → per-label series predictor (see BudgetAI._predict_series)
+  allocate  → allocation policy: callable(totals, **inputs) → plan
+
+budget_planner.BudgetAI, the legacy budget_planner0.BudgetAI and
+budgert_creator.create_smart_budget all run through PlanningCore and differ
+only in the policies they plug in. This module imports no model code, so the
+lightweight planners do not pay for statsmodels / pmdarima.
+"""
+
+import hashlib
+import json
+from collections import Counter
+
+import numpy as np
+
+from transactions import MonthlyTotals, MonthlyTotalsBuilder, TransactionBatch
+
+
+# Hampel filter over each label's positive months: a month further than
+# HAMPEL_K robust standard deviations (1.4826 · MAD) from the label's median is
+# clipped to that bound. The scale is floored at HAMPEL_MIN_SCALE × median so
+# near-constant series do not flag every small change, and labels with fewer
+# than HAMPEL_MIN_MONTHS positive months are left alone.
+HAMPEL_K = 3.0
+HAMPEL_MIN_MONTHS = 6
+HAMPEL_MIN_SCALE = 0.1
+MAD_TO_SIGMA = 1.4826
+
+
+def hampel_winsorize(values: np.ndarray, k: float = HAMPEL_K, min_months: int = HAMPEL_MIN_MONTHS,
+                     min_scale: float = HAMPEL_MIN_SCALE, skip=None):
+    """
+    Winsorizes every row of a label × month matrix in one vectorized pass.
+    Zero months (no spend) are ignored and stay 0.
+
+    Args:
+        values: (labels, months) float array
+        skip:   optional bool array over rows to leave untouched
+
+    Returns (clipped values, flags) where flags is an int8 matrix: +1 for
+    months clipped down, -1 for months clipped up, 0 otherwise.
+    """
+    positive = values > 0
+    masked = np.where(positive, values, np.nan)
+    n = positive.sum(axis=1)
+    eligible = n >= min_months
+    if skip is not None:
+        eligible &= ~np.asarray(skip, dtype=bool)
+    if not eligible.any():
+        return values, np.zeros(values.shape, dtype=np.int8)
+
+    rows = masked[eligible]
+    median = np.nanmedian(rows, axis=1)
+    mad = np.nanmedian(np.abs(rows - median[:, None]), axis=1)
+    spread = k * np.maximum(MAD_TO_SIGMA * mad, min_scale * median)
+    lower = np.maximum(median - spread, 0.0)[:, None]
+    upper = (median + spread)[:, None]
+
+    clipped = values.copy()
+    flags = np.zeros(values.shape, dtype=np.int8)
+    sub = values[eligible]
+    sub_positive = positive[eligible]
+    high = sub_positive & (sub > upper)
+    low = sub_positive & (sub < lower)
+    clipped[eligible] = np.where(high, upper, np.where(low, lower, sub))
+    flags[eligible] = high.astype(np.int8) - low.astype(np.int8)
+    return clipped, flags
+
+
+# ── Labelers ──────────────────────────────────────────────────────────────────
+class CategoryNameLabeler:
+    """Uses the app category itself as the label, upper-cased and stripped."""
+
+    def predict(self, category: str, description: str = "") -> str:
+        return str(category).upper().strip()
+
+
+# ── PlanningCore ──────────────────────────────────────────────────────────────
+class PlanningCore:
+    """
+    Args:
+        labeler: classification policy mapping (category, description) to a
+                 label; called once per distinct pair, cached per batch
+    """
+
+    def __init__(self, labeler):
+        self.labeler = labeler
+
+    @staticmethod
+    def batch(data) -> TransactionBatch:
+        """Parses transaction dicts (or passes a batch through) exactly once."""
+        return TransactionBatch.coerce(data)
+
+    def totals(self, data, income: bool = False, window_months: int = None) -> MonthlyTotals:
+        """
+        Label × month totals for expense rows (or income rows when
+        `income=True`).
+
+        Args:
+            data:          list of dicts, TransactionBatch or MonthlyTotals
+                           (returned unchanged)
+            window_months: keep only the trailing N calendar months, filtered
+                           on the batch before labelling and aggregation
+        """
+        if isinstance(data, MonthlyTotals):
+            return data
+        batch = self.batch(data)
+        if window_months and len(batch):
+            selected = batch.month[batch.is_income == income]
+            if len(selected):
+                batch = batch.take(batch.month > int(selected.max()) - window_months)
+        return batch.monthly_totals(self.labeler, income=income)
+
+    def stream_totals(self, chunks, income: bool = False, max_bytes: int = None) -> MonthlyTotals:
+        """
+        Label × month totals from an iterable of TransactionBatch chunks
+        (e.g. TransactionBatch.iter_ndjson), holding one chunk at a time.
+        Same result as totals() on the concatenated rows.
+        """
+        builder = MonthlyTotalsBuilder(self.labeler, income=income, max_bytes=max_bytes)
+        for chunk in chunks:
+            builder.add(chunk)
+        return builder.totals()
+
+    @staticmethod
+    def winsorize(totals: MonthlyTotals, exclude=()):
+        """
+        Hampel-clips outlier months of every label (hampel_winsorize) except
+        those in `exclude`. Returns (clipped MonthlyTotals, flags matrix).
+        """
+        if not len(totals):
+            return totals, np.zeros(totals.values.shape, dtype=np.int8)
+        skip = np.array([label in exclude for label in totals.labels], dtype=bool)
+        clipped, flags = hampel_winsorize(totals.values, skip=skip)
+        if not flags.any():
+            return totals, flags
+        return totals.with_values(clipped), flags
+
+    def one_offs(self, batch: TransactionBatch, totals: MonthlyTotals, clipped: MonthlyTotals) -> np.ndarray:
+        """
+        Marks one-off purchases: in each month clipped down, the largest
+        expense row when its amount alone covers the excess clipped off
+        (e.g. a laptop under Shopping). Returns a bool mask over the batch's
+        rows.
+        """
+        mask = np.zeros(len(batch), dtype=bool)
+        excess = totals.values - clipped.values
+        if not len(batch) or not (excess > 0).any():
+            return mask
+        codes, labels = batch.label_codes(self.labeler)
+        row_of = {label: i for i, label in enumerate(totals.labels)}
+        label_row = np.array([row_of.get(label, -1) for label in labels], dtype=np.int64)[codes]
+        col = batch.month - totals.start_month
+        ok = ~batch.is_income & (label_row >= 0) & (col >= 0) & (col < excess.shape[1])
+        flat = np.where(ok, label_row * excess.shape[1] + col, 0)
+        largest = np.zeros(excess.size)
+        np.maximum.at(largest, flat[ok], batch.amount[ok])
+        cell = np.where(ok, excess.ravel()[flat], 0.0)
+        return ok & (cell > 0) & (batch.amount >= cell) & (batch.amount == largest[flat])
+
+    @staticmethod
+    def input_hash(batch: TransactionBatch, **inputs) -> str:
+        """
+        Canonical hash of a planning request: the history's order-independent
+        watermark plus the scalar inputs (key order does not matter). Equal
+        hashes mean a deterministic planner produces byte-identical output.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(batch.watermark().encode("ascii"))
+        h.update(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8"))
+        return h.hexdigest()
+
+    @staticmethod
+    def forecast(totals: MonthlyTotals, predict, keep_zero: bool = False):
+        """
+        Runs `predict(values, category_name=label, paths=paths)` over every
+        label's positive monthly totals.
+
+        Returns (breakdown dict, Counter of model paths). Labels predicted at
+        0 are dropped unless `keep_zero`.
+        """
+        predictions = {}
+        paths = Counter()
+        for label, values in totals.items():
+            if not label:
+                continue
+            pred = predict(values, category_name=label, paths=paths)
+            if pred > 0 or keep_zero:
+                predictions[label] = pred
+        return predictions, paths
+
+    def plan(self, data, allocate, window_months: int = None, **inputs):
+        """Aggregates `data` once and hands the totals to the allocation policy."""
+        return allocate(self.totals(data, window_months=window_months), **inputs)
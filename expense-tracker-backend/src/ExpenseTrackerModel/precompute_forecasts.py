@@ -0,0 +1,179 @@
+"""
+precompute_forecasts.py
+Batch job: precomputes next month's forecast for every user with new data.
+
+Reads newline-delimited JSON, one user per line, in the budget_wrapper.py
+input shape: {"user_id": "...", "transactions": [...]}. Users whose stored
+forecast already has the history's watermark are skipped; the rest are
+forecast in a process pool and upserted into the ForecastStore. At request
+time budget_wrapper.py / planner_service.py use the stored forecast while
+its watermark matches and fall back to live forecasting otherwise.
+
+With --snapshot, the fitted SARIMA state of every forecast series is also
+written to one flat snapshot file (models/sarima_snapshot.py). Series already
+in the previous snapshot are not refitted, and planner_service.py /
+budget_wrapper.py map the file (SARIMA_SNAPSHOT) to forecast those series
+without fitting. States carry over between runs; delete the file to rebuild
+it from scratch.
+
+With --pooled (default: $POOLED_MODEL), the PooledSeasonalModel is first
+refitted on every user's monthly totals and saved there, then used for this
+run's forecasts; planner_service.py / budget_wrapper.py load the file
+(POOLED_MODEL) so live forecasts match the stored ones. Users skipped for an
+unchanged watermark keep the forecast made with the previous table.
+
+Prints a JSON summary to stdout.
+
+Usage (e.g. nightly from cron):
+  node export_histories.js | python precompute_forecasts.py --store forecasts.sqlite3
+  python precompute_forecasts.py --input histories.ndjson --workers 4 --snapshot sarima.snap
+  python precompute_forecasts.py --input histories.ndjson --pooled pooled.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from budget_planner import BudgetAI
+from forecast_store import ForecastStore
+from models.pooled_trend import POOLED_MODEL_ENV, PooledSeasonalModel, load_pooled_model
+from models.sarima_snapshot import open_snapshot, write_snapshot
+from transactions import TransactionBatch
+
+
+DEFAULT_STORE = os.environ.get(
+    "FORECAST_STORE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "forecasts.sqlite3")
+)
+
+
+_WORKER_AI = None
+
+
+def _init_worker(snapshot_path: str = None, pooled_path: str = None) -> None:
+    global _WORKER_AI
+    _WORKER_AI = BudgetAI(
+        pooled_model=load_pooled_model(pooled_path) if pooled_path else None,
+        snapshot=open_snapshot(snapshot_path) if snapshot_path else None,
+        state_sink={},
+    )
+
+
+def _precompute_worker(batch: TransactionBatch):
+    """Returns (forecast, {series key: SARIMAState}) for one user."""
+    _WORKER_AI.state_sink = {}
+    forecast = _WORKER_AI.predict_next_month_budget(batch)
+    return forecast, _WORKER_AI.state_sink
+
+
+def read_users(lines):
+    """Yields (user_id, TransactionBatch) for every well-formed input line."""
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        user_id = record.get("user_id")
+        if user_id is None:
+            continue
+        yield str(user_id), TransactionBatch.from_records(record.get("transactions") or [])
+
+
+def fit_pooled(batches) -> PooledSeasonalModel:
+    """PooledSeasonalModel fitted on the monthly totals of every batch."""
+    core = BudgetAI().core
+    return PooledSeasonalModel().fit(
+        item for batch in batches for item in core.totals(batch).positive_series()
+    )
+
+
+def precompute(lines, store: ForecastStore, workers: int = None, commit_every: int = 100,
+               snapshot: str = None, pooled: str = None) -> dict:
+    """
+    Forecasts every user whose watermark changed and stores the results;
+    with `snapshot`, also writes the fitted SARIMA states there; with
+    `pooled`, first refits the pooled model on all users, saves it there and
+    forecasts with it.
+
+    Returns {"users", "computed", "skipped", "failed", "seconds"}
+    (+ "snapshot_states" with `snapshot`, "pooled_labels" with `pooled`).
+    """
+    started = time.perf_counter()
+    summary = {"users": 0, "computed": 0, "skipped": 0, "failed": 0}
+    pending = []
+    previous = open_snapshot(snapshot) if snapshot else None
+    states = dict(previous.items()) if previous is not None else {}
+
+    # Stored forecasts cover spending only; income is forecast per request
+    users = ((user_id, batch.expenses()) for user_id, batch in read_users(lines))
+    if pooled:
+        users = list(users)   # one pass to fit the shared table, one to forecast
+        model = fit_pooled(batch for _, batch in users)
+        model.save(pooled)
+        summary["pooled_labels"] = len(model.table)
+
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        initializer=_init_worker,
+        initargs=(snapshot if previous is not None else None, pooled),
+    ) as pool:
+        futures = {}
+        for user_id, batch in users:
+            summary["users"] += 1
+            watermark = batch.watermark()
+            if store.watermark(user_id) == watermark:
+                summary["skipped"] += 1
+                continue
+            futures[pool.submit(_precompute_worker, batch)] = (user_id, watermark)
+
+        for future in as_completed(futures):
+            user_id, watermark = futures[future]
+            try:
+                forecast, fitted = future.result()
+                pending.append((user_id, watermark, forecast))
+                states.update(fitted)
+            except Exception as e:
+                summary["failed"] += 1
+                print(f"Forecast failed for {user_id}: {e}", file=sys.stderr)
+                continue
+            summary["computed"] += 1
+            if len(pending) >= commit_every:
+                store.put_many(pending)
+                pending = []
+
+    if pending:
+        store.put_many(pending)
+    if snapshot:
+        write_snapshot(snapshot, states)
+        summary["snapshot_states"] = len(states)
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute next-month forecasts")
+    parser.add_argument("--input", help="NDJSON file of user histories (default: stdin)")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="ForecastStore SQLite file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--snapshot", help="SARIMA snapshot file to reuse and rewrite")
+    parser.add_argument("--pooled", default=os.environ.get(POOLED_MODEL_ENV),
+                        help="pooled model JSON to refit, save and forecast with")
+    args = parser.parse_args(argv)
+
+    store = ForecastStore(args.store)
+    try:
+        if args.input:
+            with open(args.input, encoding="utf-8") as f:
+                summary = precompute(f, store, args.workers, snapshot=args.snapshot, pooled=args.pooled)
+        else:
+            summary = precompute(sys.stdin, store, args.workers, snapshot=args.snapshot, pooled=args.pooled)
+    finally:
+        store.close()
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+profiling.py
+Low-overhead sampling profiler for one planning request.
+
+A background thread snapshots the profiled thread's Python stack every
+`interval` seconds (sys._current_frames), so cost does not grow with the
+number of function calls the way a deterministic profiler's does. Samples
+are kept as collapsed stacks, the input format of flamegraph.pl / speedscope
+/ inferno:
+
+  main (budget_wrapper.py:178);plan_payload (budget_wrapper.py:73);... 42
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+DEFAULT_INTERVAL = 0.005
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's stack until stopped; usable as a context manager.
+
+    Args:
+        interval:  seconds between samples
+        thread_id: thread to sample (default: the thread calling start())
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, thread_id: int = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.samples = 0
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    # ── Control ───────────────────────────────────────────────────────────────
+    def start(self) -> "SamplingProfiler":
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.seconds += time.perf_counter() - self._started
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _run(self) -> None:
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    # ── Reports ───────────────────────────────────────────────────────────────
+    def collapsed(self) -> str:
+        """Collapsed-stack text, one "frame;frame;... count" line per stack."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def write_collapsed(self, path: str) -> str:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return path
+
+    def top(self, n: int = 15) -> list:
+        """
+        Hottest functions by samples on top of the stack ("self") and on the
+        stack at all ("total", counted once per sample for recursion).
+
+        Returns [{"function", "self", "total", "self_pct", "total_pct"}, ...]
+        sorted by self samples.
+        """
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+
+        scale = 100 / max(self.samples, 1)
+        return [
+            {
+                "function":  function,
+                "self":      samples,
+                "total":     total[function],
+                "self_pct":  round(samples * scale, 1),
+                "total_pct": round(total[function] * scale, 1),
+            }
+            for function, samples in own.most_common(n)
+        ]
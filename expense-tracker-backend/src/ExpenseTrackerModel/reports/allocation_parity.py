@@ -0,0 +1,108 @@
+"""
+reports/allocation_parity.py
+Checks that the array allocator (allocate_many / plan_scenarios) produces
+the same plans as the reference dict allocator on random forecasts.
+
+Exits non-zero on any mismatch. Run from ExpenseTrackerModel/:
+  python reports/allocation_parity.py
+  python -m reports.allocation_parity
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget_planner import BudgetAI
+
+
+# Labels the planner can emit, plus a couple it has never heard of
+# (unclassified → wants) to exercise every branch of the breakdown order.
+PARITY_LABELS = sorted(BudgetAI.NEEDS_LABELS | BudgetAI.WANTS_LABELS) + ["Pets", "Charity"]
+
+
+def random_forecast(rng: random.Random) -> dict:
+    """
+    Random forecast shaped like predict_next_month_budget output, biased
+    towards the edge cases: empty sides, fixed costs above the cap and
+    tied amounts that make trimming order matter.
+    """
+    n = rng.choice([0, 1, 2, 3, 5, 8, 12, len(PARITY_LABELS)])
+    labels = rng.sample(PARITY_LABELS, n)
+    breakdown = {}
+    for label in labels:
+        breakdown[label] = rng.choice([
+            rng.randint(1, 500),
+            rng.randint(500, 20000),
+            rng.randint(20000, 200000),
+            1000,  # shared value → ties
+        ])
+    return {
+        "breakdown":       breakdown,
+        "total_predicted": sum(breakdown.values()),
+        "data_months":     rng.randint(0, 36),
+    }
+
+
+def random_inputs(rng: random.Random) -> tuple:
+    """Random (monthly_income, total_budget), including None / 0 / fractional values."""
+    income = rng.choice([None, 0, rng.randint(1, 300000), rng.uniform(1000, 300000)])
+    budget = rng.choice([None, None, 0.0, rng.randint(0, 200000), rng.uniform(0, 200000)])
+    return income, budget
+
+
+def check_allocation_parity(n_users: int = 2000, seed: int = 0, ai: BudgetAI = None) -> dict:
+    """
+    Compares the array allocator (BudgetAI.allocate_many / plan_scenarios)
+    with the reference dict implementation (BudgetAI.allocate_budget) on
+    random forecasts and inputs.
+
+    Returns {"checked": int, "mismatches": [ {...}, ... ]}; an empty
+    mismatch list means both paths produced identical plans.
+    """
+    ai = ai or BudgetAI()
+    rng = random.Random(seed)
+
+    forecasts = [random_forecast(rng) for _ in range(n_users)]
+    inputs = [random_inputs(rng) for _ in range(n_users)]
+
+    mismatches = []
+    checked = 0
+
+    # Users × categories
+    batch = ai.allocate_many(
+        forecasts, [i for i, _ in inputs], [b for _, b in inputs]
+    )
+    for i, (fc, (income, budget)) in enumerate(zip(forecasts, inputs)):
+        expected = ai.allocate_budget(fc, income, budget)
+        actual = batch.plan(i)
+        checked += 1
+        if actual != expected or list(actual["needs_breakdown"]) != list(expected["needs_breakdown"]) \
+                or list(actual["wants_breakdown"]) != list(expected["wants_breakdown"]):
+            mismatches.append({"path": "allocate_many", "index": i, "forecast": fc,
+                               "monthly_income": income, "total_budget": budget,
+                               "expected": expected, "actual": actual})
+
+    # Scenarios × categories over a handful of forecasts
+    for fc in forecasts[: min(20, n_users)]:
+        scenarios = [random_inputs(rng) for _ in range(50)]
+        plans = ai.plan_scenarios(fc, scenarios)
+        for i, (income, budget) in enumerate(scenarios):
+            expected = ai.allocate_budget(fc, income, budget)
+            actual = plans.plan(i)
+            checked += 1
+            if actual != expected:
+                mismatches.append({"path": "plan_scenarios", "index": i, "forecast": fc,
+                                   "monthly_income": income, "total_budget": budget,
+                                   "expected": expected, "actual": actual})
+
+    return {"checked": checked, "mismatches": mismatches}
+
+
+if __name__ == "__main__":
+    report = check_allocation_parity()
+    print(f"checked {report['checked']} plans, {len(report['mismatches'])} mismatches")
+    for m in report["mismatches"][:5]:
+        print(m)
+    sys.exit(1 if report["mismatches"] else 0)
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from reports.performance import MODEL_TYPES, evaluate_model
+
+
+CORPUS_SEED = 7
+CORPUS_MONTHS = 30
+SERIES_SCALE = 1000.0        # every corpus series is rescaled to this mean
+MIN_SERIES_MONTHS = 24       # evaluate_model needs 12 train + 6 test points
+
+# Allowed worsening before a run fails: relative, plus an absolute slack so
+# sub-millisecond models do not trip on timer noise
+THRESHOLDS = {
+    "mae":         (0.05, 0.5),     # 5%, or 0.5 on the 1000-mean scale
+    "mape":        (0.05, 0.2),     # 5%, or 0.2 percentage points
+    "fit_ms":      (0.50, 1.0),     # 50%, or 1 ms (wall time is noisy)
+    "peak_kib":    (0.30, 64.0),    # 30%, or 64 KiB
+}
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "forecast_baseline.json")
+
+
+# ── Corpus ────────────────────────────────────────────────────────────────────
+def synthetic_corpus(months: int = CORPUS_MONTHS, seed: int = CORPUS_SEED) -> dict:
+    """
+    Fixed synthetic category series covering the shapes the planner sees:
+    flat bills, trends, yearly seasonality, level shifts, spikes and noise.
+    Same seed → same corpus.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(months, dtype=float)
+    season = np.sin(2 * np.pi * t / 12)
+    shapes = {
+        "flat":            lambda: np.full(months, 1.0),
+        "flat_noisy":      lambda: 1 + rng.normal(0, 0.1, months),
+        "trend_up":        lambda: 0.7 + 0.02 * t + rng.normal(0, 0.05, months),
+        "trend_down":      lambda: 1.4 - 0.015 * t + rng.normal(0, 0.05, months),
+        "seasonal":        lambda: 1 + 0.4 * season + rng.normal(0, 0.05, months),
+        "seasonal_trend":  lambda: 0.8 + 0.015 * t + 0.3 * season + rng.normal(0, 0.05, months),
+        "level_shift":     lambda: np.where(t < months // 2, 0.8, 1.3) + rng.normal(0, 0.05, months),
+        "spiky":           lambda: 1 + rng.normal(0, 0.05, months) + 2.0 * (rng.random(months) < 0.1),
+        "heavy_noise":     lambda: rng.lognormal(0, 0.5, months),
+        "december_peak":   lambda: 1 + 1.5 * (t % 12 == 11) + rng.normal(0, 0.05, months),
+    }
+    corpus = {}
+    for name, make in shapes.items():
+        for i in range(2):
+            corpus[f"synthetic/{name}/{i}"] = _rescale(np.maximum(make(), 0.05))
+    return corpus
+
+
+def anonymised_corpus(lines, min_months: int = MIN_SERIES_MONTHS) -> dict:
+    """
+    Category series from an export_histories.js NDJSON dump with user ids and
+    labels dropped and every series rescaled to a mean of SERIES_SCALE, so the
+    corpus can be committed without revealing amounts or identities.
+    """
+    from budget_planner import BudgetAI
+    from precompute_forecasts import read_users
+
+    core = BudgetAI().core
+    corpus = {}
+    for _, batch in read_users(lines):
+        for _, values in core.totals(batch).items():
+            if len(values) >= min_months:
+                corpus[f"anonymised/{len(corpus)}"] = _rescale(values)
+    return corpus
+
+
+def _rescale(values) -> list:
+    values = np.asarray(values, dtype=float)
+    return [round(float(v), 2) for v in values * (SERIES_SCALE / values.mean())]
+
+
+def load_corpus(path: str = None) -> dict:
+    """The synthetic corpus plus the anonymised series saved at `path`, if any."""
+    corpus = synthetic_corpus()
+    if path:
+        with open(path, encoding="utf-8") as f:
+            corpus.update(json.load(f))
+    return corpus
+
+
+# ── Replay ────────────────────────────────────────────────────────────────────
+def _peak_kib(model_type: str, values: np.ndarray) -> float:
+    """Peak traced allocation (KiB) of one full-history evaluation."""
+    tracemalloc.start()
+    try:
+        evaluate_model(values, model_type=model_type, min_train_months=len(values) - 1, min_test_points=1)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def replay(corpus: dict, model_types=MODEL_TYPES) -> dict:
+    """
+    Rolling one-step-ahead evaluation of every forecaster on every corpus
+    series (reports.performance.evaluate_model).
+
+    Returns {model_type: {"mae", "mape", "fit_ms", "peak_kib", "n_series",
+    "n_test"}} where mae / mape are means over series, fit_ms the mean wall
+    time per fit + forecast, and peak_kib the peak Python-heap allocation of
+    fitting the longest series once (measured in a separate, traced pass so
+    tracing does not inflate fit_ms).
+    """
+    series = [np.asarray(v, dtype=float) for v in corpus.values()]
+    longest = max(series, key=len)
+    results = {}
+    for model_type in model_types:
+        maes, mapes, fit_ms, n_test = [], [], 0.0, 0
+        for values in series:
+            metrics = evaluate_model(values, model_type=model_type)
+            if metrics is None:
+                continue
+            maes.append(metrics["mae"])
+            if not np.isnan(metrics["mape"]):
+                mapes.append(metrics["mape"])
+            fit_ms += metrics["fit_ms_avg"] * metrics["n_test"]
+            n_test += metrics["n_test"]
+        if not n_test:
+            continue
+        results[model_type] = {
+            "mae":      round(float(np.mean(maes)), 2),
+            "mape":     round(float(np.mean(mapes)), 2) if mapes else None,
+            "fit_ms":   round(fit_ms / n_test, 3),
+            "peak_kib": round(_peak_kib(model_type, longest), 1),
+            "n_series": len(maes),
+            "n_test":   n_test,
+        }
+    return results
+
+
+# ── Baseline comparison ───────────────────────────────────────────────────────
+def compare(current: dict, baseline: dict, thresholds: dict = THRESHOLDS) -> list:
+    """
+    Metrics that got worse than the baseline by more than both the relative
+    and the absolute allowance (lower is better for every metric).
+
+    Returns [{"model", "metric", "baseline", "current", "limit"}, ...].
+    """
+    regressions = []
+    for model_type, metrics in current.items():
+        base = baseline.get(model_type)
+        if base is None:
+            continue
+        for metric, (relative, absolute) in thresholds.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            limit = old + max(abs(old) * relative, absolute)
+            if new > limit:
+                regressions.append({
+                    "model":    model_type,
+                    "metric":   metric,
+                    "baseline": old,
+                    "current":  new,
+                    "limit":    round(limit, 3),
+                })
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Replay the forecast corpus through every forecaster and compare with a baseline."
+    )
+    parser.add_argument("--corpus", help="JSON {name: [monthly totals]} of anonymised series to add")
+    parser.add_argument("--export", help="build --corpus from this export_histories.js NDJSON dump and exit")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON (default: %(default)s)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="record this run as the baseline (required when none exists yet)")
+    parser.add_argument("--models", nargs="*", default=list(MODEL_TYPES), help="forecasters to replay")
+    args = parser.parse_args(argv)
+
+    if args.export:
+        if not args.corpus:
+            parser.error("--export needs --corpus to write to")
+        with open(args.export, encoding="utf-8") as f:
+            corpus = anonymised_corpus(f)
+        with open(args.corpus, "w", encoding="utf-8") as f:
+            json.dump(corpus, f)
+        print(f"wrote {len(corpus)} anonymised series to {args.corpus}")
+        return 0
+
+    corpus = load_corpus(args.corpus)
+    started = time.perf_counter()
+    current = replay(corpus, args.models)
+    print(f"{len(corpus)} series, {time.perf_counter() - started:.1f}s")
+    print(f"{'model':<14}{'mae':>9}{'mape %':>9}{'fit ms':>10}{'peak KiB':>11}")
+    for model_type, m in current.items():
+        mape = "-" if m["mape"] is None else m["mape"]
+        print(f"{model_type:<14}{m['mae']:>9}{mape:>9}{m['fit_ms']:>10}{m['peak_kib']:>11}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"baseline recorded in {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; record one with --update-baseline", file=sys.stderr)
+        return 2
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline)
+    for r in regressions:
+        print(f"REGRESSION {r['model']} {r['metric']}: {r['baseline']} → {r['current']} (limit {r['limit']})")
+    if not regressions:
+        print("no regressions against the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from budget_planner import KeywordCategorizer
+
+
+ROW_COUNTS = (10_000, 50_000, 200_000, 500_000)
+MODES = ("full", "stream")
+
+
+def write_history(path: str, n_rows: int, months: int = 36, seed: int = 0) -> None:
+    """
+    Writes a streaming-mode payload (header line + one expense per line) of
+    `n_rows` synthetic transactions spread over `months` months.
+    """
+    rng = random.Random(seed)
+    categories = list(KeywordCategorizer.CATEGORY_MAP)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"monthly_income": 50000}) + "\n")
+        for i in range(n_rows):
+            year, month = divmod(i % months, 12)
+            category = rng.choice(categories)
+            f.write(json.dumps({
+                "date":        f"{2022 + year}-{month + 1:02d}-{rng.randint(1, 28):02d}T10:00:00.000Z",
+                "amount":      rng.randint(50, 5000),
+                "category":    category,
+                "description": f"{category} purchase {rng.randint(0, 50)}",
+                "type":        "Expense",
+            }) + "\n")
+
+
+def _child(mode: str, path: str) -> None:
+    """Aggregates the file in this process and prints peak RSS (MiB) as JSON."""
+    from budget_planner import BudgetAI
+    from budget_wrapper import DEFAULT_MEMORY_LIMIT_MB, stream_totals
+    from transactions import TransactionBatch
+
+    ai = BudgetAI()
+    started = time.perf_counter()
+    with open(path, encoding="utf-8") as f:
+        f.readline()
+        if mode == "full":
+            # What budget_wrapper.py does with one JSON document today
+            transactions = [json.loads(line) for line in f]
+            totals = ai.core.totals(TransactionBatch.from_records(transactions))
+        else:
+            totals = stream_totals(ai, f, DEFAULT_MEMORY_LIMIT_MB)
+    print(json.dumps({
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "seconds":     round(time.perf_counter() - started, 3),
+        "labels":      len(totals),
+        "months":      totals.data_months,
+    }))
+
+
+def benchmark_ingest_memory(row_counts=ROW_COUNTS) -> list:
+    """
+    Peak RSS of aggregating N-row histories, loading every row at once
+    ("full") versus chunked streaming ("stream"). Each run is a fresh
+    process so peaks do not carry over.
+
+    Returns [{"rows", "mode", "peak_rss_mb", "seconds", "labels", "months"}, ...].
+    """
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in row_counts:
+            path = os.path.join(tmp, f"history_{n_rows}.ndjson")
+            write_history(path, n_rows)
+            for mode in MODES:
+                out = subprocess.run(
+                    [sys.executable, "-m", "reports.ingest_memory", "--child", mode, path],
+                    cwd=here, capture_output=True, text=True, check=True,
+                )
+                results.append({"rows": n_rows, "mode": mode, **json.loads(out.stdout)})
+    return results
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        _child(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    counts = tuple(int(n) for n in sys.argv[1:]) or ROW_COUNTS
+    print(f"{'rows':>9}  {'mode':<6}  {'peak RSS MiB':>12}  {'seconds':>8}")
+    for r in benchmark_ingest_memory(counts):
+        print(f"{r['rows']:>9}  {r['mode']:<6}  {r['peak_rss_mb']:>12}  {r['seconds']:>8}")
@@ -1,3 +1,5 @@
+import time
+
 import numpy as np
 from sklearn.metrics import (
     mean_absolute_error,
@@ -7,6 +9,16 @@ from sklearn.metrics import (
 )
 from models.linear_trend import MonthlyTrendRegressor
 from models.sarima_trend import MonthlySARIMATrendRegressor
+from models.ets_trend import ETS_METHODS, MonthlyETSTrendRegressor
+from models.pooled_trend import PooledSeasonalModel
+from telemetry import get_telemetry
+
+
+# model_type → ETS method ('ets' picks the best method by AIC per fit)
+ETS_MODEL_TYPES = {"ets": "auto", **{m: m for m in ETS_METHODS}}
+
+# Every forecaster evaluate_model can replay (see reports/forecast_regression.py)
+MODEL_TYPES = ("mean", "linear", *ETS_MODEL_TYPES, "sarima")
 
 
 def evaluate_linear_trend(values: np.ndarray) -> dict | None:
@@ -138,6 +150,11 @@ def evaluate_model(
         'linear'   → Linear trend
         'sarima'   → Seasonal ARIMA
         'mean'     → Naive recent mean baseline
+        'ets'      → Exponential smoothing, best of the family by AIC
+        'ses' / 'holt' / 'holt_winters' / 'theta' → one ETS method
+
+    The result includes "fit_ms_avg", the mean wall time per fit + forecast,
+    so accuracy can be weighed against cost.
 
     Returns None if not enough data for meaningful evaluation.
     """
@@ -146,9 +163,13 @@ def evaluate_model(
 
     preds, actuals = [], []
     start_idx = min_train_months
+    elapsed = 0.0
+    telemetry = get_telemetry()
+    tags = {"model": model_type}
 
     for i in range(start_idx, len(values)):
         train = values[:i]
+        started = time.perf_counter()
 
         try:
             if model_type == "linear":
@@ -164,6 +185,12 @@ def evaluate_model(
                 ).fit(train)
                 pred = model.predict_next() if model.is_fitted else np.mean(train[-6:])
 
+            elif model_type in ETS_MODEL_TYPES:
+                model = MonthlyETSTrendRegressor(
+                    method=ETS_MODEL_TYPES[model_type], seasonal_period=12
+                ).fit(train)
+                pred = model.predict_next() if model.is_fitted else np.mean(train[-6:])
+
             elif model_type == "mean":
                 pred = np.mean(train[-6:]) if len(train) >= 6 else np.mean(train)
 
@@ -172,8 +199,13 @@ def evaluate_model(
 
         except Exception:
             # Safe fallback
+            telemetry.incr("evaluate.fallback", tags=tags)
             pred = np.mean(train[-6:]) if len(train) >= 6 else np.mean(train)
 
+        fit_seconds = time.perf_counter() - started
+        telemetry.observe("evaluate.fit_ms", fit_seconds * 1000, tags)
+        elapsed += fit_seconds
+
         preds.append(pred)
         actuals.append(values[i])
 
@@ -196,11 +228,13 @@ def evaluate_model(
         "mae": round(mean_absolute_error(actuals_arr, preds_arr), 2),
         "rmse": round(np.sqrt(mean_squared_error(actuals_arr, preds_arr)), 2),
         "mape": round(mape, 1) if not np.isnan(mape) else np.nan,
-        "r2": round(r2_score(actuals_arr, preds_arr), 3),
+        # R² is undefined for a single test point (sklearn warns and returns nan)
+        "r2": round(r2_score(actuals_arr, preds_arr), 3) if len(preds) > 1 else np.nan,
         "n_test": len(preds),
         "n_train_avg": round(
             np.mean([len(values[:j]) for j in range(start_idx, len(values))])
         ),
+        "fit_ms_avg": round(elapsed / len(preds) * 1000, 3),
     }
 
 
@@ -216,7 +250,7 @@ def compare_models(values: np.ndarray) -> dict:
     """
     results = {}
 
-    for model_type in ["mean", "linear", "sarima"]:
+    for model_type in ["mean", "linear", "ets", "theta", "sarima"]:
         metrics = evaluate_model(
             values=values, model_type=model_type, min_train_months=12, min_test_points=6
         )
@@ -224,3 +258,90 @@ def compare_models(values: np.ndarray) -> dict:
             results[model_type] = metrics
 
     return results
+
+
+# ──────────────────────────────────────────────────────────────
+#        Pooled (cross-user) model vs per-series SARIMA
+# ──────────────────────────────────────────────────────────────
+
+
+def _error_summary(actuals: list, preds: list, seconds: float) -> dict:
+    actuals_arr = np.array(actuals, dtype=float)
+    preds_arr = np.array(preds, dtype=float)
+    return {
+        "mae": round(mean_absolute_error(actuals_arr, preds_arr), 2),
+        "mape": round(mean_absolute_percentage_error(actuals_arr, preds_arr) * 100, 1),
+        "n_test": len(preds),
+        "seconds": round(seconds, 3),
+    }
+
+
+def backtest_pooled(
+    user_totals: list,
+    holdout: int = 3,
+    min_train_points: int = 6,
+    max_series: int = None,
+) -> dict | None:
+    """
+    Backtests PooledSeasonalModel against per-series SARIMA.
+
+    For each of the last `holdout` months, every user's MonthlyTotals is cut
+    at that month, the pooled model is refitted on all users' training
+    histories (so no test month leaks into the shared parameters), and each
+    (user, label) series with a positive actual and at least
+    `min_train_points` positive training months is forecast by both models.
+    `max_series` caps the number of test series per month (SARIMA is the
+    slow side).
+
+    Returns {"pooled": metrics, "sarima": metrics} where "seconds" is the
+    total fit + forecast time of each model, or None if nothing was tested.
+    """
+    pooled_actual, pooled_pred, pooled_seconds = [], [], 0.0
+    sarima_actual, sarima_pred, sarima_seconds = [], [], 0.0
+
+    for k in range(holdout, 0, -1):
+        cut = [(t.before(t.end_month - k), t) for t in user_totals if t.values.shape[1] > k]
+
+        started = time.perf_counter()
+        pooled = PooledSeasonalModel().fit(
+            item for train, _ in cut for item in train.positive_series()
+        )
+        pooled_seconds += time.perf_counter() - started
+
+        tested = 0
+        for train, full in cut:
+            target = train.end_month
+            for (label, values, months), actual in zip(
+                train.positive_series(), full.values[:, target - full.start_month]
+            ):
+                if actual <= 0 or len(values) < min_train_points or label not in pooled:
+                    continue
+                if max_series is not None and tested >= max_series:
+                    break
+                tested += 1
+
+                started = time.perf_counter()
+                pred = float(pooled.forecast(label, values, months, target)[0])
+                pooled_seconds += time.perf_counter() - started
+                pooled_actual.append(actual)
+                pooled_pred.append(pred)
+
+                started = time.perf_counter()
+                try:
+                    model = MonthlySARIMATrendRegressor(
+                        seasonal_period=12, max_pdq=3, max_PDQ=2, stepwise=True
+                    ).fit(values)
+                    pred = model.predict_next() if model.is_fitted else np.mean(values[-6:])
+                except Exception:
+                    pred = np.mean(values[-6:])
+                sarima_seconds += time.perf_counter() - started
+                sarima_actual.append(actual)
+                sarima_pred.append(pred)
+
+    if not pooled_pred:
+        return None
+
+    return {
+        "pooled": _error_summary(pooled_actual, pooled_pred, pooled_seconds),
+        "sarima": _error_summary(sarima_actual, sarima_pred, sarima_seconds),
+    }
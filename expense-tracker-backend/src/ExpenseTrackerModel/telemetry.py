@@ -0,0 +1,164 @@
+"""
+telemetry.py
+Pluggable metrics / tracing hooks for the model package.
+
+Instrumented code calls the process-wide sink from get_telemetry():
+
+  incr(name, value, tags)     counter   (model-path fallbacks, fit failures)
+  observe(name, value, tags)  histogram (fit time, series length)
+  span(name, tags)            context manager timing a block as "<name>.ms"
+  event(name, message, tags)  rare diagnostic (what used to go to stderr)
+
+The default sink does nothing, so hot paths pay one attribute lookup and a
+no-op call. Nothing here writes to stdout, which carries the JSON result.
+PLANNER_TELEMETRY selects an exporter at first use:
+
+  file:/var/log/planner/metrics.jsonl   one JSON object per metric
+  statsd://127.0.0.1:8125                UDP datagrams, DogStatsD-style tags
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+
+TELEMETRY_ENV = "PLANNER_TELEMETRY"
+STATSD_PREFIX = "planner"
+
+
+# ── Sinks ─────────────────────────────────────────────────────────────────────
+class Telemetry:
+    """No-op sink; exporters override _emit()."""
+
+    enabled = False
+
+    def incr(self, name: str, value: int = 1, tags: dict = None) -> None:
+        if self.enabled:
+            self._emit("counter", name, value, tags)
+
+    def observe(self, name: str, value: float, tags: dict = None) -> None:
+        if self.enabled:
+            self._emit("histogram", name, value, tags)
+
+    def event(self, name: str, message: str, tags: dict = None) -> None:
+        if self.enabled:
+            self._emit("event", name, str(message), tags)
+
+    @contextmanager
+    def span(self, name: str, tags: dict = None):
+        """Times the block and records it as the histogram "<name>.ms"."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._emit("timer", f"{name}.ms", (time.perf_counter() - started) * 1000, tags)
+
+    def _emit(self, kind: str, name: str, value, tags: dict) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class FileTelemetry(Telemetry):
+    """
+    Appends one JSON line per metric to a local file, e.g.
+    {"ts": 1700000000.1, "kind": "counter", "name": "...", "value": 1, "tags": {...}}
+
+    Args:
+        path: file to append to (created if missing)
+    """
+
+    enabled = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def _emit(self, kind, name, value, tags):
+        line = json.dumps({
+            "ts":    round(time.time(), 3),
+            "kind":  kind,
+            "name":  name,
+            "value": value,
+            "tags":  tags or {},
+        })
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class StatsDTelemetry(Telemetry):
+    """
+    Sends StatsD datagrams over UDP: counters as `|c`, spans as `|ms`,
+    histograms as `|h`, tags as DogStatsD `|#key:value`. Events become a
+    counter "<name>" tagged with the event's tags (the message is dropped;
+    use FileTelemetry to keep it). Send errors are ignored.
+
+    Args:
+        host, port: StatsD agent address
+        prefix:     prepended to every metric name
+    """
+
+    enabled = True
+    _SUFFIX = {"counter": "c", "histogram": "h", "timer": "ms", "event": "c"}
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8125, prefix: str = STATSD_PREFIX):
+        self.address = (host, int(port))
+        self.prefix = f"{prefix}." if prefix else ""
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _emit(self, kind, name, value, tags):
+        if kind == "event":
+            value = 1
+        packet = f"{self.prefix}{name}:{value:g}|{self._SUFFIX[kind]}"
+        if tags:
+            packet += "|#" + ",".join(f"{k}:{v}" for k, v in tags.items())
+        try:
+            self._sock.sendto(packet.encode("utf-8"), self.address)
+        except OSError:
+            pass
+
+    def close(self):
+        self._sock.close()
+
+
+# ── Process-wide sink ─────────────────────────────────────────────────────────
+_telemetry = None
+
+
+def telemetry_from_url(url: str) -> Telemetry:
+    """Builds a sink from a PLANNER_TELEMETRY value ("" / None → no-op)."""
+    if not url:
+        return Telemetry()
+    if url.startswith("file:"):
+        return FileTelemetry(url[len("file:"):])
+    if url.startswith("statsd://"):
+        host, _, port = url[len("statsd://"):].partition(":")
+        return StatsDTelemetry(host or "127.0.0.1", int(port or 8125))
+    raise ValueError(f"Unsupported {TELEMETRY_ENV} value: {url}")
+
+
+def get_telemetry() -> Telemetry:
+    """The current sink, configured from $PLANNER_TELEMETRY on first use."""
+    global _telemetry
+    if _telemetry is None:
+        _telemetry = telemetry_from_url(os.environ.get(TELEMETRY_ENV))
+    return _telemetry
+
+
+def set_telemetry(sink: Telemetry) -> Telemetry:
+    """Installs `sink` (None → no-op) and returns the previous one."""
+    global _telemetry
+    previous = get_telemetry()
+    _telemetry = sink if sink is not None else Telemetry()
+    return previous
@@ -0,0 +1,667 @@
+"""
+transactions.py
+Compact columnar representation of transaction history.
+
+TransactionBatch keeps one NumPy array per field instead of a list of dicts or
+an object-dtype DataFrame:
+  - month:       int64   epoch-month (months since 1970-01, UTC)
+  - amount:      float64 absolute amount
+  - day:         int8    day of month (1-31)
+  - is_income:   bool    True when the row's type is "income"
+  - recurring:   bool    the row's `recurring` flag (Expense schema)
+  - category:    uint32  code into the interned `categories` table
+  - description: uint32  code into the interned `descriptions` table
+
+Labels are assigned once per distinct (category, description) pair and stored
+as uint16 codes, so the categorizer runs over unique strings, not every row.
+"""
+
+import hashlib
+import json
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+
+EPOCH_YEAR = 1970
+
+# Rough peak cost of one row while a chunk is parsed: the JSON line, its dict
+# and strings, plus the batch columns. Used to size chunks from a memory limit.
+ROW_BYTES = 2048
+
+
+def epoch_month_to_period(month: int) -> str:
+    """Formats an epoch-month as 'YYYY-MM'."""
+    year, mon = divmod(int(month), 12)
+    return f"{EPOCH_YEAR + year:04d}-{mon + 1:02d}"
+
+
+# Date.prototype.toISOString() shape: "YYYY-MM-DDTHH:MM:SS.sssZ"
+ISO_LENGTH = 24
+_ISO_SEPARATORS = {4: b"-", 7: b"-", 10: b"T", 13: b":", 16: b":", 19: b".", 23: b"Z"}
+_ISO_DIGITS = np.array([i for i in range(ISO_LENGTH) if i not in _ISO_SEPARATORS])
+_DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def _parse_iso_fast(dates: list):
+    """
+    Vectorized parse of dates in the exact toISOString() shape, straight from
+    the characters: no datetime objects, no timezone conversion (the shape
+    is always UTC).
+
+    Returns (months, days, parsed) where `parsed` marks the rows handled
+    here; other rows (different shape, out-of-range fields, non-strings)
+    are left for the general parser.
+    """
+    n = len(dates)
+    months = np.full(n, -1, dtype=np.int64)
+    days = np.zeros(n, dtype=np.int8)
+    try:
+        lengths = np.fromiter(map(len, dates), dtype=np.int64, count=n)
+    except TypeError:  # non-string rows (None, numbers, Timestamps)
+        lengths = np.fromiter(
+            (len(d) if type(d) is str else -1 for d in dates), dtype=np.int64, count=n
+        )
+    rows = np.flatnonzero(lengths == ISO_LENGTH)
+    parsed = np.zeros(n, dtype=bool)
+    if not len(rows):
+        return months, days, parsed
+
+    text = "".join(dates) if len(rows) == n else "".join([dates[i] for i in rows])
+    # "replace" keeps one byte per character, so rows stay 24 bytes wide
+    chars = np.frombuffer(text.encode("ascii", "replace"), dtype=np.uint8).reshape(-1, ISO_LENGTH)
+
+    ok = np.ones(len(rows), dtype=bool)
+    for pos, sep in _ISO_SEPARATORS.items():
+        ok &= chars[:, pos] == sep[0]
+    digits = chars[:, _ISO_DIGITS].astype(np.int64) - 48
+    ok &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+
+    # Digit columns: year 0-3, month 4-5, day 6-7, h 8-9, m 10-11, s 12-13
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 4] * 10 + digits[:, 5]
+    day = digits[:, 6] * 10 + digits[:, 7]
+    ok &= (month >= 1) & (month <= 12) & (day >= 1)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    ok &= day <= _DAYS_IN_MONTH[np.clip(month, 1, 12) - 1] + (leap & (month == 2))
+    ok &= digits[:, 8] * 10 + digits[:, 9] < 24
+    ok &= digits[:, 10] * 10 + digits[:, 11] < 60
+    ok &= digits[:, 12] * 10 + digits[:, 13] < 60
+
+    rows = rows[ok]
+    months[rows] = (year[ok] - EPOCH_YEAR) * 12 + month[ok] - 1
+    days[rows] = day[ok]
+    parsed[rows] = True
+    return months, days, parsed
+
+
+def _parse_epoch_months(dates: list):
+    """
+    Parses date strings to (epoch-months, days of month). Unparseable dates
+    get month -1 and day 0.
+
+    Dates in the toISOString() shape the backend sends are parsed by
+    _parse_iso_fast; only the remaining rows go through pd.to_datetime.
+    """
+    months, days, parsed = _parse_iso_fast(dates)
+    rest = np.flatnonzero(~parsed)
+    if not len(rest):
+        return months, days
+
+    others = dates if len(rest) == len(dates) else [dates[i] for i in rest]
+    parsed = pd.to_datetime(pd.Series(others, dtype=object), errors="coerce", utc=True)
+    valid = parsed.notna().to_numpy()
+    if valid.any():
+        ok = parsed[valid]
+        rows = rest[valid]
+        months[rows] = (
+            (ok.dt.year.to_numpy(dtype=np.int64) - EPOCH_YEAR) * 12
+            + ok.dt.month.to_numpy(dtype=np.int64) - 1
+        )
+        days[rows] = ok.dt.day.to_numpy(dtype=np.int8)
+    return months, days
+
+
+def _to_amount(value) -> float:
+    """Mirrors pd.to_numeric(errors="coerce").fillna(0) for a single value."""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if amount != amount else amount
+
+
+def _string_ranks(table) -> np.ndarray:
+    """Rank of each string in sorted order, indexed by its code."""
+    ranks = np.zeros(len(table), dtype=np.int64)
+    ranks[np.argsort(np.array(table, dtype=object), kind="stable")] = np.arange(len(table))
+    return ranks
+
+
+class _Interner:
+    """Maps strings to dense integer codes in first-seen order."""
+
+    def __init__(self):
+        self.codes = {}
+        self.table = []
+
+    def __call__(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.table)
+            self.table.append(value)
+        return code
+
+
+# ── MonthlyTotals ─────────────────────────────────────────────────────────────
+class MonthlyTotals:
+    """
+    Dense label × month matrix of summed amounts.
+
+    `values[i, j]` is the total for `labels[i]` in epoch-month `start_month + j`.
+    Labels are ordered by first appearance in the source rows. `active[j]` is
+    True when month j had at least one source row (even if it summed to 0).
+
+    Per-label row statistics (zeros when built without source rows):
+      - recurring_share: fraction of the label's rows flagged `recurring`
+      - day_regularity:  mean resultant length of the rows' day of month on
+                         the monthly circle; 1.0 = always the same day
+    """
+
+    __slots__ = (
+        "labels", "start_month", "values", "data_months", "active",
+        "recurring_share", "day_regularity",
+    )
+
+    def __init__(self, labels, start_month: int, values: np.ndarray, data_months: int, active=None,
+                 recurring_share=None, day_regularity=None):
+        self.labels = tuple(labels)
+        self.start_month = int(start_month)
+        self.values = values
+        self.data_months = int(data_months)
+        self.active = values.any(axis=0) if active is None else np.asarray(active, dtype=bool)
+        n = len(self.labels)
+        self.recurring_share = np.zeros(n) if recurring_share is None else np.asarray(recurring_share, dtype=float)
+        self.day_regularity = np.zeros(n) if day_regularity is None else np.asarray(day_regularity, dtype=float)
+
+    @classmethod
+    def empty(cls) -> "MonthlyTotals":
+        return cls((), 0, np.zeros((0, 0), dtype=np.float64), 0)
+
+    @property
+    def end_month(self) -> int:
+        """Epoch-month after the last column."""
+        return self.start_month + self.values.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def series(self, label: str) -> np.ndarray:
+        """Monthly totals for one label, keeping only months with spend > 0."""
+        row = self.values[self.labels.index(label)]
+        return row[row > 0]
+
+    def items(self):
+        """Yields (label, positive monthly totals) in label order."""
+        for label, row in zip(self.labels, self.values):
+            yield label, row[row > 0]
+
+    def positive_series(self):
+        """Yields (label, positive monthly totals, their epoch-months)."""
+        for label, row in zip(self.labels, self.values):
+            months = np.flatnonzero(row > 0)
+            yield label, row[months], months + self.start_month
+
+    def with_values(self, values: np.ndarray) -> "MonthlyTotals":
+        """Same labels, months and row statistics over a replacement matrix."""
+        return MonthlyTotals(
+            self.labels, self.start_month, values, self.data_months, self.active,
+            self.recurring_share, self.day_regularity,
+        )
+
+    def before(self, month: int) -> "MonthlyTotals":
+        """Totals restricted to epoch-months < `month` (for backtesting)."""
+        cols = max(0, min(self.values.shape[1], month - self.start_month))
+        active = self.active[:cols]
+        return MonthlyTotals(
+            self.labels, self.start_month, self.values[:, :cols], int(active.sum()), active,
+            self.recurring_share, self.day_regularity,
+        )
+
+
+# ── TransactionBatch ──────────────────────────────────────────────────────────
+class TransactionBatch:
+    """
+    Columnar transaction history. Build with from_records / from_json /
+    from_ndjson; BudgetAI accepts a batch anywhere it accepts a list of dicts.
+
+    Rows with a missing category, a missing amount or an unparseable date are
+    dropped at construction, matching the planner's previous dropna() rules.
+    """
+
+    __slots__ = (
+        "month", "amount", "is_income", "category", "description",
+        "categories", "descriptions", "day", "recurring", "_label_cache",
+    )
+
+    def __init__(self, month, amount, is_income, category, description,
+                 categories, descriptions, day=None, recurring=None):
+        self.month = np.asarray(month, dtype=np.int64)
+        self.amount = np.asarray(amount, dtype=np.float64)
+        self.is_income = np.asarray(is_income, dtype=bool)
+        self.category = np.asarray(category, dtype=np.uint32)
+        self.description = np.asarray(description, dtype=np.uint32)
+        self.categories = tuple(categories)
+        self.descriptions = tuple(descriptions)
+        n = len(self.amount)
+        self.day = np.zeros(n, dtype=np.int8) if day is None else np.asarray(day, dtype=np.int8)
+        self.recurring = np.zeros(n, dtype=bool) if recurring is None else np.asarray(recurring, dtype=bool)
+        self._label_cache = None
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    # ── Constructors ──────────────────────────────────────────────────────────
+    @classmethod
+    def from_records(cls, records) -> "TransactionBatch":
+        """Builds a batch from an iterable of transaction dicts."""
+        categories, descriptions = _Interner(), _Interner()
+        dates, amounts, is_income, cat_codes, desc_codes, recurring = [], [], [], [], [], []
+
+        for rec in records:
+            category = rec.get("category")
+            amount = rec.get("amount")
+            date = rec.get("date")
+            if category is None or amount is None or date is None:
+                continue
+            if isinstance(amount, float) and amount != amount:
+                continue
+            description = rec.get("description")
+            dates.append(date)
+            amounts.append(abs(_to_amount(amount)))
+            is_income.append(str(rec.get("type", "")).strip().lower() == "income")
+            cat_codes.append(categories(str(category)))
+            desc_codes.append(descriptions("" if description is None else str(description)))
+            recurring.append(rec.get("recurring") is True)
+
+        months, days = _parse_epoch_months(dates)
+        keep = months >= 0
+        return cls(
+            months[keep],
+            np.asarray(amounts, dtype=np.float64)[keep],
+            np.asarray(is_income, dtype=bool)[keep],
+            np.asarray(cat_codes, dtype=np.uint32)[keep],
+            np.asarray(desc_codes, dtype=np.uint32)[keep],
+            categories.table,
+            descriptions.table,
+            days[keep],
+            np.asarray(recurring, dtype=bool)[keep],
+        )
+
+    @classmethod
+    def from_columns(cls, dates, amounts, categories, descriptions=None,
+                     is_income=None, absolute: bool = True, recurring=None) -> "TransactionBatch":
+        """
+        Builds a batch from parallel columns (e.g. DataFrame columns) without
+        going through per-row dicts. Rows with a missing category or an
+        unparseable date are dropped; non-numeric amounts count as 0.
+
+        Args:
+            absolute: False keeps signed amounts (refunds net against spend)
+        """
+        n = len(dates)
+        cat_codes, cat_table = pd.factorize(pd.Series(categories, dtype=object))
+        if descriptions is None:
+            desc_codes, desc_table = np.zeros(n, dtype=np.int64), [""]
+        else:
+            desc = pd.Series(descriptions, dtype=object).fillna("").astype(str)
+            desc_codes, desc_table = pd.factorize(desc)
+
+        amount = pd.to_numeric(pd.Series(amounts), errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+        if absolute:
+            amount = np.abs(amount)
+        income = np.zeros(n, dtype=bool) if is_income is None else np.asarray(is_income, dtype=bool)
+        flagged = (
+            np.zeros(n, dtype=bool) if recurring is None
+            else pd.Series(recurring, dtype=object).eq(True).to_numpy(dtype=bool)
+        )
+
+        months, days = _parse_epoch_months(list(dates))
+        keep = (months >= 0) & (cat_codes >= 0)
+        return cls(
+            months[keep], amount[keep], income[keep],
+            cat_codes[keep], desc_codes[keep],
+            [str(c) for c in cat_table], [str(d) for d in desc_table],
+            days[keep], flagged[keep],
+        )
+
+    @classmethod
+    def from_json(cls, raw) -> "TransactionBatch":
+        """
+        Builds a batch from a JSON document: either a list of transactions or
+        an object with a "transactions" list (the budget_wrapper.py payload).
+        """
+        data = json.loads(raw)
+        if isinstance(data, dict):
+            data = data.get("transactions", [])
+        return cls.from_records(data)
+
+    @classmethod
+    def from_ndjson(cls, lines) -> "TransactionBatch":
+        """Builds a batch from newline-delimited JSON (a string or line iterable)."""
+        if isinstance(lines, (str, bytes)):
+            lines = lines.splitlines()
+        return cls.from_records(json.loads(line) for line in lines if line.strip())
+
+    @classmethod
+    def iter_ndjson(cls, lines, chunk_rows: int = 50_000):
+        """
+        Yields batches of at most `chunk_rows` rows from newline-delimited
+        JSON, so only one chunk of parsed dicts is alive at a time.
+        """
+        lines = iter(lines)
+        while True:
+            chunk = list(islice(lines, chunk_rows))
+            if not chunk:
+                return
+            yield cls.from_ndjson(chunk)
+
+    @classmethod
+    def coerce(cls, data) -> "TransactionBatch":
+        """Returns `data` unchanged if it is already a batch, else from_records()."""
+        if isinstance(data, cls):
+            return data
+        return cls.from_records(data or [])
+
+    # ── Views ─────────────────────────────────────────────────────────────────
+    def take(self, mask) -> "TransactionBatch":
+        """Returns a batch of the selected rows sharing the same string tables."""
+        return TransactionBatch(
+            self.month[mask], self.amount[mask], self.is_income[mask],
+            self.category[mask], self.description[mask],
+            self.categories, self.descriptions,
+            self.day[mask], self.recurring[mask],
+        )
+
+    def expenses(self) -> "TransactionBatch":
+        return self.take(~self.is_income) if self.is_income.any() else self
+
+    def fingerprint(self) -> str:
+        """
+        Content hash of the batch (rows and string tables). Equal batches give
+        equal fingerprints, so it can key caches and in-flight deduplication.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        for column in (self.month, self.amount, self.is_income, self.category, self.description,
+                       self.day, self.recurring):
+            h.update(np.ascontiguousarray(column).tobytes())
+        for table in (self.categories, self.descriptions):
+            h.update("\x1f".join(table).encode("utf-8"))
+            h.update(b"\x1e")
+        return h.hexdigest()
+
+    def _canonical_order(self):
+        """
+        Row order that ignores input order: by month, amount, type, category
+        and description text, day, recurring flag. Returns (order, category
+        ranks, description ranks) with ranks indexed by row.
+        """
+        cats = _string_ranks(self.categories)[self.category]
+        descs = _string_ranks(self.descriptions)[self.description]
+        order = np.lexsort((self.recurring, self.day, descs, cats, self.is_income, self.amount, self.month))
+        return order, cats, descs
+
+    def canonical(self) -> "TransactionBatch":
+        """
+        The same rows in canonical order, so aggregation (label order, float
+        summation order) does not depend on how the input was sorted.
+        """
+        return self.take(self._canonical_order()[0])
+
+    def watermark(self) -> str:
+        """
+        Order-independent content digest: the same rows in any order (e.g.
+        two database reads with ties in the sort key) give the same value.
+        Precomputed forecasts are stored with it and used only while the
+        history still has the same watermark.
+        """
+        order, _, _ = self._canonical_order()
+
+        h = hashlib.blake2b(digest_size=16)
+        for column in (self.month, self.amount, self.is_income, self.day, self.recurring):
+            h.update(np.ascontiguousarray(column[order]).tobytes())
+        # Only strings some row uses, so a take() of the rows (e.g. expenses()
+        # of a batch that also holds income) hashes like a batch built from
+        # those rows alone
+        for codes, table in ((self.category, self.categories), (self.description, self.descriptions)):
+            used, dense = np.unique(codes, return_inverse=True)
+            names = [table[c] for c in used]
+            h.update(np.ascontiguousarray(_string_ranks(names)[dense][order], dtype=np.int64).tobytes())
+            h.update("\x1f".join(sorted(names)).encode("utf-8"))
+            h.update(b"\x1e")
+        return h.hexdigest()
+
+    @property
+    def num_months(self) -> int:
+        """Number of distinct months with at least one row."""
+        return int(np.unique(self.month).size)
+
+    def monthly_series(self, income: bool = False, end_month: int = None):
+        """
+        Total expense (or income) per month, without labelling: one dense
+        series from the first selected row's month up to `end_month`
+        (exclusive; default: through the batch's last month), so months with
+        no rows, trailing ones included, count as 0. Rows from `end_month` on
+        are left out.
+
+        Returns (start epoch-month, float64 values); values are empty when
+        no row is selected.
+        """
+        mask = self.is_income if income else ~self.is_income
+        if end_month is not None:
+            mask = mask & (self.month < end_month)
+        if not mask.any():
+            return 0, np.zeros(0)
+        end = int(self.month.max()) + 1 if end_month is None else int(end_month)
+        months = self.month[mask]
+        start = int(months.min())
+        values = np.bincount(months - start, weights=self.amount[mask], minlength=end - start)
+        return start, values
+
+    # ── Labels ────────────────────────────────────────────────────────────────
+    def label_codes(self, categorizer):
+        """
+        Categorizes every row. Returns (codes, labels) where `codes` is a uint16
+        array indexing into the `labels` tuple.
+
+        The categorizer is called once per distinct (category, description)
+        pair; the result is cached per categorizer instance.
+        """
+        cache = self._label_cache
+        if cache is not None and cache[0] is categorizer:
+            return cache[1], cache[2]
+
+        n_desc = max(len(self.descriptions), 1)
+        pair = self.category.astype(np.int64) * n_desc + self.description
+        uniq, inverse = np.unique(pair, return_inverse=True)
+
+        interner = _Interner()
+        pair_label = np.empty(len(uniq), dtype=np.uint16)
+        for i, key in enumerate(uniq.tolist()):
+            cat, desc = divmod(key, n_desc)
+            pair_label[i] = interner(
+                categorizer.predict(self.categories[cat], self.descriptions[desc])
+            )
+
+        codes = pair_label[inverse.reshape(-1)]
+        labels = tuple(interner.table)
+        self._label_cache = (categorizer, codes, labels)
+        return codes, labels
+
+    # ── Aggregation ───────────────────────────────────────────────────────────
+    def monthly_totals(self, categorizer, income: bool = False) -> MonthlyTotals:
+        """
+        Sums amounts per (label, month) for expense rows (or income rows when
+        `income=True`) in one bincount pass, plus the per-label recurring
+        share and day-of-month regularity.
+        """
+        codes, labels = self.label_codes(categorizer)
+        mask = self.is_income if income else ~self.is_income
+        if not mask.any():
+            return MonthlyTotals.empty()
+
+        codes = codes[mask]
+        months = self.month[mask]
+        amounts = self.amount[mask]
+        days = self.day[mask]
+
+        # Relabel to first-appearance order among the selected rows
+        present, first = np.unique(codes, return_index=True)
+        order = present[np.argsort(first)]
+        remap = np.zeros(len(labels), dtype=np.int64)
+        remap[order] = np.arange(len(order))
+
+        start = int(months.min())
+        n_months = int(months.max()) - start + 1
+        flat = remap[codes] * n_months + (months - start)
+        values = np.bincount(
+            flat, weights=amounts, minlength=len(order) * n_months
+        ).reshape(len(order), n_months)
+        active = np.bincount(months - start, minlength=n_months) > 0
+
+        # Row statistics per label: recurring share and the resultant length
+        # of day-of-month angles (rows with an unknown day are left out)
+        rows = remap[codes]
+        n_rows = np.bincount(rows, minlength=len(order))
+        recurring = np.bincount(rows, weights=self.recurring[mask], minlength=len(order)) / n_rows
+        dated = days > 0
+        angle = 2 * np.pi * (days[dated] - 1) / 31
+        n_dated = np.bincount(rows[dated], minlength=len(order))
+        cos = np.bincount(rows[dated], weights=np.cos(angle), minlength=len(order))
+        sin = np.bincount(rows[dated], weights=np.sin(angle), minlength=len(order))
+        regularity = np.hypot(cos, sin) / np.maximum(n_dated, 1)
+
+        return MonthlyTotals(
+            [labels[c] for c in order.tolist()],
+            start,
+            values,
+            int(active.sum()),
+            active,
+            recurring,
+            regularity,
+        )
+
+
+# ── Chunked aggregation ───────────────────────────────────────────────────────
+class MonthlyTotalsBuilder:
+    """
+    Builds MonthlyTotals from a stream of TransactionBatch chunks. Each chunk
+    is reduced to label × month sums and folded into a dense running matrix,
+    so memory follows labels × months rather than the number of rows. The
+    result equals `batch.monthly_totals()` of the concatenated chunks.
+
+    Args:
+        categorizer: labeler with predict(category, description); results are
+                     memoized across chunks
+        income:      aggregate income rows instead of expense rows
+        max_bytes:   ceiling for the running matrix; MemoryError beyond it
+    """
+
+    def __init__(self, categorizer, income: bool = False, max_bytes: int = None):
+        self.income = income
+        self.max_bytes = max_bytes
+        self._labeler = _MemoLabeler(categorizer)
+        self._labels = _Interner()
+        self._start = 0
+        self._values = np.zeros((0, 0), dtype=np.float64)
+        self._active = np.zeros(0, dtype=bool)
+        self._rows = np.zeros(0)
+        self._recurring = np.zeros(0)
+        self._dated = np.zeros(0)
+        self._cos = np.zeros(0)
+        self._sin = np.zeros(0)
+
+    def _grow(self, n_labels: int, lo: int, hi: int) -> None:
+        """Pads the running arrays to cover n_labels and epoch-months [lo, hi]."""
+        n_old, m_old = self._values.shape
+        start = min(lo, self._start) if m_old else lo
+        end = max(hi + 1, self._start + m_old) if m_old else hi + 1
+        if n_labels == n_old and start == self._start and end - start == m_old:
+            return
+        if self.max_bytes is not None and n_labels * (end - start) * 8 > self.max_bytes:
+            raise MemoryError(
+                f"Monthly totals ({n_labels} labels × {end - start} months) exceed the "
+                f"{self.max_bytes} byte memory limit"
+            )
+        offset = self._start - start if m_old else 0
+        values = np.zeros((n_labels, end - start), dtype=np.float64)
+        values[:n_old, offset:offset + m_old] = self._values
+        active = np.zeros(end - start, dtype=bool)
+        active[offset:offset + m_old] = self._active
+        self._values, self._active, self._start = values, active, start
+        for name in ("_rows", "_recurring", "_dated", "_cos", "_sin"):
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(n_labels - n_old)]))
+
+    def add(self, batch: "TransactionBatch") -> "MonthlyTotalsBuilder":
+        codes, labels = batch.label_codes(self._labeler)
+        mask = batch.is_income if self.income else ~batch.is_income
+        if not mask.any():
+            return self
+
+        codes = codes[mask]
+        months = batch.month[mask]
+        days = batch.day[mask]
+
+        # Chunk labels → running label index, in first-appearance order
+        present, first = np.unique(codes, return_index=True)
+        remap = np.zeros(len(labels), dtype=np.int64)
+        for code in present[np.argsort(first)].tolist():
+            remap[code] = self._labels(labels[code])
+        rows = remap[codes]
+
+        n_labels = len(self._labels.table)
+        self._grow(n_labels, int(months.min()), int(months.max()))
+        n_months = self._values.shape[1]
+        col = months - self._start
+        self._values += np.bincount(
+            rows * n_months + col, weights=batch.amount[mask], minlength=n_labels * n_months
+        ).reshape(n_labels, n_months)
+        self._active |= np.bincount(col, minlength=n_months) > 0
+
+        dated = days > 0
+        angle = 2 * np.pi * (days[dated] - 1) / 31
+        self._rows += np.bincount(rows, minlength=n_labels)
+        self._recurring += np.bincount(rows, weights=batch.recurring[mask], minlength=n_labels)
+        self._dated += np.bincount(rows[dated], minlength=n_labels)
+        self._cos += np.bincount(rows[dated], weights=np.cos(angle), minlength=n_labels)
+        self._sin += np.bincount(rows[dated], weights=np.sin(angle), minlength=n_labels)
+        return self
+
+    def totals(self) -> MonthlyTotals:
+        if not self._labels.table:
+            return MonthlyTotals.empty()
+        return MonthlyTotals(
+            self._labels.table,
+            self._start,
+            self._values,
+            int(self._active.sum()),
+            self._active,
+            self._recurring / self._rows,
+            np.hypot(self._cos, self._sin) / np.maximum(self._dated, 1),
+        )
+
+
+class _MemoLabeler:
+    """Caches categorizer.predict per (category, description) across chunks."""
+
+    def __init__(self, categorizer):
+        self.categorizer = categorizer
+        self.cache = {}
+
+    def predict(self, category: str, description: str = "") -> str:
+        key = (category, description)
+        label = self.cache.get(key)
+        if label is None:
+            label = self.cache[key] = self.categorizer.predict(category, description)
+        return label
@@ -1,4 +1,5 @@
 import { spawn } from "child_process";
+import http from "http";
 import path from "path";
 import Expense from "../models/Expense.js";
 import Income from "../models/Income.js";
@@ -6,6 +7,9 @@ import BudgetPlan from "../models/BudgetPlan.js";
 import Budget from "../models/Budget.js";
 import User from "../models/User.js";
 
+// Months of Income rows sent with each planning request
+const INCOME_HISTORY_MONTHS = 12;
+
 // --- Helper to run Python Script ---
 const runBudgetAI = (inputData) => {
   return new Promise((resolve, reject) => {
@@ -61,6 +65,59 @@ const runBudgetAI = (inputData) => {
   });
 };
 
+// --- Helper to call the warm planning service (planner_service.py) ---
+// Enabled by AI_SERVICE_URL (e.g. http://127.0.0.1:8765) or AI_SERVICE_SOCKET.
+const runBudgetService = (inputData) => {
+  return new Promise((resolve, reject) => {
+    const body = JSON.stringify(inputData);
+    const options = {
+      method: "POST",
+      path: "/plan",
+      headers: {
+        "Content-Type": "application/json",
+        "Content-Length": Buffer.byteLength(body),
+      },
+    };
+
+    if (process.env.AI_SERVICE_SOCKET) {
+      options.socketPath = process.env.AI_SERVICE_SOCKET;
+    } else {
+      const url = new URL(process.env.AI_SERVICE_URL);
+      options.hostname = url.hostname;
+      options.port = url.port;
+    }
+
+    const req = http.request(options, (res) => {
+      let dataString = "";
+      res.on("data", (chunk) => {
+        dataString += chunk.toString();
+      });
+      res.on("end", () => {
+        try {
+          const result = JSON.parse(dataString);
+          if (res.statusCode !== 200) {
+            reject(new Error(result.error || `Planner service error ${res.statusCode}`));
+          } else {
+            resolve(result);
+          }
+        } catch (e) {
+          console.error("JSON parse error:", e);
+          reject(new Error("Failed to parse planner service output"));
+        }
+      });
+    });
+
+    req.on("error", reject);
+    req.write(body);
+    req.end();
+  });
+};
+
+const planBudget = (inputData) =>
+  process.env.AI_SERVICE_URL || process.env.AI_SERVICE_SOCKET
+    ? runBudgetService(inputData)
+    : runBudgetAI(inputData);
+
 // --- Controllers ---
 
 // 1. Get Stored Plan (or return 404)
@@ -95,73 +152,69 @@ export const generateBudgetPlan = async (req, res) => {
       return res.status(400).json({ message: "Target month is required" });
     }
 
-    // Fetch Expenses (limit to last 1000 transactions)
-    const expenses = await Expense.find({ userId })
-      .sort({ date: -1 })
-      .limit(1000);
-
-    // Calculate monthly income if not provided
-    let calculatedIncome = monthlyIncome;
-
-    // 1. Try Last Month's Income
-    if (!calculatedIncome) {
-      const lastMonth = new Date();
-      lastMonth.setMonth(lastMonth.getMonth() - 1);
-      const startOfMonth = new Date(
-        lastMonth.getFullYear(),
-        lastMonth.getMonth(),
-        1,
-      );
-      const endOfMonth = new Date(
-        lastMonth.getFullYear(),
-        lastMonth.getMonth() + 1,
-        0,
-      );
-
-      const incomes = await Income.aggregate([
-        {
-          $match: {
-            userId,
-            date: { $gte: startOfMonth, $lte: endOfMonth },
-          },
-        },
-        {
-          $group: {
-            _id: null,
-            total: { $sum: "$amount" },
-          },
+    // Fetch Expenses (limit to last 1000 transactions) and, in the same round
+    // trip ($unionWith), the Income rows the planner forecasts next month's
+    // income from (irregular incomes average out instead of hinging on last
+    // month alone).
+    // Keep the expense query + mapping in sync with
+    // ExpenseTrackerModel/export_histories.js, whose precomputed forecasts
+    // are reused only when the histories match.
+    const incomeSince = new Date();
+    incomeSince.setMonth(incomeSince.getMonth() - INCOME_HISTORY_MONTHS);
+    const rows = await Expense.aggregate([
+      { $match: { userId } },
+      { $sort: { date: -1 } },
+      { $limit: 1000 },
+      { $addFields: { type: "Expense" } },
+      {
+        $unionWith: {
+          coll: Income.collection.name,
+          pipeline: [
+            { $match: { userId, date: { $gte: incomeSince } } },
+            { $addFields: { type: "Income" } },
+          ],
         },
-      ]);
-
-      if (incomes.length > 0 && incomes[0].total > 0) {
-        calculatedIncome = incomes[0].total;
-      }
-    }
+      },
+    ]);
+    const hasIncome = rows.some((r) => r.type === "Income");
 
-    // 2. Try User Profile Income
-    if (!calculatedIncome) {
+    // Income used when there is no income history: user profile, then default
+    let calculatedIncome = monthlyIncome;
+    if (!calculatedIncome && !hasIncome) {
       const user = await User.findOne({ uid: userId });
-      if (user && user.monthlyIncome > 0) {
-        calculatedIncome = user.monthlyIncome;
-      }
+      calculatedIncome =
+        user && user.monthlyIncome > 0 ? user.monthlyIncome : 50000;
     }
 
-    const transactions = expenses.map((e) => ({
-      date: e.date.toISOString(),
-      amount: e.amount,
-      category: e.category,
-      description: e.description || e.category,
-      type: "Expense",
-    }));
+    const transactions = rows.map((r) =>
+      r.type === "Income"
+        ? {
+            date: r.date.toISOString(),
+            amount: r.amount,
+            category: r.source,
+            description: r.description || r.source,
+            type: "Income",
+          }
+        : {
+            date: r.date.toISOString(),
+            amount: r.amount,
+            category: r.category,
+            description: r.description || r.category,
+            type: "Expense",
+            recurring: Boolean(r.recurring),
+          },
+    );
 
     const inputData = {
+      user_id: userId,
       transactions,
-      monthly_income: Number(calculatedIncome) || 50000,
+      // null → the planner forecasts income from the Income rows above
+      monthly_income: calculatedIncome ? Number(calculatedIncome) : null,
       total_budget: totalBudget ? Number(totalBudget) : null,
     };
 
     // Run AI
-    const result = await runBudgetAI(inputData);
+    const result = await planBudget(inputData);
 
     // Save to DB
     const planData = {